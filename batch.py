@@ -0,0 +1,418 @@
+"""Batch generation from a manifest file, with a resumable checkpoint journal.
+
+A manifest is a CSV file (header row) or an NDJSON file (one JSON object per
+line) whose columns use the same keys as an xmtl_templates.yaml entry:
+Project_Title ("number, title"), Submittal_Number, Revision_Number,
+Specification_Section, Submittal_Name, Date_Review_Ends, Project_Manager,
+EDP_Address_Line_1/2/3 and reviewer_list.
+
+Manifests are read one row at a time, so exports of millions of rows are
+never held in memory. Every row read carries a ManifestCheckpoint, the byte
+offset just past it, from which a reader can resume mid-file.
+
+Every finished row is appended to a JSONL journal. Rerunning the same
+manifest skips rows whose input hash is already recorded as done and retries
+everything else. A row identical to an earlier row of the same run is
+reported as a duplicate and not generated a second time. Journal entries also carry the checkpoint after the last
+row that, with every row before it, has finished; while the manifest file
+is unchanged and those rows' outputs still exist, a rerun seeks straight
+there instead of re-reading them.
+"""
+import csv
+import json
+import os
+import tempfile
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import NamedTuple
+
+from resilience import CircuitOpenError
+from submittal_cli import XmtlBuild, generate_transmittal
+from work_queue import WorkQueue
+from zip_sink import output_exists
+
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+NDJSON_SUFFIXES = (".ndjson", ".jsonl", ".json")
+
+
+class ManifestError(ValueError):
+    """A manifest that cannot be read as CSV or NDJSON."""
+
+
+class ManifestCheckpoint(NamedTuple):
+    """Where to resume reading a manifest: the byte offset after a row, and that row's number."""
+    offset: int
+    row_number: int
+
+
+class ManifestRecord(NamedTuple):
+    row_number: int
+    row: dict
+    checkpoint: ManifestCheckpoint
+
+
+def read_manifest_records(manifest_path, start=None):
+    """Yield a ManifestRecord for each row of a CSV or NDJSON manifest.
+
+    Row numbers start at 1 and count data rows only. Files ending in .ndjson,
+    .jsonl or .json are read as NDJSON, one JSON object per line; a .json
+    file holding a JSON array raises ManifestError, as does any line that is
+    not a JSON object. Anything else is read as CSV. With start (a
+    ManifestCheckpoint from an earlier read of the same file), reading
+    resumes at the row after it; a CSV header is still read from the top.
+    The file is read line by line, so memory use does not depend on its size.
+    """
+    manifest_path = Path(manifest_path)
+    with open(manifest_path, "rb") as f:
+        offset = 0
+
+        def lines():
+            nonlocal offset
+            while line := f.readline():
+                text = line.decode("utf-8-sig" if offset == 0 else "utf-8")
+                offset = f.tell()
+                yield text
+
+        row_number = 0
+        if manifest_path.suffix.lower() in NDJSON_SUFFIXES:
+            rows = _ndjson_rows(lines(), manifest_path)
+        else:
+            rows = csv.DictReader(lines())
+            if rows.fieldnames is None:
+                return
+        if start is not None:
+            f.seek(start.offset)
+            offset, row_number = start
+        for row in rows:
+            row_number += 1
+            yield ManifestRecord(row_number, row, ManifestCheckpoint(offset, row_number))
+
+
+def _ndjson_rows(lines, manifest_path):
+    for line in lines:
+        if not line.strip():
+            continue
+        if line.lstrip().startswith("["):
+            raise ManifestError(f"{manifest_path.name} holds a JSON array; manifests need one JSON object per "
+                                f"line (NDJSON), e.g. from jq -c '.[]'")
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as exc:
+            raise ManifestError(f"{manifest_path.name} has a line that is not valid JSON ({exc.msg}); "
+                                f"manifests need one JSON object per line (NDJSON)") from exc
+        if not isinstance(row, dict):
+            raise ManifestError(f"{manifest_path.name} has a line that is not a JSON object")
+        yield row
+
+
+def read_manifest_rows(manifest_path, start=None):
+    """Yield (row_number, row_dict) for each row of a CSV or NDJSON manifest (see read_manifest_records)."""
+    for record in read_manifest_records(manifest_path, start):
+        yield record.row_number, record.row
+
+
+def read_manifest(manifest_path, start=None):
+    """Yield (row_number, XmtlBuild) for each row of a CSV or NDJSON manifest."""
+    for row_number, row in read_manifest_rows(manifest_path, start):
+        yield row_number, XmtlBuild.from_dict(row)
+
+
+def manifest_stamp(manifest_path):
+    """(size, mtime_ns) of a manifest; a checkpoint is only valid for the file it was taken on."""
+    stat = Path(manifest_path).stat()
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def default_journal_path(manifest_path):
+    manifest_path = Path(manifest_path)
+    return manifest_path.with_name(manifest_path.name + ".journal.jsonl")
+
+
+class BatchJournal:
+    """Append-only JSONL record of finished manifest rows.
+
+    Each line is one entry: row number, input hash, status, output path,
+    error and, where there is one, the manifest checkpoint to resume from.
+    Entries are flushed and fsynced as they are written, so at most the
+    final line can be torn by a crash; torn or undecodable lines are ignored
+    on load, and a newline is written before the next entry so it starts on
+    a clean line. Later entries for the same input hash supersede earlier
+    ones.
+
+    Given the stamp of the manifest it belongs to, the journal resumes from
+    the latest checkpoint taken on that exact file and keeps only the
+    entries for rows after it, which are the only ones a resumed run can
+    meet. A checkpoint only counts while the outputs of the rows before it
+    still exist: if one was deleted, or was in a zip archive that never
+    finished, the journal falls back to the latest checkpoint before that
+    row. In memory, only the output path of each done hash is kept, and the
+    set of hashes recorded since the journal was opened.
+    """
+
+    def __init__(self, path, stamp=None):
+        self.path = Path(path)
+        self.outputs = {}
+        self._recorded = set()
+        self.checkpoint = None
+        if self.path.exists():
+            self._load(stamp)
+
+    def _read(self):
+        with open(self.path, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(entry, dict) and "input_hash" in entry:
+                    yield entry
+
+    def _checkpoints(self, stamp):
+        """Yield each checkpoint recorded on the manifest with this stamp, resetting to None on any other."""
+        for entry in self._read():
+            saved = entry.get("checkpoint")
+            if saved:
+                same = saved["manifest"] == stamp
+                yield ManifestCheckpoint(saved["offset"], saved["row"]) if same else None
+
+    def _load(self, stamp):
+        if stamp is not None:
+            for checkpoint in self._checkpoints(stamp):
+                self.checkpoint = checkpoint
+        if self.checkpoint is not None:
+            lost = self._first_lost_row(self.checkpoint.row_number)
+            if lost is not None:
+                self.checkpoint = None
+                for checkpoint in self._checkpoints(stamp):
+                    if checkpoint is None or checkpoint.row_number < lost:
+                        self.checkpoint = checkpoint
+        after = self.checkpoint.row_number if self.checkpoint else 0
+        for entry in self._read():
+            if entry.get("row", after + 1) > after:
+                self._remember(entry)
+
+    def _first_lost_row(self, through):
+        """The first row up to through recorded as done whose output no longer exists, or None."""
+        lost = None
+        for entry in self._read():
+            row = entry.get("row", 0)
+            if row > through or entry["status"] != STATUS_DONE:
+                continue
+            if not (entry["output"] and output_exists(entry["output"])):
+                lost = row if lost is None else min(lost, row)
+        return lost
+
+    def _remember(self, entry):
+        if entry["status"] == STATUS_DONE and entry["output"]:
+            self.outputs[entry["input_hash"]] = entry["output"]
+        else:
+            self.outputs.pop(entry["input_hash"], None)
+
+    def recorded_since_open(self, input_hash):
+        """True if this journal object has recorded the hash, i.e. a row of the current run had it."""
+        return input_hash in self._recorded
+
+    def is_done(self, input_hash):
+        """True if the hash was completed and its output file (or finished zip archive member) still exists."""
+        output = self.outputs.get(input_hash)
+        return bool(output and output_exists(output))
+
+    def record(self, row_number, input_hash, status, output=None, error=None, checkpoint=None, stamp=None):
+        entry = {
+            "row": row_number,
+            "input_hash": input_hash,
+            "status": status,
+            "output": str(output) if output else None,
+            "error": error,
+            "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        }
+        if checkpoint is not None:
+            entry["checkpoint"] = {"offset": checkpoint.offset, "row": checkpoint.row_number, "manifest": stamp}
+        line = json.dumps(entry) + "\n"
+        with open(self.path, "ab") as f:
+            if f.tell() and not self._ends_with_newline():
+                line = "\n" + line
+            f.write(line.encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+        self._remember(entry)
+        self._recorded.add(input_hash)
+        return entry
+
+    def _ends_with_newline(self):
+        with open(self.path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+
+class _LowWaterMark:
+    """Tracks the checkpoint after the longest unbroken run of finished rows.
+
+    Rows are added in manifest order and may finish in any order. The mark
+    stops for good at the first failed row, so a rerun reads from there.
+    """
+
+    def __init__(self, start):
+        self.checkpoint = start
+        self.stopped = False
+        self._pending = deque()
+        self._finished = set()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def add(self, record):
+        if not self.stopped:
+            self._pending.append(record)
+
+    def finish(self, record, ok):
+        if self.stopped:
+            return
+        if not ok:
+            self.stopped = True
+            self._pending.clear()
+            self._finished.clear()
+            return
+        self._finished.add(record.row_number)
+        while self._pending and self._pending[0].row_number in self._finished:
+            done = self._pending.popleft()
+            self._finished.discard(done.row_number)
+            self.checkpoint = done.checkpoint
+
+
+def run_batch(manifest_path, output_dir=None, journal_path=None, concurrency=None, registry=None,
+              pdf_options=None, window=1):
+    """Generate every row of a manifest, resuming from its journal.
+
+    concurrency, registry and pdf_options are passed through to
+    generate_transmittal(). With window > 1, up to that many rows are
+    generated at once, each in its own temporary work folder; no more than
+    window rows are read ahead of the oldest unfinished one, so memory stays
+    flat however long the manifest is. An AdaptiveConcurrency given as
+    concurrency also admits rows: while its limit is above window, that many
+    rows are in flight, so the pages of several transmittals share the
+    browsers rather than the few pages of one.
+
+    Returns:
+        A summary dict with 'done', 'skipped', 'duplicate' and 'failed' row
+        counts. Rows before the journal's checkpoint are counted as skipped
+        without being read, as are rows whose hash an earlier run finished.
+        A duplicate row has the same input hash as an earlier row of this
+        run, so it would only regenerate that row's PDF; it is reported and
+        not generated. Rows before the checkpoint are not compared, so
+        `validate` is the complete check.
+
+    Raises:
+        ManifestError: The manifest cannot be read.
+
+        CircuitOpenError: The browser on this host is failing every print.
+            No more rows are started, rows already running are waited for,
+            and the rows it rejected are not journaled, so a rerun retries them.
+    """
+    stamp = manifest_stamp(manifest_path)
+    journal = BatchJournal(journal_path or default_journal_path(manifest_path), stamp=stamp)
+    mark = _LowWaterMark(journal.checkpoint)
+    summary = {"done": 0, "skipped": journal.checkpoint.row_number if journal.checkpoint else 0, "duplicate": 0,
+               "failed": 0}
+    circuit_open = []
+    slots = max(window, concurrency.max_limit if concurrency is not None else 1)
+
+    def rows_allowed():
+        return max(window, concurrency.limit) if concurrency is not None else window
+
+    def generate(build, work_dir=None):
+        return generate_transmittal(build, output_dir=output_dir, work_dir=work_dir, concurrency=concurrency,
+                                    registry=registry, pdf_options=pdf_options)
+
+    def generate_in_own_folder(build):
+        with tempfile.TemporaryDirectory(prefix="xmtl-batch-") as work_dir:
+            return generate(build, work_dir)
+
+    def finished(record, input_hash, call):
+        try:
+            output = call()
+        except CircuitOpenError as exc:
+            mark.finish(record, ok=False)
+            circuit_open.append(exc)
+            return
+        except Exception as exc:
+            print(f"Row {record.row_number} failed: {exc}")
+            mark.finish(record, ok=False)
+            journal.record(record.row_number, input_hash, STATUS_FAILED, error=str(exc),
+                           checkpoint=mark.checkpoint, stamp=stamp)
+            summary["failed"] += 1
+            return
+        mark.finish(record, ok=True)
+        journal.record(record.row_number, input_hash, STATUS_DONE, output=output,
+                       checkpoint=mark.checkpoint, stamp=stamp)
+        summary["done"] += 1
+
+    with ThreadPoolExecutor(max_workers=slots) if slots > 1 else nullcontext() as executor:
+        in_flight = {}
+
+        def collect():
+            # wake up now and then, so a limit that grew meanwhile admits another row
+            done, _ = wait(in_flight, timeout=concurrency.sample_interval if concurrency is not None else None,
+                           return_when=FIRST_COMPLETED)
+            for future in done:
+                record, input_hash = in_flight.pop(future)
+                finished(record, input_hash, future.result)
+
+        try:
+            for record in read_manifest_records(manifest_path, start=journal.checkpoint):
+                if circuit_open:
+                    break
+                build = XmtlBuild.from_dict(record.row)
+                input_hash = build.input_hash()
+                mark.add(record)
+                if journal.recorded_since_open(input_hash) or input_hash in (h for _, h in in_flight.values()):
+                    print(f"Row {record.row_number} repeats an earlier row; not generating it again.")
+                    mark.finish(record, ok=True)
+                    summary["duplicate"] += 1
+                    continue
+                if journal.is_done(input_hash):
+                    mark.finish(record, ok=True)
+                    summary["skipped"] += 1
+                    continue
+                if executor is None:
+                    finished(record, input_hash, lambda: generate(build))
+                    continue
+                while in_flight and max(len(in_flight), len(mark)) >= rows_allowed():
+                    collect()
+                if circuit_open:
+                    break
+                in_flight[executor.submit(generate_in_own_folder, build)] = (record, input_hash)
+            while in_flight:
+                collect()
+        except BaseException:
+            for future in in_flight:
+                future.cancel()
+            raise
+
+    if circuit_open:
+        raise circuit_open[0]
+
+    return summary
+
+
+def enqueue_manifest(manifest_path, queue_path):
+    """Add every manifest row to a shared work queue. Returns the number of new jobs."""
+    queue = WorkQueue(queue_path)
+    try:
+        return queue.enqueue(
+            (XmtlBuild.from_dict(row).input_hash(), row) for _, row in read_manifest_rows(manifest_path)
+        )
+    finally:
+        queue.close()
+
+
+def transmittal_handler(output_dir=None, concurrency=None, registry=None, pdf_options=None):
+    """Return a work_queue.run_worker() handler that generates one transmittal per payload."""
+    def handle(payload, work_dir):
+        return generate_transmittal(XmtlBuild.from_dict(payload), output_dir=output_dir, work_dir=work_dir,
+                                    concurrency=concurrency, registry=registry, pdf_options=pdf_options)
+    return handle
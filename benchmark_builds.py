@@ -0,0 +1,61 @@
+"""Benchmark for XmtlBuild: memory per build, construction and validation time.
+
+Run from the project root:
+    python benchmark_builds.py [--builds 50000]
+
+Builds are made from manifest-style rows with XmtlBuild.from_dict(), as batch
+runs do. Memory is measured with tracemalloc as the growth from holding all
+the builds at once, divided by the number of builds.
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+
+from submittal_cli import XmtlBuild
+
+ROW = {
+    "Project_Title": "3238, Westside Research Park",
+    "Revision_Number": "0",
+    "Specification_Section": "07 31 13 Asphalt Shingles",
+    "Submittal_Name": "Shingle Sample",
+    "Date_Review_Ends": "03/15/2025",
+    "Project_Manager": "Jane Doe",
+    "reviewer_list": "Alice Smith, UCSC PP;Bob Jones, UCSC PP",
+}
+
+
+def make_rows(count):
+    return [{**ROW, "Submittal_Number": f"073113-{n:05d}"} for n in range(count)]
+
+
+def timed(label, count, func):
+    started = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<28}{elapsed * 1e6 / count:8.2f} µs/build   ({elapsed:.3f}s total)")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--builds", type=int, default=50_000)
+    count = parser.parse_args().builds
+    rows = make_rows(count)
+
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    builds = [XmtlBuild.from_dict(row) for row in rows]
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{'memory':<28}{(after - before) / count:8.0f} bytes/build")
+
+    timed("from_dict()", count, lambda: [XmtlBuild.from_dict(row) for row in rows])
+    timed("validate()", count, lambda: [build.validate() for build in builds])
+    timed("to_render_dict()", count, lambda: [build.to_render_dict() for build in builds])
+    timed("input_hash()", count, lambda: [build.input_hash() for build in builds])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Benchmark for linearized output: bytes a viewer must read before it can show page 1.
+
+Run from the project root (needs pikepdf or qpdf):
+    python benchmark_linearize.py [PDF ...]
+
+The PDFs (the examples/ folder by default) are merged with pypdf exactly as
+create_final_pdf() merges page PDFs, then written both as pypdf writes them
+and linearized. A viewer reading a plain PDF from a share must reach the
+cross-reference table at the end of the file before it can locate page 1,
+so the whole file is needed. A linearized PDF declares in its first object
+(/E) where the first page's objects end.
+"""
+import argparse
+import re
+import sys
+import time
+from io import BytesIO
+from pathlib import Path
+
+from pypdf import PdfWriter
+
+from html_to_pdf import linearize_pdf, linearizer_available
+
+LINEARIZATION_DICT = re.compile(rb"/Linearized\s.*?>>", re.DOTALL)
+
+
+def first_page_bytes(data):
+    """Bytes to read before page 1 can be displayed."""
+    header = LINEARIZATION_DICT.search(data[:4096])
+    if header is None:
+        return len(data)  # trailer and xref are at the end
+    return int(re.search(rb"/E\s+(\d+)", header.group()).group(1))
+
+
+def merged(paths):
+    writer = PdfWriter()
+    for path in paths:
+        writer.append(str(path))
+    buffer = BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def report(label, data, seconds=None):
+    needed = first_page_bytes(data)
+    timing = f"   (linearized in {seconds * 1000:.0f} ms)" if seconds is not None else ""
+    print(f"{label:<12}{len(data):>10,} bytes   page 1 after {needed:>10,} bytes "
+          f"({needed / len(data):6.1%}){timing}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pdfs", nargs="*", type=Path)
+    paths = parser.parse_args().pdfs or sorted(Path("examples").glob("*.pdf"))
+    if not paths:
+        sys.exit("No PDFs given and none found in examples/")
+    if not linearizer_available():
+        sys.exit("Needs pikepdf (pip install .[linearize]) or qpdf on PATH")
+
+    plain = merged(paths)
+    started = time.perf_counter()
+    linearized = linearize_pdf(plain)
+    elapsed = time.perf_counter() - started
+
+    print(f"{len(paths)} PDFs merged: {', '.join(path.name for path in paths)}")
+    report("plain", plain)
+    report("linearized", linearized, elapsed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""Memory-aware concurrency control for browser PDF conversions.
+
+Every headless Edge print spawns a process tree that can hold hundreds of MB.
+AdaptiveConcurrency limits how many conversions run at once and moves that
+limit between configurable bounds based on two samples: the memory still
+available on the host, and the resident memory of this process's browser
+children. The limit grows by one while conversions are queueing and there is
+room for another browser, and halves when available memory drops below the
+reserve (additive increase, multiplicative decrease).
+
+psutil is used when installed; otherwise memory is read from /proc on Linux.
+Where neither is available the limit simply stays at min_limit.
+"""
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+MB = 1024 * 1024
+
+
+def available_memory():
+    """Bytes of memory available to new processes, or None if it cannot be read."""
+    if psutil is not None:
+        return psutil.virtual_memory().available
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def _proc_children():
+    """Map parent pid -> child pids from /proc (Linux fallback for psutil)."""
+    children = {}
+    for stat in Path("/proc").glob("[0-9]*/stat"):
+        try:
+            fields = stat.read_text().rsplit(")", 1)[1].split()
+        except (OSError, IndexError):
+            continue
+        children.setdefault(int(fields[1]), []).append(int(stat.parent.name))
+    return children
+
+
+def _proc_rss(pid):
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, IndexError, ValueError):
+        return 0
+
+
+def child_process_rss(pid=None):
+    """Total resident bytes of every descendant of pid (this process by default).
+
+    Browser conversions are the only child processes we start, so this is
+    the memory held by in-flight conversions. Returns None if it cannot be read.
+    """
+    pid = os.getpid() if pid is None else pid
+    if psutil is not None:
+        total = 0
+        for child in psutil.Process(pid).children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        return total
+    if not Path("/proc/self").exists():
+        return None
+    tree = _proc_children()
+    total, stack = 0, list(tree.get(pid, []))
+    while stack:
+        child = stack.pop()
+        total += _proc_rss(child)
+        stack.extend(tree.get(child, []))
+    return total
+
+
+@dataclass
+class Decision:
+    """One sample taken by AdaptiveConcurrency and what it did with the limit."""
+    time: float
+    old_limit: int
+    new_limit: int
+    reason: str
+    available_mb: float | None
+    browser_rss_mb: float | None
+    in_flight: int
+
+
+class AdaptiveConcurrency:
+    """A semaphore whose size follows available memory.
+
+    Args:
+        min_limit:        Lowest number of concurrent conversions.
+        max_limit:        Highest number of concurrent conversions.
+        reserve_mb:       Memory to leave free for everything else on the host.
+        per_job_mb:       Initial estimate of one conversion's footprint; replaced
+                          by the observed browser RSS per in-flight job.
+        sample_interval:  Minimum seconds between memory samples.
+        on_decision:      Optional callable(Decision) invoked for every sample,
+                          for logging or metrics.
+
+    Use it as a context manager around each conversion, or hand it to
+    map_concurrent().
+    """
+
+    def __init__(self, min_limit=1, max_limit=4, reserve_mb=1024, per_job_mb=400,
+                 sample_interval=0.5, on_decision=None):
+        if not 1 <= min_limit <= max_limit:
+            raise ValueError("Concurrency bounds must satisfy 1 <= min_limit <= max_limit")
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.reserve_mb = reserve_mb
+        self.per_job_mb = per_job_mb
+        self.sample_interval = sample_interval
+        self.on_decision = on_decision
+        self.limit = min_limit
+        self.in_flight = 0
+        self.waiting = 0
+        self.decisions = deque(maxlen=200)
+        self._last_sample = 0.0
+        self._cond = threading.Condition()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+    def acquire(self):
+        with self._cond:
+            self.waiting += 1
+            try:
+                self._maybe_sample()
+                while self.in_flight >= self.limit:
+                    self._cond.wait(timeout=self.sample_interval)
+                    self._maybe_sample()
+            finally:
+                self.waiting -= 1
+            self.in_flight += 1
+
+    def release(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def _maybe_sample(self):
+        now = time.monotonic()
+        if now - self._last_sample < self.sample_interval:
+            return
+        self._last_sample = now
+        self.adjust(available_memory(), child_process_rss())
+
+    def adjust(self, available_bytes, browser_rss_bytes):
+        """Apply one memory sample to the limit and record the decision.
+
+        Called automatically while acquiring; exposed so the policy can be
+        driven directly with synthetic samples.
+        """
+        with self._cond:
+            old_limit = self.limit
+            available_mb = available_bytes / MB if available_bytes is not None else None
+            rss_mb = browser_rss_bytes / MB if browser_rss_bytes is not None else None
+            if rss_mb and self.in_flight:
+                self.per_job_mb = max(rss_mb / self.in_flight, 1.0)
+
+            if available_mb is None:
+                reason = "memory unavailable; holding"
+            elif available_mb < self.reserve_mb:
+                self.limit = max(self.min_limit, self.limit // 2)
+                reason = "below reserve; backing off"
+            elif self.waiting and self.in_flight >= self.limit and available_mb - self.per_job_mb >= self.reserve_mb:
+                self.limit = min(self.max_limit, self.limit + 1)
+                reason = "queued work and headroom; growing"
+            else:
+                reason = "steady"
+
+            decision = Decision(time.time(), old_limit, self.limit, reason, available_mb, rss_mb, self.in_flight)
+            self.decisions.append(decision)
+            if self.on_decision:
+                self.on_decision(decision)
+            if self.limit > old_limit:
+                self._cond.notify_all()
+            return decision
+
+
+def map_concurrent(func, items, controller, on_interrupt=None):
+    """Call func on each item with at most controller.limit calls in flight.
+
+    Results are returned in input order. The first exception raised by func
+    is re-raised once every started call has finished. If the wait is
+    interrupted (Ctrl+C), calls not yet started are cancelled and
+    on_interrupt is called so in-flight calls can be stopped rather than
+    waited for.
+    """
+    def guarded(item):
+        with controller:
+            return func(item)
+
+    executor = ThreadPoolExecutor(max_workers=controller.max_limit)
+    try:
+        return list(executor.map(guarded, items))
+    except (KeyboardInterrupt, SystemExit):
+        executor.shutdown(wait=False, cancel_futures=True)
+        if on_interrupt:
+            on_interrupt()
+        raise
+    finally:
+        executor.shutdown(wait=True)
@@ -1,7 +1,21 @@
 from jinja2 import Environment, FileSystemLoader
 from pathlib import Path
+import base64
+import functools
+import hashlib
+import mimetypes
+import os
 import shutil
 import sys
+import tempfile
+from typing import NamedTuple
+
+from memory_profile import PROFILER
+from metrics import REGISTRY
+from render_bundle import write_bundle
+
+RENDER_SECONDS = REGISTRY.histogram("xmtl_render_seconds", "Time to render one transmittal's HTML pages.")
+PAGES_RENDERED = REGISTRY.counter("xmtl_pages_rendered_total", "HTML pages rendered.")
 
 
 def _resource_root() -> Path:
@@ -10,18 +24,93 @@ def _resource_root() -> Path:
     return Path(__file__).resolve().parent
 
 
-def _ensure_runtime_assets() -> None:
+# Only the files the templates reference are cached; Thumbs.db and images.zip stay behind
+ASSET_IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg", ".gif", ".svg"}
+
+
+def _asset_cache_root() -> Path:
+    """Per-user directory that holds extracted template assets.
+
+    XMTL_ASSET_CACHE overrides the location; otherwise LOCALAPPDATA is used on
+    Windows and XDG_CACHE_HOME (or ~/.cache) elsewhere.
+    """
+    override = os.environ.get("XMTL_ASSET_CACHE")
+    if override:
+        return Path(override)
+    if sys.platform.startswith("win") and os.environ.get("LOCALAPPDATA"):
+        return Path(os.environ["LOCALAPPDATA"]) / "xmtl_factory" / "assets"
+    return Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "xmtl_factory" / "assets"
+
+
+def _bundled_assets() -> dict:
+    """Map each template asset's relative path (e.g. 'images/UCSC Emblem.png') to its bundled file."""
     resource_root = _resource_root()
+    assets = {"styles.css": resource_root / "styles.css"}
+    images = resource_root / "images"
+    if images.is_dir():
+        for path in sorted(images.iterdir()):
+            if path.is_file() and path.suffix.lower() in ASSET_IMAGE_SUFFIXES:
+                assets[f"images/{path.name}"] = path
+    return assets
+
+
+@functools.lru_cache(maxsize=None)
+def asset_cache_dir() -> Path:
+    """Return the cache directory for the current bundled assets, extracting them once.
+
+    The directory is named after a content hash of the assets, so an upgraded
+    install (new CSS or images) gets a fresh directory and stale copies are
+    never served. Extraction goes to a temporary sibling that is renamed into
+    place, so concurrent first runs cannot observe a half-populated cache.
+    """
+    assets = _bundled_assets()
+    digest = hashlib.sha256()
+    for relative_name, path in sorted(assets.items()):
+        digest.update(relative_name.encode("utf-8") + b"\0" + path.read_bytes() + b"\0")
+    cache_dir = _asset_cache_root() / digest.hexdigest()[:16]
+    if cache_dir.is_dir():
+        return cache_dir
+
+    cache_dir.parent.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(prefix=".extract-", dir=cache_dir.parent))
+    for relative_name, path in assets.items():
+        target = staging / relative_name
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(path, target)
+    try:
+        os.rename(staging, cache_dir)
+    except OSError:
+        # another process finished extracting first
+        shutil.rmtree(staging, ignore_errors=True)
+    return cache_dir
+
+
+def _find_asset(relative_name: str) -> Path:
+    """Resolve a template asset reference to its file in the asset cache.
+
+    Templates reference images with lowercase extensions while the files on
+    disk use '.PNG', which only works on case-insensitive filesystems, so the
+    lookup is case-insensitive.
+    """
+    cache_dir = asset_cache_dir()
+    for bundled_name in _bundled_assets():
+        if bundled_name.lower() == relative_name.lower():
+            return cache_dir / bundled_name
+    raise RuntimeError(f"Missing template asset: {relative_name}")
+
 
-    source_styles = resource_root / "styles.css"
-    target_styles = Path("styles.css")
-    if source_styles.exists() and not target_styles.exists():
-        shutil.copy2(source_styles, target_styles)
+@functools.lru_cache(maxsize=None)
+def file_asset_url(relative_name: str) -> str:
+    """Absolute file:// URI of a cached asset."""
+    return _find_asset(relative_name).as_uri()
 
-    source_images = resource_root / "images"
-    target_images = Path("images")
-    if source_images.exists() and not target_images.exists():
-        shutil.copytree(source_images, target_images)
+
+@functools.lru_cache(maxsize=None)
+def inline_asset_url(relative_name: str) -> str:
+    """data: URI embedding a cached asset, so the browser loads no extra files."""
+    path = _find_asset(relative_name)
+    mime_type = mimetypes.guess_type(path.name.lower())[0] or "application/octet-stream"
+    return f"data:{mime_type};base64,{base64.b64encode(path.read_bytes()).decode('ascii')}"
 
 
 env = Environment(loader=FileSystemLoader(str(_resource_root() / "templates")))
@@ -31,15 +120,44 @@ template_1 = env.get_template('Page1.HTML')
 template_2 = env.get_template('Page2.HTML')
 template_3 = env.get_template('Page3.HTML')
 
-# Render outputs
-def render_output(dictionary):
-    _ensure_runtime_assets()
 
-    # Clean up old output files
-    for old_file in Path('.').glob('output_*.html'):
-        old_file.unlink()
-    
-    HTML_FILES = []
+class RenderedPage(NamedTuple):
+    html: str
+    page_hash: str  # SHA-256 hex digest of html
+
+
+# Page 2 (EDP and first reviewers) and Page 3 (groups of four reviewers) recur
+# across a project's submittals; the cover page rarely does, hence the bound
+PAGE_CACHE_SIZE = 512
+
+
+@functools.lru_cache(maxsize=PAGE_CACHE_SIZE)
+def _render_page_cached(template_name, slot_items, asset_url):
+    templates = {'Page1.HTML': template_1, 'Page2.HTML': template_2, 'Page3.HTML': template_3}
+    html = templates[template_name].render(**dict(slot_items), asset_url=asset_url)
+    return RenderedPage(html, hashlib.sha256(html.encode("utf-8")).hexdigest())
+
+
+def render_page(template_name, slots, asset_url=file_asset_url):
+    """Render one page template, returning its HTML and page hash.
+
+    Results are memoized by template name, slot values and asset URL style,
+    so a page with the same content is rendered and hashed once per process.
+    """
+    return _render_page_cached(template_name, tuple(sorted(slots.items())), asset_url)
+
+
+render_page.cache_info = _render_page_cached.cache_info
+render_page.cache_clear = _render_page_cached.cache_clear
+
+
+def plan_pages(dictionary):
+    """Work out which pages a render dictionary produces, without rendering them.
+
+    Returns a list of (output_name, template_name, slots) tuples in page order,
+    where slots is the dictionary passed to that page's template.
+    """
+    pages = []
     # create list of reviewer names & remove from main dictionary 
     remaining_distribution_emails = [
         value for key, value in dictionary.items() if key.startswith('Reviewer_Name')
@@ -50,13 +168,10 @@ def render_output(dictionary):
         key: value for key, value in dictionary.items() if not key.startswith('Reviewer_Name')
     }
 
-    # Render page 1
-    output_page1 = template_1.render(**dictionary)
-    with open('output_page1.html', 'w') as f:
-        f.write(output_page1)
-    HTML_FILES.append('output_page1.html')
+    # Page 1 is always generated
+    pages.append(('output_page1.html', 'Page1.HTML', dictionary))
 
-    # Render page 2 only if EDP information is included
+    # Page 2 only if EDP information is included
     if dictionary['EDP_Address_Line_1']:
         consultant_review_dict = {
             'EDP_Address_Line_1': dictionary['EDP_Address_Line_1'],       
@@ -74,10 +189,7 @@ def render_output(dictionary):
             # if there are still remaining distribution emails, add them to the consultant review dict
             consultant_review_dict['Reviewer_Name_3'] = remaining_distribution_emails.pop(0)
 
-        output_page2 = template_2.render(**consultant_review_dict)
-        with open('output_page2.html', 'w') as f:
-            f.write(output_page2)
-        HTML_FILES.append('output_page2.html')
+        pages.append(('output_page2.html', 'Page2.HTML', consultant_review_dict))
 
     #while there are still emails in the distribution list, create a reviewers transmittals ensuring there is
     # at least one additional blank reviewer review slot
@@ -95,12 +207,84 @@ def render_output(dictionary):
         if remaining_distribution_emails:
             reviewer_xmtl_dict['Reviewer_Name_4'] = remaining_distribution_emails.pop(0)
 
-        output_page3 = template_3.render(**reviewer_xmtl_dict)
-        with open(f'output_page3_{reviewer_xmtl_pages}.html', 'w') as f:
-            f.write(output_page3)
-        HTML_FILES.append(f'output_page3_{reviewer_xmtl_pages}.html')
-    
+        pages.append((f'output_page3_{reviewer_xmtl_pages}.html', 'Page3.HTML', reviewer_xmtl_dict))
+
+    return pages
+
+
+def render_pages(dictionary, inline_assets=False):
+    """Render every page of the transmittal in memory.
+
+    Returns a list of (output_name, template_name, RenderedPage) tuples in
+    page order; see render_page().
+    """
+    asset_url = inline_asset_url if inline_assets else file_asset_url
+    with RENDER_SECONDS.time(), PROFILER.stage("render"):
+        pages = [
+            (output_name, template_name, render_page(template_name, slots, asset_url))
+            for output_name, template_name, slots in plan_pages(dictionary)
+        ]
+    PAGES_RENDERED.inc(len(pages))
+    return pages
+
+
+# Render outputs
+def render_output(dictionary, bundle_dir=None, final_pdf_name=None, inline_assets=False, work_dir=None):
+    """Render every page of the transmittal to HTML.
+
+    By default the pages are written to work_dir (the current directory if
+    not given) and reference
+    the stylesheet and images in the per-user asset cache by absolute file://
+    URI; the list of HTML filenames is returned. With inline_assets=True the
+    assets are embedded as data: URIs instead, so the browser performs no
+    extra file loads per page.
+
+    If bundle_dir is given, a self-contained job bundle is written there
+    instead: assets are always inlined, and a plan.json records the page order
+    and final_pdf_name so the bundle can be converted later, on another
+    machine, with html_to_pdf.convert_bundles(). The HTML paths inside the
+    bundle are returned.
+    """
+    if bundle_dir is not None and not final_pdf_name:
+        raise ValueError("final_pdf_name is required when writing a render bundle")
+
+    pages = [(output_name, template_name, page.html)
+             for output_name, template_name, page in render_pages(dictionary, inline_assets or bundle_dir is not None)]
+
+    if bundle_dir is not None:
+        return write_bundle(bundle_dir, final_pdf_name, pages)
+
+    work_dir = Path(work_dir) if work_dir is not None else Path('.')
+
+    # Clean up old output files
+    for old_file in work_dir.glob('output_*.html'):
+        old_file.unlink()
+
+    HTML_FILES = []
+    for output_name, _, html in pages:
+        with open(work_dir / output_name, 'w', encoding='utf-8') as f:
+            f.write(html)
+        HTML_FILES.append(output_name if work_dir == Path('.') else str(work_dir / output_name))
+
     return HTML_FILES
-    
 
 
+def _asset_cache_hit_ratio():
+    hits = misses = 0
+    for cached in (file_asset_url, inline_asset_url):
+        info = cached.cache_info()
+        hits, misses = hits + info.hits, misses + info.misses
+    return hits / (hits + misses) if hits + misses else None
+
+
+REGISTRY.gauge("xmtl_cache_hit_ratio", "Hit ratio of in-process caches.").set_function(
+    _asset_cache_hit_ratio, cache="asset_urls")
+
+
+def _page_cache_hit_ratio():
+    info = render_page.cache_info()
+    return info.hits / (info.hits + info.misses) if info.hits + info.misses else None
+
+
+REGISTRY.gauge("xmtl_cache_hit_ratio", "Hit ratio of in-process caches.").set_function(
+    _page_cache_hit_ratio, cache="pages")
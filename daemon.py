@@ -0,0 +1,269 @@
+"""Resident background process that keeps the rendering stack warm for the CLI.
+
+Every CLI launch pays for interpreter startup, importing the PDF and
+template libraries, compiling the page templates, parsing
+xmtl_templates.yaml and finding Edge. `submittal_cli.py daemon start` runs a
+process that does all of that once and then waits for requests; while it is
+running, the interactive CLI collects its prompts locally and sends each
+confirmed submittal to the daemon to be rendered and converted. The page
+and image caches stay warm between runs as well. The client still consults
+and updates the transmittal registry itself, a quick SQLite query.
+
+The daemon listens with multiprocessing.connection: a Unix domain socket on
+POSIX and a named pipe on Windows (which has no AF_UNIX support in Python),
+both private to the current user. Connections are authenticated with a
+random key written to a file only the user can read.
+
+Requests are (operation, arguments) pairs and replies are dicts with 'ok';
+a failed request replies with the exception type and message, which
+DaemonClient raises again on the client side.
+"""
+import getpass
+import os
+import secrets
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from multiprocessing.connection import AuthenticationError, Client, Listener
+from pathlib import Path
+
+from metrics import REGISTRY
+
+REQUESTS = REGISTRY.counter("xmtl_daemon_requests_total", "Requests handled by the resident daemon.")
+START_TIMEOUT = 15.0
+
+
+def daemon_dir() -> Path:
+    """Per-user folder for the daemon's socket and key; XMTL_DAEMON_DIR overrides it."""
+    override = os.environ.get("XMTL_DAEMON_DIR")
+    if override:
+        return Path(override)
+    if sys.platform.startswith("win") and os.environ.get("LOCALAPPDATA"):
+        return Path(os.environ["LOCALAPPDATA"]) / "xmtl_factory"
+    return Path(os.environ.get("XDG_RUNTIME_DIR") or Path.home() / ".cache") / "xmtl_factory"
+
+
+def daemon_address():
+    """The socket path (POSIX) or pipe name (Windows) the daemon listens on."""
+    if sys.platform.startswith("win"):
+        return rf"\\.\pipe\xmtl_factory-{getpass.getuser()}"
+    return str(daemon_dir() / "daemon.sock")
+
+
+def _key_path():
+    return daemon_dir() / "daemon.key"
+
+
+def _new_key():
+    key = secrets.token_bytes(32)
+    path = _key_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(key)
+    return key
+
+
+class DaemonError(RuntimeError):
+    """The daemon could not be started, reached or stopped."""
+
+
+class DaemonClient:
+    """Connection to a running daemon. Use connect() to get one."""
+
+    def __init__(self, connection):
+        self._conn = connection
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def close(self):
+        self._conn.close()
+
+    def request(self, operation, **arguments):
+        """Send one request and return the reply, re-raising a ValueError or RuntimeError from the daemon."""
+        with self._lock:
+            try:
+                self._conn.send((operation, arguments))
+                reply = self._conn.recv()
+            except (EOFError, OSError) as exc:
+                raise DaemonError(f"Lost the connection to the daemon: {exc or 'closed'}") from exc
+        if not reply.pop("ok"):
+            error = ValueError if reply["error"] == "ValueError" else RuntimeError
+            raise error(reply["message"])
+        return reply
+
+    def status(self):
+        """{'pid', 'started', 'requests'} of the daemon."""
+        return self.request("status")
+
+    def templates(self, path):
+        """The templates at path, saved entries included (parsed again only when they change)."""
+        return self.request("templates", path=str(path))["templates"]
+
+    def generate(self, build, final_pdf_name, inline_assets=False, pdf_options=None):
+        """Render and print build in the daemon and return the final PDF path."""
+        reply = self.request("generate", fields=build.to_dict(), final_pdf_name=final_pdf_name,
+                             inline_assets=inline_assets, pdf_options=pdf_options)
+        return Path(reply["path"])
+
+    def shutdown(self):
+        self.request("shutdown")
+
+
+def connect():
+    """Return a DaemonClient for the running daemon, or None if there is none."""
+    address = daemon_address()
+    if not sys.platform.startswith("win") and not Path(address).exists():
+        return None
+    try:
+        key = _key_path().read_bytes()
+        return DaemonClient(Client(address, authkey=key))
+    except (OSError, EOFError, AuthenticationError):
+        return None
+
+
+class DaemonServer:
+    """Serves requests on daemon_address() until shut down, or idle for idle_timeout seconds if given."""
+
+    def __init__(self, idle_timeout=None):
+        self.idle_timeout = idle_timeout
+        self.address = daemon_address()
+        self.started = time.time()
+        self.requests = 0
+        self._connections = 0
+        self._last_request = time.monotonic()
+        self._templates = {}
+        self._stopping = threading.Event()
+        self._listener = None
+
+    def warm(self):
+        """Do the per-launch work once: import the PDF stack, find Edge, extract the template assets."""
+        import html_to_pdf
+        from custom_fill import asset_cache_dir
+
+        html_to_pdf.discover_edge_path()
+        asset_cache_dir()
+
+    def serve_forever(self):
+        if (client := connect()) is not None:
+            client.close()
+            raise DaemonError(f"A daemon is already listening on {self.address}")
+        if not sys.platform.startswith("win"):
+            Path(self.address).parent.mkdir(parents=True, exist_ok=True)
+            Path(self.address).unlink(missing_ok=True)  # left by a daemon that did not exit cleanly
+        self._listener = Listener(self.address, authkey=_new_key())
+        if self.idle_timeout:
+            threading.Thread(target=self._watch_idle, daemon=True).start()
+        try:
+            while not self._stopping.is_set():
+                try:
+                    connection = self._listener.accept()
+                except (OSError, EOFError, AuthenticationError):
+                    continue
+                threading.Thread(target=self._serve_connection, args=(connection,), daemon=True).start()
+        finally:
+            self._listener.close()
+            _key_path().unlink(missing_ok=True)
+
+    def stop(self):
+        """Stop accepting connections; the accept loop is woken by a connection of our own."""
+        self._stopping.set()
+        with DaemonClient(Client(self.address, authkey=_key_path().read_bytes())):
+            pass
+
+    def _watch_idle(self):
+        while not self._stopping.wait(min(self.idle_timeout, 5)):
+            # an interactive session can sit at a prompt for a long time; only idle with no one connected
+            if not self._connections and time.monotonic() - self._last_request > self.idle_timeout:
+                self.stop()
+
+    def _serve_connection(self, connection):
+        self._connections += 1
+        try:
+            with connection:
+                while True:
+                    try:
+                        operation, arguments = connection.recv()
+                    except (EOFError, OSError):
+                        return
+                    connection.send(self.dispatch(operation, arguments))
+        finally:
+            self._connections -= 1
+            self._last_request = time.monotonic()
+
+    def dispatch(self, operation, arguments):
+        self._last_request = time.monotonic()
+        self.requests += 1
+        REQUESTS.inc(operation=operation)
+        handler = getattr(self, f"_do_{operation}", None)
+        if handler is None:
+            return {"ok": False, "error": "ValueError", "message": f"Unknown daemon operation {operation!r}"}
+        try:
+            return {"ok": True, **handler(**arguments)}
+        except Exception as exc:
+            return {"ok": False, "error": type(exc).__name__, "message": str(exc)}
+
+    def _do_status(self):
+        return {"pid": os.getpid(), "started": self.started, "requests": self.requests}
+
+    def _do_templates(self, path):
+        from template_store import load_templates, templates_stamp
+
+        stamp = templates_stamp(path)
+        cached = self._templates.get(path)
+        if cached is None or cached[0] != stamp:
+            cached = self._templates[path] = (stamp, load_templates(path))
+        return {"templates": cached[1]}
+
+    def _do_generate(self, fields, final_pdf_name, inline_assets=False, pdf_options=None):
+        from custom_fill import render_output
+        from html_to_pdf import create_final_pdf
+        from submittal_cli import XmtlBuild
+
+        build = XmtlBuild(**fields)
+        if missing := build.validate():
+            raise ValueError(f"Missing required fields: {missing}")
+        # each request gets its own work folder, so two clients never share page files
+        with tempfile.TemporaryDirectory(prefix="xmtl-daemon-") as work_dir:
+            html_files = render_output(build.to_render_dict(), inline_assets=inline_assets, work_dir=work_dir)
+            final_path = create_final_pdf(final_pdf_name, html_files, pdf_options=pdf_options,
+                                          input_hash=build.input_hash())
+        return {"path": str(final_path)}
+
+    def _do_shutdown(self):
+        threading.Thread(target=self.stop, daemon=True).start()
+        return {}
+
+
+def start_background(command, log_path=None):
+    """Launch command (argv that runs the daemon in the foreground) detached, and wait until it answers.
+
+    Returns the daemon's status. Raises DaemonError if it does not come up
+    within START_TIMEOUT seconds.
+    """
+    log_path = Path(log_path) if log_path else daemon_dir() / "daemon.log"
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    if sys.platform.startswith("win"):
+        detach = {"creationflags": subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP}
+    else:
+        detach = {"start_new_session": True}
+    with open(log_path, "ab") as log:
+        process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT,
+                                   **detach)
+    deadline = time.monotonic() + START_TIMEOUT
+    while time.monotonic() < deadline:
+        if (client := connect()) is not None:
+            with client:
+                return client.status()
+        if process.poll() is not None:
+            raise DaemonError(f"The daemon exited with status {process.returncode}; see {log_path}")
+        time.sleep(0.1)
+    raise DaemonError(f"The daemon did not start within {START_TIMEOUT:.0f}s; see {log_path}")
@@ -0,0 +1,105 @@
+"""A stand-in for headless Edge, for tests, benchmarks and load tests on machines without a browser.
+
+It accepts the same command line convert_html() gives Edge, reads the HTML
+page, and writes a small but valid PDF with one page, plus one more for each
+forced page break (page-break-after: always / break-after: page) in the
+HTML. Select it with XMTL_BROWSER=fake (or point EDGE_PATH at this file);
+discover_edge_path() then returns it and every command that prints PDFs
+uses it.
+
+Behaviour is set through environment variables, which the browser process
+inherits:
+
+    XMTL_FAKE_LATENCY     Seconds per print: a number, or 'low:high' for a
+                          uniform range. Default 0.
+    XMTL_FAKE_FAILURE     Probability (0-1) that a print crashes with exit
+                          status 1 and no PDF. Default 0.
+    XMTL_FAKE_MEMORY_MB   Resident memory to hold for the duration of the print.
+    XMTL_FAKE_HELPERS     Helper processes to start and leave running, as
+                          Edge's renderer and GPU processes do.
+    XMTL_FAKE_SEED        Seed for the failure and latency draws; with a seed,
+                          a given page always fails or always succeeds.
+"""
+import os
+import random
+import re
+import subprocess
+import sys
+import time
+from pathlib import Path
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+
+PAGE_BREAK = re.compile(r"(?:page-break-after|break-after)\s*:\s*(?:always|page)", re.IGNORECASE)
+LETTER = (612, 792)
+
+
+def count_pages(html):
+    return 1 + len(PAGE_BREAK.findall(html))
+
+
+def minimal_pdf(page_count, size=LETTER):
+    """Return the bytes of a valid PDF with page_count blank pages."""
+    width, height = size
+    page_ids = [3 + n for n in range(page_count)]
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [" + b" ".join(b"%d 0 R" % n for n in page_ids) + b"] /Count %d >>" % page_count,
+    ]
+    objects.extend(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] >>" % (width, height) for _ in page_ids)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def _latency(spec, rng):
+    if not spec:
+        return 0.0
+    low, _, high = spec.partition(":")
+    return rng.uniform(float(low), float(high)) if high else float(low)
+
+
+def _hold_memory(megabytes):
+    buffer = bytearray(megabytes * 1024 * 1024)
+    for offset in range(0, len(buffer), 4096):
+        buffer[offset] = 1  # touch every page so it is resident, not just reserved
+    return buffer
+
+
+def _start_helpers(count):
+    for _ in range(count):
+        subprocess.Popen([sys.executable, "-c", "import time; time.sleep(3600)"],
+                         stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def main(argv):
+    output = next((arg.split("=", 1)[1] for arg in argv if arg.startswith("--print-to-pdf=")), None)
+    url = next((arg for arg in argv if not arg.startswith("--")), None)
+    if output is None or url is None:
+        print("usage: fake_browser.py [--flags] --print-to-pdf=OUTPUT file:///page.html", file=sys.stderr)
+        return 2
+
+    seed = os.environ.get("XMTL_FAKE_SEED")
+    rng = random.Random(f"{seed}:{url}" if seed else None)
+    _start_helpers(int(os.environ.get("XMTL_FAKE_HELPERS", "0")))
+    held = _hold_memory(int(os.environ.get("XMTL_FAKE_MEMORY_MB", "0")))
+    time.sleep(_latency(os.environ.get("XMTL_FAKE_LATENCY"), rng))
+    if rng.random() < float(os.environ.get("XMTL_FAKE_FAILURE", "0")):
+        return 1
+
+    html = Path(url2pathname(urlparse(url).path)).read_text(encoding="utf-8", errors="replace")
+    Path(output).write_bytes(minimal_pdf(count_pages(html)))
+    del held
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,10 +1,42 @@
+import hashlib
 import os
 import shutil
 import subprocess
 import sys
+import tempfile
+from datetime import datetime, timezone
+from io import BytesIO
 from pathlib import Path
 
 from pypdf import PdfWriter
+from pypdf.generic import ArrayObject, ByteStringObject
+
+from concurrency import map_concurrent
+from memory_profile import PROFILER
+from metrics import REGISTRY
+from optimize_pdf import DEFAULT_DPI, optimize_writer, optimizer_available, serialize
+from output_sink import as_sink
+from pdf_options import PdfOptions
+from process_tree import kill_process_trees, run_process_tree
+from resilience import CircuitOpenError, ConversionTimeout, ResilientConverter, TransientConversionError
+from render_bundle import claim_bundle, pending_bundles, read_bundle
+
+try:
+    import pikepdf
+except ImportError:
+    pikepdf = None
+
+
+JOBS = REGISTRY.counter("xmtl_jobs_total", "Final PDFs requested, by outcome (done, skipped, failed).")
+PAGES_CONVERTED = REGISTRY.counter("xmtl_pages_converted_total", "HTML pages printed to PDF.")
+PAGE_FAILURES = REGISTRY.counter("xmtl_page_failures_total",
+                                 "Failed page prints, by reason (timeout, crash, empty, missing_input).")
+CONVERT_SECONDS = REGISTRY.histogram("xmtl_convert_seconds", "Time to print one HTML page with the browser.")
+MERGE_SECONDS = REGISTRY.histogram("xmtl_merge_seconds", "Time to merge a transmittal's page PDFs.")
+WRITE_SECONDS = REGISTRY.histogram("xmtl_write_seconds", "Time to write a final PDF to the output folder.")
+OPTIMIZE_SECONDS = REGISTRY.histogram("xmtl_optimize_seconds", "Time to downsample images in a merged PDF.")
+BYTES_SAVED = REGISTRY.counter("xmtl_optimize_saved_bytes_total", "Bytes removed from final PDFs by optimization.")
+CONVERSIONS_IN_FLIGHT = REGISTRY.gauge("xmtl_conversions_in_flight", "Browser prints currently running.")
 
 
 def _edge_paths_from_registry():
@@ -35,7 +67,21 @@ def _edge_paths_from_registry():
     return found_paths
 
 
+def _fake_browser_path():
+    return Path(__file__).resolve().parent / "fake_browser.py"
+
+
+def browser_command(edge_path):
+    """The argv prefix that runs edge_path; Python scripts such as fake_browser.py run under this interpreter."""
+    edge_path = Path(edge_path)
+    return [sys.executable, str(edge_path)] if edge_path.suffix == ".py" else [str(edge_path)]
+
+
 def discover_edge_path():
+    # XMTL_BROWSER=fake swaps in the stand-in browser for tests and benchmarks
+    if os.environ.get("XMTL_BROWSER", "").lower() == "fake":
+        return _fake_browser_path()
+
     env_path = os.environ.get("EDGE_PATH")
     candidates = []
     if env_path:
@@ -72,66 +118,221 @@ def discover_edge_path():
     )
 
 
-def convert_html(input_html, output_pdf_name, edge_path):
+def convert_html(input_html, output_pdf_name, edge_path, timeout=30):
     input_path = Path(input_html).resolve()
     output_path = Path(output_pdf_name).resolve()
 
     if not input_path.exists():
+        PAGE_FAILURES.inc(reason="missing_input")
         raise RuntimeError(f"Missing HTML input file: {input_html}")
 
     try:
-        subprocess.run(
-            [
-                str(edge_path),
-                "--headless=new",
-                "--disable-gpu",
-                "--allow-file-access-from-files",
-                "--print-to-pdf-no-header",
-                f"--print-to-pdf={output_path}",
-                input_path.as_uri(),
-            ],
-            check=True,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-            timeout=30,
-        )
+        # Edge's helper processes are killed with it, even on timeout or Ctrl+C
+        with CONVERSIONS_IN_FLIGHT.track_in_progress(), CONVERT_SECONDS.time(), PROFILER.stage("convert"):
+            run_process_tree(
+                [
+                    *browser_command(edge_path),
+                    "--headless=new",
+                    "--disable-gpu",
+                    "--allow-file-access-from-files",
+                    "--print-to-pdf-no-header",
+                    f"--print-to-pdf={output_path}",
+                    input_path.as_uri(),
+                ],
+                timeout=timeout,
+            )
     except subprocess.TimeoutExpired as exc:
-        raise RuntimeError(f"Edge PDF conversion timed out for '{input_html}'") from exc
+        PAGE_FAILURES.inc(reason="timeout")
+        raise ConversionTimeout(f"Edge PDF conversion timed out after {timeout:.0f}s for '{input_html}'") from exc
     except subprocess.CalledProcessError as exc:
-        raise RuntimeError(f"Edge PDF conversion failed for '{input_html}'") from exc
+        PAGE_FAILURES.inc(reason="crash")
+        raise TransientConversionError(f"Edge PDF conversion failed for '{input_html}'") from exc
 
     if not output_path.exists() or output_path.stat().st_size == 0:
-        raise RuntimeError(f"Edge did not produce a valid PDF for '{input_html}'")
+        PAGE_FAILURES.inc(reason="empty")
+        raise TransientConversionError(f"Edge did not produce a valid PDF for '{input_html}'")
 
+    PAGES_CONVERTED.inc()
     print(f"Converted '{input_html}' → '{output_pdf_name}'")
     return output_path
 
+# Page keys browsers and editors use for timestamps and per-save metadata
+VOLATILE_PAGE_KEYS = ("/LastModified", "/PieceInfo", "/Metadata")
+
+
+def _pdf_date(moment):
+    return moment.astimezone(timezone.utc).strftime("D:%Y%m%d%H%M%SZ")
+
+
+def _source_date():
+    epoch = os.environ.get("SOURCE_DATE_EPOCH")
+    return datetime.fromtimestamp(int(epoch), tz=timezone.utc) if epoch else None
+
+
+def make_deterministic(writer, timestamp=None):
+    """Normalise a merged PdfWriter so identical content always serialises to identical bytes.
+
+    pypdf numbers objects in the order it walks the appended pages, so the
+    numbering is already stable for identical input; what varies between runs
+    is metadata. This fixes the document information dictionary, strips
+    volatile page keys, and sets both /ID entries to an MD5 of the document
+    written without an ID.
+    """
+    for page in writer.pages:
+        for key in VOLATILE_PAGE_KEYS:
+            if key in page:
+                del page[key]
+
+    metadata = {"/Producer": "xmtl-factory"}
+    timestamp = timestamp or _source_date()
+    if timestamp:
+        metadata["/CreationDate"] = metadata["/ModDate"] = _pdf_date(timestamp)
+    writer.metadata = metadata
+
+    # pypdf has no public setter for the trailer /ID, so it is assigned directly
+    writer._ID = None
+    probe = BytesIO()
+    writer.write(probe)
+    identifier = ByteStringObject(hashlib.md5(probe.getvalue()).digest())
+    writer._ID = ArrayObject([identifier, identifier])
+
+
+def linearizer_available():
+    """True if linearize_pdf() can run: pikepdf is installed or qpdf is on PATH."""
+    return pikepdf is not None or shutil.which("qpdf") is not None
+
+
+def linearize_pdf(data, deterministic=False):
+    """Return the PDF in data rewritten as a linearized PDF.
+
+    pypdf cannot write linearized files, so this goes through qpdf: the
+    pikepdf bindings when installed (pip install .[linearize]), otherwise the
+    qpdf command line tool. With deterministic, the /ID is derived from the
+    content so identical input still gives identical bytes.
+    """
+    if pikepdf is not None:
+        output = BytesIO()
+        try:
+            with pikepdf.open(BytesIO(data)) as pdf:
+                pdf.save(output, linearize=True, deterministic_id=deterministic)
+        except pikepdf.PdfError as exc:
+            raise RuntimeError(f"Could not linearize the merged PDF: {exc}") from exc
+        return output.getvalue()
+
+    qpdf = shutil.which("qpdf")
+    if qpdf is None:
+        raise RuntimeError("Linearized output needs pikepdf (pip install .[linearize]) or qpdf on PATH")
+    with tempfile.TemporaryDirectory(prefix="xmtl-linearize-") as work_dir:
+        source, target = Path(work_dir) / "merged.pdf", Path(work_dir) / "linearized.pdf"
+        source.write_bytes(data)
+        command = [qpdf, "--linearize", *(["--deterministic-id"] if deterministic else []), str(source), str(target)]
+        result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        # exit status 3 means qpdf succeeded with warnings
+        if result.returncode not in (0, 3):
+            raise RuntimeError(f"Could not linearize the merged PDF: {result.stderr.strip()}")
+        return target.read_bytes()
+
+
+# Shared by every conversion in the process, so latency history and circuit state carry across transmittals
+conversion_guard = ResilientConverter()
+
+REGISTRY.counter("xmtl_conversion_retries_total", "Page prints retried after a transient failure.").set_function(
+    lambda: conversion_guard.metrics.counts["retries"])
+REGISTRY.counter("xmtl_conversions_rejected_total", "Page prints rejected while the circuit breaker was open.") \
+    .set_function(lambda: conversion_guard.metrics.counts["short_circuited"])
+REGISTRY.gauge("xmtl_conversion_timeout_seconds", "Timeout currently applied to a first print attempt.") \
+    .set_function(lambda: conversion_guard.latency.timeout())
+REGISTRY.gauge("xmtl_circuit_open", "1 while the conversion circuit breaker rejects prints, else 0.") \
+    .set_function(lambda: int(conversion_guard.breaker.state != "closed"))
+
+
 # converts each html file to a pdf and merges them into a single final pdf
-def create_final_pdf(final_pdf_name, HTML_FILES):
+def create_final_pdf(final_pdf_name, HTML_FILES, output_dir=None, concurrency=None, pdf_options=None,
+                     input_hash=None):
+    """Convert HTML_FILES to PDF, merge them in order, and write final_pdf_name.
+
+    output_dir is a folder (~/Downloads by default) or an
+    output_sink.OutputSink, which also sets the collision policy; the merged
+    PDF is written to a temporary file and renamed into place. A
+    zip_sink.ZipSink adds it to an archive instead, recording input_hash. Pages are
+    converted one at a time unless concurrency, a
+    concurrency.AdaptiveConcurrency, is given to run them in parallel.
+    Each page goes through conversion_guard, which sets its timeout, retries
+    transient failures and fails fast while the browser is broken.
+    pdf_options (a PdfOptions) controls how the merged PDF is written.
+    Returns the final PDF path.
+
+    Raises:
+        RuntimeError: If an HTML file is missing or a page cannot be converted.
+    """
+    pdf_options = pdf_options or PdfOptions()
+    if pdf_options.linearize and not linearizer_available():
+        raise RuntimeError("Linearized output needs pikepdf (pip install .[linearize]) or qpdf on PATH")
+    if pdf_options.optimize and not optimizer_available():
+        raise RuntimeError("Image downsampling needs Pillow (pip install .[optimize])")
+    sink = as_sink(output_dir)
     edge_path = discover_edge_path()
 
     missing = [f for f in HTML_FILES if not Path(f).exists()]
     if missing:
-        sys.exit(f"Missing HTML files: {missing}")
+        raise RuntimeError(f"Missing HTML files: {missing}")
 
-    pdf_paths = []
-    for html in HTML_FILES:
-        pdf_name = Path(html).with_suffix(".pdf").name
-        pdf_paths.append(convert_html(html, pdf_name, edge_path))
+    if existing := sink.existing(final_pdf_name):
+        print(f"'{existing}' already exists; skipping.")
+        for html in HTML_FILES:
+            Path(html).unlink()
+        JOBS.inc(outcome="skipped")
+        return existing
 
-    writer = PdfWriter()
+    # keep intermediate PDFs next to their HTML so separate jobs never collide
+    def convert(html):
+        return conversion_guard.call(convert_html, html, str(Path(html).with_suffix(".pdf")), edge_path)
 
-    for pdf in pdf_paths:
-        if pdf is None or not pdf.exists():
-            raise RuntimeError(f"Missing PDF during merge: {pdf}")
-        writer.append(str(pdf))
+    try:
+        if concurrency is None:
+            pdf_paths = [convert(html) for html in HTML_FILES]
+        else:
+            pdf_paths = map_concurrent(convert, HTML_FILES, concurrency, on_interrupt=kill_process_trees)
+
+        with MERGE_SECONDS.time(), PROFILER.stage("merge"):
+            writer = PdfWriter()
+
+            for pdf in pdf_paths:
+                if pdf is None or not pdf.exists():
+                    raise RuntimeError(f"Missing PDF during merge: {pdf}")
+                writer.append(str(pdf))
 
-    #final_path = Path(final_pdf_name).resolve()
-    downloads_path = (Path.home() / "Downloads")
-    final_path = downloads_path / final_pdf_name
+        def finish(writer):
+            """The final bytes: made deterministic and linearized as pdf_options asks."""
+            if pdf_options.deterministic:
+                make_deterministic(writer, pdf_options.timestamp)
+            if not pdf_options.linearize:
+                return serialize(writer)
+            return linearize_pdf(serialize(writer), deterministic=pdf_options.deterministic)
 
-    with open(final_path, "wb") as f:
-        writer.write(f)
+        if pdf_options.optimize:
+            # the byte budget applies to the finished document, so it is finished inside the budget loop
+            with OPTIMIZE_SECONDS.time(), PROFILER.stage("optimize"):
+                report = optimize_writer(writer, dpi=pdf_options.image_dpi or DEFAULT_DPI,
+                                         max_bytes=pdf_options.max_bytes, finish=finish)
+            BYTES_SAVED.inc(max(report.saved_bytes, 0))
+            print(report.summary())
+
+        with WRITE_SECONDS.time(), PROFILER.stage("write"):
+            if pdf_options.optimize:
+                write_to = lambda f: f.write(report.data)
+            elif pdf_options.linearize:
+                finished = finish(writer)
+                write_to = lambda f: f.write(finished)
+            else:
+                if pdf_options.deterministic:
+                    make_deterministic(writer, pdf_options.timestamp)
+                write_to = writer.write
+            final_path = sink.write(final_pdf_name, write_to, input_hash=input_hash)
+    except Exception:
+        JOBS.inc(outcome="failed")
+        raise
+    JOBS.inc(outcome="done")
 
     # Delete temp PDFs
     for pdf in pdf_paths:
@@ -141,3 +342,44 @@ def create_final_pdf(final_pdf_name, HTML_FILES):
 
     print(f"\nFinal combined PDF created:", end=" ")
     print(final_path.resolve())
+    return final_path
+
+
+def convert_bundles(bundle_dir, output_dir=None, concurrency=None, pdf_options=None):
+    """Convert every pending render bundle in bundle_dir to a final PDF.
+
+    Each bundle is claimed by renaming it before conversion, so several
+    converters may drain the same shared folder. Converted bundles are
+    removed; bundles that fail for any reason are renamed to '<name>.failed'
+    and kept for inspection, so none is left claimed. If the circuit breaker
+    opens or the run is interrupted, the bundle is handed back unclaimed and
+    the error is raised, leaving the rest for another converter.
+
+    Returns:
+        (converted, failed): lists of final PDF paths and failed bundle paths.
+    """
+    # fail before claiming anything, so a host without a browser leaves the bundles for others
+    discover_edge_path()
+
+    converted, failed = [], []
+    for bundle in pending_bundles(bundle_dir):
+        claimed = claim_bundle(bundle)
+        if claimed is None:
+            continue
+        try:
+            final_pdf_name, html_files = read_bundle(claimed)
+            converted.append(create_final_pdf(final_pdf_name, html_files, output_dir=output_dir,
+                                               concurrency=concurrency, pdf_options=pdf_options))
+        except (CircuitOpenError, KeyboardInterrupt):
+            os.rename(claimed, bundle)
+            raise
+        except Exception as exc:
+            print(f"Failed to convert bundle '{bundle.name}': {exc}")
+            failed_path = bundle.with_name(bundle.name + ".failed")
+            if failed_path.exists():
+                shutil.rmtree(failed_path)
+            os.rename(claimed, failed_path)
+            failed.append(failed_path)
+            continue
+        shutil.rmtree(claimed)
+    return converted, failed
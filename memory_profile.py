@@ -0,0 +1,203 @@
+"""Memory diagnostics: tracemalloc snapshots around each stage of a transmittal.
+
+PROFILER is shared by the whole process and does nothing until enabled with
+--profile-memory. Once enabled, the stages that already have timing
+histograms (render, convert, merge, optimize, write) also take a
+tracemalloc snapshot on entry and exit:
+
+    with RENDER_SECONDS.time(), PROFILER.stage("render"):
+        ...
+
+For each stage the report gives the number of calls, the net change in
+traced memory, the largest single change and the source lines that
+allocated the most, plus a breakdown of everything still allocated by
+package (jinja2, pypdf, rich, ...). Loops that should return to a steady
+state (the interactive "generate another submittal" loop) call
+PROFILER.iteration() at the end of each pass; memory that keeps rising for
+GROWTH_ITERATIONS passes in a row is flagged along with the packages it grew
+in.
+
+Snapshots are process-wide, so a stage that overlaps with another thread
+(parallel page conversion) also counts that thread's allocations. Tracing
+slows Python allocation down considerably; use it for diagnosis only.
+"""
+import sysconfig
+import threading
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+
+TOP_ALLOCATORS = 5
+# Consecutive iterations of growth before it is reported
+GROWTH_ITERATIONS = 3
+# Ignore iteration-to-iteration changes smaller than this
+GROWTH_THRESHOLD = 64 * 1024
+_KEEP_LINES = 50
+
+_IGNORED = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+    tracemalloc.Filter(False, __file__),
+)
+_STDLIB = Path(sysconfig.get_paths()["stdlib"])
+
+
+def format_bytes(size, signed=False):
+    sign = ("+" if size >= 0 else "-") if signed else ("-" if size < 0 else "")
+    size = abs(size)
+    for unit in ("B", "KiB", "MiB"):
+        if size < 1024 or unit == "MiB":
+            return f"{sign}{size:.0f} {unit}" if unit == "B" else f"{sign}{size:.1f} {unit}"
+        size /= 1024
+
+
+def _site_parts(path):
+    for marker in ("site-packages", "dist-packages"):
+        if marker in path.parts:
+            return path.parts[path.parts.index(marker) + 1:]
+    return None
+
+
+def package_of(filename):
+    """The top-level package (or module) a source file belongs to, e.g. 'jinja2' or 'html_to_pdf'."""
+    path = Path(filename)
+    if parts := _site_parts(path):
+        return Path(parts[0]).stem
+    if path.is_relative_to(_STDLIB):
+        return "stdlib"
+    return path.name if path.name.startswith("<") else path.stem
+
+
+def short_location(filename, lineno):
+    """filename:lineno relative to site-packages or the standard library, e.g. 'jinja2/environment.py:1293'."""
+    path = Path(filename)
+    if parts := _site_parts(path):
+        return f"{Path(*parts).as_posix()}:{lineno}"
+    if path.is_relative_to(_STDLIB):
+        return f"{path.relative_to(_STDLIB).as_posix()}:{lineno}"
+    return f"{path.name}:{lineno}"
+
+
+@dataclass
+class StageStats:
+    calls: int = 0
+    net: int = 0
+    largest: int = 0
+    lines: Counter = field(default_factory=Counter)
+
+    def add(self, delta, lines):
+        self.calls += 1
+        self.net += delta
+        self.largest = max(self.largest, delta)
+        self.lines.update(lines)
+        if len(self.lines) > _KEEP_LINES:
+            self.lines = Counter(dict(self.lines.most_common(_KEEP_LINES)))
+
+
+class MemoryProfiler:
+    """Per-stage tracemalloc deltas and iteration growth checks; inert until enable() is called."""
+
+    def __init__(self):
+        self.enabled = False
+        self.stages = {}
+        self.growth = []
+        self._lock = threading.Lock()
+        self._iterations = []
+        self._rising = 0
+        self._rise_start = None
+        self._previous = None
+
+    def enable(self, frames=1):
+        """Start tracing (keeping frames frames per allocation) and collecting stage statistics."""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        self.enabled = True
+        self._previous = self._snapshot()
+
+    def disable(self):
+        self.enabled = False
+        tracemalloc.stop()
+
+    def _snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces(_IGNORED)
+
+    @contextmanager
+    def stage(self, name):
+        """Record the memory allocated and freed while the block runs under name."""
+        if not self.enabled:
+            yield
+            return
+        before = self._snapshot()
+        try:
+            yield
+        finally:
+            after = self._snapshot()
+            differences = after.compare_to(before, "lineno")
+            lines = {short_location(diff.traceback[0].filename, diff.traceback[0].lineno): diff.size_diff
+                     for diff in differences if diff.size_diff > 0}
+            delta = sum(diff.size_diff for diff in differences)
+            with self._lock:
+                self.stages.setdefault(name, StageStats()).add(delta, lines)
+
+    def iteration(self):
+        """Mark the end of one pass of a loop; returns a growth message when memory keeps rising, else None."""
+        if not self.enabled:
+            return None
+        snapshot = self._snapshot()
+        current = sum(stat.size for stat in snapshot.statistics("filename"))
+        self._iterations.append(current)
+        message = None
+        if len(self._iterations) > 1 and current - self._iterations[-2] > GROWTH_THRESHOLD:
+            if self._rising == 0:
+                self._rise_start = self._previous
+            self._rising += 1
+            if self._rising >= GROWTH_ITERATIONS:
+                by_package = self._by_package(snapshot.compare_to(self._rise_start, "filename"))
+                top = ", ".join(f"{package} {format_bytes(size, signed=True)}"
+                                for package, size in by_package.most_common(3) if size > 0)
+                message = (f"Memory rose in each of the last {self._rising} iterations "
+                           f"({format_bytes(current - self._iterations[-1 - self._rising], signed=True)}); "
+                           f"grew in: {top}")
+                self.growth.append(message)
+        else:
+            self._rising = 0
+        self._previous = snapshot
+        return message
+
+    @staticmethod
+    def _by_package(statistics):
+        packages = Counter()
+        for stat in statistics:
+            size = getattr(stat, "size_diff", stat.size)
+            packages[package_of(stat.traceback[0].filename)] += size
+        return packages
+
+    def report(self):
+        """A plain-text summary of every stage, the current allocations by package, and any growth found."""
+        lines = [f"Memory profile (tracemalloc): {format_bytes(tracemalloc.get_traced_memory()[0])} traced now, "
+                 f"peak {format_bytes(tracemalloc.get_traced_memory()[1])}"]
+        if self.stages:
+            lines.append(f"{'stage':<10}{'calls':>7}{'net change':>14}{'largest':>12}")
+            for name, stats in self.stages.items():
+                lines.append(f"{name:<10}{stats.calls:>7}{format_bytes(stats.net, signed=True):>14}"
+                             f"{format_bytes(stats.largest, signed=True):>12}")
+            for name, stats in self.stages.items():
+                lines.append(f"Top allocators in {name}:")
+                for line, size in stats.lines.most_common(TOP_ALLOCATORS):
+                    lines.append(f"  {format_bytes(size, signed=True):>12}  {line}")
+        packages = self._by_package(self._snapshot().statistics("filename"))
+        lines.append("Allocated now, by package:")
+        for package, size in packages.most_common(TOP_ALLOCATORS * 2):
+            lines.append(f"  {format_bytes(size):>12}  {package}")
+        if len(self._iterations) > 1:
+            lines.append("Traced memory after each iteration: "
+                         + ", ".join(format_bytes(size) for size in self._iterations))
+        lines.extend(f"WARNING: {message}" for message in self.growth)
+        return "\n".join(lines)
+
+
+PROFILER = MemoryProfiler()
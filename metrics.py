@@ -0,0 +1,283 @@
+"""In-process metrics with Prometheus text exposition.
+
+Modules declare their metrics on the shared REGISTRY at import time and
+update them as they work. Long-running commands expose the registry over a
+local HTTP endpoint (serve()) or write it to a file every few seconds
+(FileDumper), for example into node_exporter's textfile collector folder.
+
+    RENDER_SECONDS = REGISTRY.histogram("xmtl_render_seconds", "Time to render one transmittal's HTML pages.")
+    with RENDER_SECONDS.time():
+        ...
+
+Counters and gauges may also be backed by a function that is called at
+collection time, for values that already live elsewhere (queue depth, cache
+statistics).
+"""
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from output_sink import create_temp_file
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _format_value(value):
+    value = float(value) if isinstance(value, bool) else value
+    if isinstance(value, float):
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        if value.is_integer() and abs(value) < 1e15:
+            return str(int(value))
+        return repr(value)
+    return str(value)
+
+
+def _escape_help(text):
+    return text.replace("\\", "\\\\").replace("\n", " ")
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._functions = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(labels):
+        return tuple(sorted(labels.items()))
+
+    def set_function(self, function, **labels):
+        """Report function()'s return value for these labels, read at collection time."""
+        with self._lock:
+            self._functions[self._key(labels)] = function
+
+    def samples(self):
+        """Yield (suffix, labels, value) for every series."""
+        with self._lock:
+            values = dict(self._values)
+            functions = dict(self._functions)
+        for key, value in sorted(values.items()):
+            yield "", key, value
+        for key, function in sorted(functions.items()):
+            try:
+                value = function()
+            except Exception:
+                continue  # a failing source must not break the whole scrape
+            if value is not None:
+                yield "", key, value
+
+    def value(self, **labels):
+        """Current value for these labels (0 if never set); for tests and summaries."""
+        key = self._key(labels)
+        with self._lock:
+            function = self._functions.get(key)
+            if function is None:
+                return self._values.get(key, 0)
+        return function()
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track_in_progress(self, **labels):
+        """Count the block as in progress while it runs."""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the block in seconds."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self):
+        with self._lock:
+            values = {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+        for key, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield "_bucket", key + (("le", _format_value(float(bound))),), cumulative
+            yield "_sum", key, total
+            yield "_count", key, cumulative
+
+    def value(self, **labels):
+        """(count, sum) of observations for these labels."""
+        with self._lock:
+            counts, total = self._values.get(self._key(labels), ([0], 0.0))
+        return sum(counts), total
+
+
+class MetricsRegistry:
+    """A named set of metrics; declaring a name twice returns the existing metric."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, help_text, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name!r} is already registered as a {metric.type}")
+            return metric
+
+    def counter(self, name, help_text):
+        return self._get_or_create(Counter, name, help_text)
+
+    def gauge(self, name, help_text):
+        return self._get_or_create(Gauge, name, help_text)
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, help_text, buckets=buckets)
+
+    def get(self, name):
+        return self._metrics[name]
+
+    def render(self):
+        """Return every metric in Prometheus text exposition format."""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {_escape_help(metric.help)}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for suffix, labels, value in metric.samples():
+                lines.append(f"{metric.name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+def serve(registry=REGISTRY, port=9464, host="127.0.0.1"):
+    """Serve registry at http://host:port/metrics from a daemon thread. Returns the server; call shutdown() to stop."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # keep scrapes out of the command's output
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def write_metrics_file(path, registry=REGISTRY):
+    """Write the registry to path atomically, so a collector never reads a partial file.
+
+    The file gets the umask's permissions, not mkstemp's 0600, so a
+    collector running as another user (node_exporter) can read it.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_name = create_temp_file(path)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(registry.render())
+    os.replace(temp_name, path)
+
+
+class FileDumper:
+    """Writes the registry to a file every interval seconds from a daemon thread, and once more on stop()."""
+
+    def __init__(self, path, interval=15.0, registry=REGISTRY):
+        self.path = path
+        self.interval = interval
+        self.registry = registry
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-dump", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            write_metrics_file(self.path, self.registry)
+
+    def stop(self):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        write_metrics_file(self.path, self.registry)
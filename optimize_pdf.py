@@ -0,0 +1,289 @@
+"""Shrink merged transmittal PDFs: downsample raster images and enforce a size budget.
+
+The browser embeds the header images at their source resolution, which is
+far more than a printed form needs. optimize_writer() runs on the merged
+PdfWriter before it is written:
+
+1. Identical objects are merged, so a header image repeated on every page
+   (or in every source page PDF) is stored once.
+2. Each image's displayed size is worked out from the page content streams,
+   including the form XObjects browsers wrap images in, and images above the
+   target DPI are resampled down to it. JPEG images are re-encoded at the
+   given quality; others are stored losslessly with Flate.
+3. With a byte budget, the DPI is lowered step by step until the document
+   fits, and PdfBudgetExceeded is raised if it never does.
+
+Resampled images are kept in a process-wide ImageCache keyed by the original
+image data and target size. The same header images appear in every
+transmittal, so a batch, worker or watch run recompresses each one once and
+reuses the result for every later document.
+
+Requires Pillow (pip install .[optimize]).
+"""
+import hashlib
+import math
+import threading
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from io import BytesIO
+
+from pypdf.generic import ContentStream, NameObject, NumberObject
+
+from metrics import REGISTRY
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+DEFAULT_DPI = 150
+IDENTITY = (1, 0, 0, 1, 0, 0)
+# Lower DPIs tried in turn when a document is over its byte budget
+BUDGET_DPI_STEPS = (150, 120, 96, 72)
+# Leave images alone unless resampling removes a meaningful share of pixels
+RESAMPLE_THRESHOLD = 1.1
+MAX_FORM_DEPTH = 8
+
+COMPONENT_MODES = {1: "L", 3: "RGB"}
+
+
+def optimizer_available():
+    """True if Pillow is installed, which downsample_images() needs."""
+    return Image is not None
+
+
+class PdfBudgetExceeded(RuntimeError):
+    """The optimized PDF is still larger than its byte budget."""
+
+
+@dataclass
+class OptimizationReport:
+    original_bytes: int
+    optimized_bytes: int
+    images_resampled: int = 0
+    images_reused: int = 0
+    dpi: int | None = None
+    # the finished document the budget was checked against
+    data: bytes = field(default=b"", repr=False)
+
+    @property
+    def saved_bytes(self):
+        return self.original_bytes - self.optimized_bytes
+
+    def summary(self):
+        saved = self.saved_bytes / self.original_bytes if self.original_bytes else 0
+        return (f"Optimized PDF: {self.original_bytes:,} -> {self.optimized_bytes:,} bytes ({saved:.0%} smaller); "
+                f"{self.images_resampled} images resampled to {self.dpi} DPI, {self.images_reused} from cache.")
+
+
+class ImageCache:
+    """Bounded, thread-safe map from (image data, target size, quality) to the resampled image."""
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.hits = self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def hit_ratio(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+
+IMAGE_CACHE = ImageCache()
+REGISTRY.gauge("xmtl_cache_hit_ratio", "Hit ratio of in-process caches.").set_function(
+    IMAGE_CACHE.hit_ratio, cache="images")
+
+
+def _multiply(m, n):
+    """The matrix m applied before n (PDF order: m x n)."""
+    a, b, c, d, e, f = m
+    A, B, C, D, E, F = n
+    return (a * A + b * C, a * B + b * D, c * A + d * C, c * B + d * D, e * A + f * C + E, e * B + f * D + F)
+
+
+def image_placements(writer):
+    """Map each image XObject's object number to its largest displayed (width, height) in points."""
+    placements = {}
+
+    def walk(stream, resources, ctm, depth):
+        xobjects = resources.get("/XObject", {}) if resources else {}
+        stack = []
+        for operands, operator in ContentStream(stream, writer).operations:
+            if operator == b"q":
+                stack.append(ctm)
+            elif operator == b"Q" and stack:
+                ctm = stack.pop()
+            elif operator == b"cm":
+                ctm = _multiply(tuple(float(value) for value in operands), ctm)
+            elif operator == b"Do" and operands[0] in xobjects:
+                xobject = xobjects[operands[0]].get_object()
+                reference = xobject.indirect_reference
+                if xobject.get("/Subtype") == "/Image" and reference is not None:
+                    size = (math.hypot(ctm[0], ctm[1]), math.hypot(ctm[2], ctm[3]))
+                    previous = placements.get(reference.idnum, (0, 0))
+                    placements[reference.idnum] = (max(previous[0], size[0]), max(previous[1], size[1]))
+                elif xobject.get("/Subtype") == "/Form" and depth < MAX_FORM_DEPTH:
+                    matrix = tuple(float(value) for value in xobject.get("/Matrix", IDENTITY))
+                    walk(xobject, xobject.get("/Resources", resources), _multiply(matrix, ctm), depth + 1)
+
+    for page in writer.pages:
+        contents = page.get_contents()
+        if contents is not None:
+            walk(contents, page.get("/Resources"), IDENTITY, 0)
+    return placements
+
+
+def _components(image):
+    color_space = image.get("/ColorSpace")
+    if isinstance(color_space, list) and color_space and color_space[0] == "/ICCBased":
+        return int(color_space[1].get_object().get("/N", 0))
+    return {"/DeviceGray": 1, "/DeviceRGB": 3}.get(color_space)
+
+
+def _filters(image):
+    filters = image.get("/Filter")
+    return list(filters) if isinstance(filters, list) else [filters] if filters else []
+
+
+def _decode(image):
+    """Return the image as a PIL image, or None for formats left alone (indexed, CMYK, 1-bit...)."""
+    mode = COMPONENT_MODES.get(_components(image))
+    if mode is None or image.get("/BitsPerComponent") != 8 or "/Decode" in image:
+        return None
+    filters = _filters(image)
+    if filters == ["/DCTDecode"]:
+        return Image.open(BytesIO(image._data)).convert(mode)
+    if filters in ([], ["/FlateDecode"]):
+        size = (int(image["/Width"]), int(image["/Height"]))
+        return Image.frombytes(mode, size, image.get_data())
+    return None
+
+
+def _resample(image, size, quality):
+    """Return (data, filter) for image resampled to size, or None if it cannot be decoded."""
+    picture = _decode(image)
+    if picture is None:
+        return None
+    picture = picture.resize(size, Image.LANCZOS)
+    if _filters(image) == ["/DCTDecode"]:
+        buffer = BytesIO()
+        picture.save(buffer, "JPEG", quality=quality, optimize=True)
+        return buffer.getvalue(), "/DCTDecode"
+    return zlib.compress(picture.tobytes(), 9), "/FlateDecode"
+
+
+def _replace_stream(image, data, filter_name, size):
+    image._data = data
+    image[NameObject("/Filter")] = NameObject(filter_name)
+    image[NameObject("/Width")] = NumberObject(size[0])
+    image[NameObject("/Height")] = NumberObject(size[1])
+    image[NameObject("/Length")] = NumberObject(len(data))
+    if "/DecodeParms" in image:
+        del image["/DecodeParms"]
+
+
+def _target_size(image, displayed, dpi):
+    width, height = int(image["/Width"]), int(image["/Height"])
+    target = (max(1, round(displayed[0] / 72 * dpi)), max(1, round(displayed[1] / 72 * dpi)))
+    if width <= target[0] * RESAMPLE_THRESHOLD and height <= target[1] * RESAMPLE_THRESHOLD:
+        return None
+    return min(width, target[0]), min(height, target[1])
+
+
+def _resample_cached(image, size, quality, cache, report):
+    key = (hashlib.sha256(image._data).hexdigest(), repr(sorted((k, str(v)) for k, v in image.items()
+                                                                if k != "/SMask")), size, quality)
+    entry = cache.get(key)
+    if entry is None:
+        entry = _resample(image, size, quality)
+        if entry is None:
+            return False
+        cache.put(key, entry)
+        report.images_resampled += 1
+    else:
+        report.images_reused += 1
+    _replace_stream(image, *entry, size)
+    return True
+
+
+def downsample_images(writer, dpi=DEFAULT_DPI, quality=85, cache=IMAGE_CACHE, report=None):
+    """Resample every image in writer displayed above dpi down to it, in place."""
+    if Image is None:
+        raise RuntimeError("Image downsampling needs Pillow (pip install .[optimize])")
+    report = report or OptimizationReport(0, 0)
+    for idnum, displayed in image_placements(writer).items():
+        image = writer.get_object(idnum)
+        size = _target_size(image, displayed, dpi)
+        if size is None or not _resample_cached(image, size, quality, cache, report):
+            continue
+        if "/SMask" in image:
+            mask = image["/SMask"].get_object()
+            _resample_cached(mask, size, quality, cache, report)
+    return report
+
+
+def serialize(writer):
+    buffer = BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def optimize_writer(writer, dpi=DEFAULT_DPI, quality=85, max_bytes=None, cache=IMAGE_CACHE, finish=serialize):
+    """Deduplicate and downsample writer in place and return an OptimizationReport.
+
+    finish(writer) returns the bytes that will actually be written (for
+    example made deterministic and linearized); the report's data holds
+    them. With max_bytes, lower DPIs from BUDGET_DPI_STEPS are tried until
+    those bytes fit; PdfBudgetExceeded is raised if none does. Images are
+    always resampled from their original data, never from an earlier,
+    lower-resolution attempt.
+    """
+    original_bytes = len(serialize(writer))
+    writer.compress_identical_objects()
+
+    originals = {}
+    for idnum in image_placements(writer):
+        image = writer.get_object(idnum)
+        originals[idnum] = (image._data, dict(image))
+        if "/SMask" in image:
+            mask = image["/SMask"].get_object()
+            originals[mask.indirect_reference.idnum] = (mask._data, dict(mask))
+
+    steps = [dpi] + [step for step in BUDGET_DPI_STEPS if step < dpi] if max_bytes else [dpi]
+    for step in steps:
+        for idnum, (data, entries) in originals.items():
+            image = writer.get_object(idnum)
+            image.clear()
+            image.update(entries)
+            image._data = data
+        report = downsample_images(writer, step, quality, cache, OptimizationReport(original_bytes, 0, dpi=step))
+        report.data = finish(writer)
+        report.optimized_bytes = len(report.data)
+        if max_bytes is None or report.optimized_bytes <= max_bytes:
+            return report
+    raise PdfBudgetExceeded(f"PDF is {report.optimized_bytes:,} bytes at {report.dpi} DPI, "
+                            f"over its budget of {max_bytes:,} bytes")
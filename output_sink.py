@@ -0,0 +1,221 @@
+"""Where final PDFs are written, and how.
+
+An OutputSink writes each file to a temporary name in the target folder and
+renames it into place, so readers (and a crash) only ever see the previous
+file or the complete new one. Temporary names are unique per write, so two
+jobs producing the same filename never write into each other's file; the
+collision policy decides which one ends up under the name.
+
+Collision policies:
+    overwrite  The last write to finish replaces the file.
+    suffix     Existing files are kept; the new file is named 'name (1).pdf',
+               'name (2).pdf', ... using the first name not yet taken.
+    skip       Existing files are kept and the new output is discarded.
+
+The suffix and skip policies place files with a no-clobber hard link, which
+is atomic, so even concurrent writers on a shared folder never claim the
+same name twice.
+"""
+import os
+import threading
+import uuid
+from pathlib import Path
+
+OVERWRITE = "overwrite"
+SUFFIX = "suffix"
+SKIP = "skip"
+COLLISION_POLICIES = (OVERWRITE, SUFFIX, SKIP)
+
+
+def default_output_dir():
+    """Folder final PDFs are written to when no output_dir is given."""
+    return Path.home() / "Downloads"
+
+
+def create_temp_file(target, suffix=".partial"):
+    """Create a hidden, uniquely named file beside target and return (fd, path); fd is open for writing.
+
+    Unlike tempfile.mkstemp, which makes files private (0600), the file is
+    created 0666 less the umask, as open() would, so once renamed into place
+    it can be read by everyone who can read the rest of a shared folder.
+    """
+    target = Path(target)
+    while True:
+        path = target.with_name(f".{target.name}.{uuid.uuid4().hex[:12]}{suffix}")
+        try:
+            return os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY | getattr(os, "O_BINARY", 0), 0o666), path
+        except FileExistsError:
+            continue
+
+
+def _fsync_path(path):
+    """fsync a file, or a directory where the platform allows it.
+
+    Files are opened read-write because Windows only flushes a handle with
+    write access, and a failure to sync one is raised. Directories are synced
+    best-effort: Windows cannot open them (NTFS journals the rename itself)
+    and some network filesystems refuse to fsync them.
+    """
+    if os.path.isdir(path):
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+        return
+    fd = os.open(path, os.O_RDWR | getattr(os, "O_BINARY", 0))
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class OutputSink:
+    """Writes finished files into a folder atomically.
+
+    Args:
+        directory:   Target folder (~/Downloads by default); created if missing.
+        collision:   One of COLLISION_POLICIES.
+        fsync_every: 1 fsyncs every file before it is renamed into place. N > 1
+                     defers the fsyncs and flushes them, with the folder, once
+                     every N files and on close(), which is much faster on
+                     network shares; a power loss can then leave up to N-1
+                     recent files empty or missing. 0 never fsyncs.
+    """
+
+    def __init__(self, directory=None, collision=OVERWRITE, fsync_every=1):
+        if collision not in COLLISION_POLICIES:
+            raise ValueError(f"Unknown collision policy {collision!r}; expected one of {COLLISION_POLICIES}")
+        if fsync_every < 0:
+            raise ValueError("fsync_every must be 0 or more")
+        self.directory = Path(directory) if directory else default_output_dir()
+        self.collision = collision
+        self.fsync_every = fsync_every
+        self._unsynced = []
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def path_for(self, name):
+        """The path a file called name is written to, before any collision suffix."""
+        return self.directory / name
+
+    def existing(self, name):
+        """Under the skip policy, the file that already holds name (if any); otherwise None.
+
+        Lets callers avoid producing output that write() would discard.
+        """
+        target = self.path_for(name)
+        return target if self.collision == SKIP and target.exists() else None
+
+    def write(self, name, write_to, input_hash=None):
+        """Write one file and return the path it was placed at.
+
+        write_to is called with a binary file object open on a temporary
+        file in the target folder. Under the skip policy the returned path is
+        the existing file when the name was already taken. input_hash is
+        accepted for compatibility with zip_sink.ZipSink and not used.
+        """
+        target = self.path_for(name)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = create_temp_file(target)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write_to(f)
+                f.flush()
+                if self.fsync_every == 1:
+                    os.fsync(f.fileno())
+            final_path = self._place(temp_path, target)
+        except BaseException:
+            temp_path.unlink(missing_ok=True)
+            raise
+        self._synced(final_path)
+        return final_path
+
+    def write_bytes(self, name, data, input_hash=None):
+        return self.write(name, lambda f: f.write(data))
+
+    def _place(self, temp_path, target):
+        if self.collision == OVERWRITE:
+            os.replace(temp_path, target)
+            return target
+        candidates = [target] if self.collision == SKIP else _suffixed_names(target)
+        for candidate in candidates:
+            if _move_no_clobber(temp_path, candidate):
+                return candidate
+        temp_path.unlink()
+        return target  # skip: the name is taken, keep what is there
+
+    def _synced(self, path):
+        if self.fsync_every <= 1:
+            if self.fsync_every == 1:
+                _fsync_path(path.parent)
+            return
+        with self._lock:
+            self._unsynced.append(path)
+            if len(self._unsynced) < self.fsync_every:
+                return
+            pending, self._unsynced = self._unsynced, []
+        _flush(pending)
+
+    def flush(self):
+        """fsync every file written since the last flush, and their folders."""
+        with self._lock:
+            pending, self._unsynced = self._unsynced, []
+        _flush(pending)
+
+    def close(self):
+        self.flush()
+
+
+def _flush(paths):
+    for path in paths:
+        _fsync_path(path)
+    for folder in {path.parent for path in paths}:
+        _fsync_path(folder)
+
+
+def _suffixed_names(target):
+    yield target
+    n = 1
+    while True:
+        yield target.with_name(f"{target.stem} ({n}){target.suffix}")
+        n += 1
+
+
+def _move_no_clobber(source, target):
+    """Move source to target unless target already exists; returns False if it does.
+
+    Uses a hard link, which fails atomically on an existing name. Where the
+    filesystem has no hard links, the name is reserved with an exclusive
+    create and the file renamed over the reservation, so the name can be
+    briefly visible as an empty file.
+    """
+    try:
+        os.link(source, target)
+    except FileExistsError:
+        return False
+    except OSError:
+        try:
+            os.close(os.open(target, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            return False
+        os.replace(source, target)
+        return True
+    source.unlink()
+    return True
+
+
+def as_sink(output):
+    """Return output if it is an OutputSink, else an overwrite sink for the folder output (or the default)."""
+    return output if isinstance(output, OutputSink) else OutputSink(output)
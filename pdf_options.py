@@ -0,0 +1,57 @@
+"""PdfOptions, kept apart from html_to_pdf so that importing it stays cheap.
+
+The CLI builds a PdfOptions for every command that writes PDFs, including
+the interactive client of the daemon, which sends it to the daemon and so
+never needs pypdf, pikepdf or the rest of the conversion stack itself.
+"""
+import json
+import os
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+
+@dataclass
+class PdfOptions:
+    """Options applied to the merged PDF before it is written.
+
+    deterministic: Write identical bytes for identical page content. The
+                   document /ID is derived from the content, the producer is
+                   fixed, and volatile per-page keys are dropped.
+    timestamp:     CreationDate/ModDate for deterministic output. If None,
+                   SOURCE_DATE_EPOCH is used when set; otherwise the dates
+                   are left out.
+    linearize:     Write a linearized ("fast web view") PDF with hint tables,
+                   so a viewer reading from a network share can show page 1
+                   before the rest of the file arrives. Needs pikepdf or qpdf.
+    image_dpi:     Downsample raster images displayed above this resolution
+                   (see optimize_pdf). Needs Pillow.
+    max_bytes:     Byte budget per PDF. Images are downsampled further to
+                   meet it (from image_dpi, or DEFAULT_DPI if that is
+                   unset), and optimize_pdf.PdfBudgetExceeded is raised if
+                   the PDF still does not fit.
+    """
+    deterministic: bool = False
+    timestamp: datetime | None = None
+    linearize: bool = False
+    image_dpi: int | None = None
+    max_bytes: int | None = None
+
+    @property
+    def optimize(self):
+        return self.image_dpi is not None or self.max_bytes is not None
+
+    def canonical(self):
+        """A string identifying the PDF these options produce, or '' for the defaults.
+
+        Keeps PDFs written with different options apart, e.g. in the
+        transmittal registry. For deterministic output without a timestamp,
+        the SOURCE_DATE_EPOCH in effect is included, since it sets the dates.
+        """
+        if self == PdfOptions():
+            return ""
+        timestamp = self.timestamp if self.deterministic else None
+        if self.deterministic and timestamp is None and (epoch := os.environ.get("SOURCE_DATE_EPOCH")):
+            timestamp = datetime.fromtimestamp(int(epoch), tz=timezone.utc)
+        return json.dumps({"deterministic": self.deterministic, "linearize": self.linearize,
+                           "image_dpi": self.image_dpi, "max_bytes": self.max_bytes,
+                           "timestamp": timestamp.isoformat() if timestamp else None}, sort_keys=True)
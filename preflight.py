@@ -0,0 +1,168 @@
+"""Pre-flight validation of whole manifests, without rendering anything.
+
+validate_manifest() reads a CSV or NDJSON manifest once, turns it into one
+column of raw values per XmtlBuild field, and runs each check down a column:
+
+- required fields are present (after processors such as the revision
+  default, evaluated once per distinct value);
+- review end dates can be parsed (normalize_review_date() is memoized, so
+  a date repeated across thousands of rows is parsed once);
+- reviewer names fit within the field's max_length;
+- the generated filename is legal on Windows and unique within the manifest.
+
+Every problem is collected into a single ValidationReport rather than
+stopping at the first bad row.
+"""
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+from batch import read_manifest_rows
+from submittal_cli import XmtlBuild, normalize_review_date, submittal_filename
+
+# Longest file name (not path) most filesystems accept, in characters
+MAX_FILENAME_LENGTH = 255
+WINDOWS_RESERVED_NAMES = {"CON", "PRN", "AUX", "NUL", *(f"COM{n}" for n in range(1, 10)),
+                          *(f"LPT{n}" for n in range(1, 10))}
+
+
+@dataclass(frozen=True)
+class Problem:
+    row: int
+    field: str
+    message: str
+
+
+@dataclass
+class ValidationReport:
+    """Every problem found in a manifest of `rows` data rows."""
+    rows: int = 0
+    problems: list = field(default_factory=list)
+
+    @property
+    def ok(self):
+        return not self.problems
+
+    @property
+    def failed_rows(self):
+        return len({problem.row for problem in self.problems})
+
+    def grouped(self):
+        """Map (field, message) to the sorted row numbers it applies to."""
+        groups = defaultdict(list)
+        for problem in self.problems:
+            groups[(problem.field, problem.message)].append(problem.row)
+        return {key: sorted(rows) for key, rows in sorted(groups.items())}
+
+    def to_dict(self):
+        return {
+            "rows": self.rows,
+            "failed_rows": self.failed_rows,
+            "problems": [{"field": name, "message": message, "rows": rows}
+                         for (name, message), rows in self.grouped().items()],
+        }
+
+    def format(self, max_rows=10):
+        """A human-readable report, one line per distinct problem."""
+        if self.ok:
+            return f"{self.rows} rows checked, no problems found."
+        lines = [f"{self.rows} rows checked, {self.failed_rows} with problems:"]
+        for (name, message), rows in self.grouped().items():
+            shown = _row_ranges(rows[:max_rows])
+            more = f" and {len(rows) - max_rows} more" if len(rows) > max_rows else ""
+            label = "row" if len(rows) == 1 else "rows"
+            lines.append(f"  {name}: {message} ({label} {shown}{more})")
+        return "\n".join(lines)
+
+
+def _row_ranges(rows):
+    """Compress sorted row numbers into '1-3, 7, 9-10'."""
+    ranges = []
+    for row in rows:
+        if ranges and row == ranges[-1][1] + 1:
+            ranges[-1][1] = row
+        else:
+            ranges.append([row, row])
+    return ", ".join(str(start) if start == end else f"{start}-{end}" for start, end in ranges)
+
+
+def read_columns(manifest_path):
+    """Return (row_numbers, {field name: [raw values]}) for a manifest."""
+    row_numbers = []
+    columns = defaultdict(list)
+    for row_number, row in read_manifest_rows(manifest_path):
+        row_numbers.append(row_number)
+        for spec, value in zip(XmtlBuild.FIELDS, XmtlBuild.from_dict(row).to_dict().values()):
+            columns[spec.name].append(value)
+    return row_numbers, columns
+
+
+def _check_required(row_numbers, columns):
+    for spec in XmtlBuild.FIELDS:
+        if not spec.required:
+            continue
+        processed = {}
+        for row, value in zip(row_numbers, columns[spec.name]):
+            if value not in processed:
+                processed[value] = spec.process(value)
+            if not processed[value]:
+                yield Problem(row, spec.name, "required field is empty")
+
+
+def _check_dates(row_numbers, columns):
+    for row, value in zip(row_numbers, columns["Date_Review_Ends"]):
+        if value.strip() and normalize_review_date(value) is None:
+            yield Problem(row, "Date_Review_Ends", f"cannot parse date '{value}'")
+
+
+def _check_reviewers(row_numbers, columns):
+    limit = XmtlBuild.reviewer_names.max_length
+    for row, value in zip(row_numbers, columns["Reviewer_Names"]):
+        if len(value) > limit:
+            yield Problem(row, "Reviewer_Names", f"longer than {limit} characters")
+
+
+def filename_problems(filename):
+    """Return the reasons a generated filename cannot be written, if any."""
+    problems = []
+    stem = filename.rsplit(".", 1)[0]
+    if len(filename) > MAX_FILENAME_LENGTH:
+        problems.append(f"filename is longer than {MAX_FILENAME_LENGTH} characters")
+    if stem.split(".", 1)[0].upper() in WINDOWS_RESERVED_NAMES:
+        problems.append("filename is a reserved Windows device name")
+    if any(ord(character) < 32 for character in filename):
+        problems.append("filename contains control characters")
+    if stem.endswith((".", " ")):
+        problems.append("filename ends with a dot or space before .pdf")
+    return problems
+
+
+def _check_filenames(row_numbers, columns, skip_rows):
+    first_row_for = {}
+    revision = XmtlBuild.revision_number
+    for row, project_number, revision_value, submittal_number, submittal_name in zip(
+            row_numbers, columns["Project_Number"], columns["Revision_Number"], columns["Submittal_Number"],
+            columns["Submittal_Name"]):
+        if row in skip_rows:
+            continue
+        filename = submittal_filename(project_number, revision.process(revision_value), submittal_number,
+                                      submittal_name)
+        for message in filename_problems(filename):
+            yield Problem(row, "filename", message)
+        key = filename.lower()  # Windows and macOS filesystems ignore case
+        if key in first_row_for:
+            yield Problem(row, "filename", f"same output file as row {first_row_for[key]}")
+        else:
+            first_row_for[key] = row
+
+
+def validate_manifest(manifest_path):
+    """Check every row of a manifest and return a ValidationReport."""
+    row_numbers, columns = read_columns(manifest_path)
+    report = ValidationReport(rows=len(row_numbers))
+    report.problems.extend(_check_required(row_numbers, columns))
+    incomplete = {problem.row for problem in report.problems}
+    report.problems.extend(_check_dates(row_numbers, columns))
+    report.problems.extend(_check_reviewers(row_numbers, columns))
+    # a filename built from missing fields would only repeat the required-field problem
+    report.problems.extend(_check_filenames(row_numbers, columns, skip_rows=incomplete))
+    return report
@@ -0,0 +1,87 @@
+"""Text-mode preview of a transmittal's pages for the review step.
+
+Printing and merging the PDF takes seconds per page; this preview takes
+milliseconds. It uses the same page plan as render_output() and lays out
+each page's template slots in the order they appear in the template, so the
+user sees how many pages will be produced, which reviewer lands on which
+page, and which values are long enough to wrap, before confirming.
+"""
+import functools
+import re
+
+from rich.console import Group
+from rich.panel import Panel
+from rich.table import Table
+from rich.text import Text
+
+from custom_fill import env, plan_pages
+
+PAGE_DESCRIPTIONS = {
+    'Page1.HTML': "Cover",
+    'Page2.HTML': "EDP and reviewers",
+    'Page3.HTML': "Additional reviewers",
+}
+
+# Rough number of characters that fit on one line of each slot at the
+# stylesheet's font sizes. A longer value wraps, which can push the review
+# boxes below it onto a second sheet.
+SLOT_WIDTHS = {
+    'Project_Title': 60,
+    'Specification_Section': 80,
+    'Submittal_Name': 80,
+    'Project_Manager': 30,
+    'EDP_Address_Line_1': 50,
+    'EDP_Address_Line_2': 50,
+    'EDP_Address_Line_3': 50,
+    'Reviewer_Name_1': 45,
+    'Reviewer_Name_2': 45,
+    'Reviewer_Name_3': 45,
+    'Reviewer_Name_4': 45,
+}
+
+BLANK_SLOT = "________________"
+SLOT_PATTERN = re.compile(r"{{\s*(\w+)\s*}}")
+
+
+@functools.cache
+def template_slots(template_name):
+    """Names of the values a template prints, in the order they appear."""
+    source, _, _ = env.loader.get_source(env, template_name)
+    return list(dict.fromkeys(SLOT_PATTERN.findall(source)))
+
+
+def slot_warnings(slots):
+    """Return a message for every slot value longer than its line budget."""
+    return [
+        f"{name} is {len(str(value))} characters and will wrap (about {SLOT_WIDTHS[name]} fit on a line)"
+        for name, value in slots.items()
+        if name in SLOT_WIDTHS and len(str(value)) > SLOT_WIDTHS[name]
+    ]
+
+
+def page_preview(number, output_name, template_name, slots):
+    """Return a Rich panel mocking up one page."""
+    table = Table.grid(padding=(0, 2))
+    table.add_column(style="#333FFF", no_wrap=True)
+    table.add_column(style="#8691F6")
+    for name in template_slots(template_name):
+        value = str(slots.get(name) or "")
+        width = SLOT_WIDTHS.get(name)
+        text = Text(value or BLANK_SLOT, style="" if value else "dim")
+        if width and len(value) > width:
+            text.stylize("bold red", width)
+        table.add_row(name, text)
+
+    body = [table]
+    body.extend(Text(f"⚠ {warning}", style="yellow") for warning in slot_warnings(slots))
+    description = PAGE_DESCRIPTIONS.get(template_name, template_name)
+    return Panel(Group(*body), title=f"Page {number}: {description}", subtitle=output_name,
+                 title_align="left", border_style="green")
+
+
+def render_preview(dictionary):
+    """Return one panel per page the render dictionary produces, in page order."""
+    return [
+        page_preview(number, output_name, template_name, slots)
+        for number, (output_name, template_name, slots) in enumerate(plan_pages(dictionary), start=1)
+    ]
@@ -0,0 +1,194 @@
+"""Run browser conversions as process trees that can always be killed completely.
+
+Edge starts renderer, GPU and crashpad helpers that can outlive the main
+process, especially when it is killed on a timeout or by Ctrl+C. Each
+conversion is therefore started in its own process group (a Job Object on
+Windows), and everything in it is killed once the main process exits, times
+out or is interrupted, before the main process is reaped.
+
+On POSIX the leader is left as a zombie until the group has been killed, so
+its process group id cannot be reused by an unrelated process in between.
+"""
+import atexit
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+WINDOWS = sys.platform.startswith("win")
+
+_live = set()
+_live_lock = threading.Lock()
+
+
+class _WindowsJob:
+    """A Job Object that kills every process assigned to it when closed or terminated."""
+
+    JOB_OBJECT_LIMIT_KILL_ON_JOB_CLOSE = 0x2000
+    JOB_OBJECT_EXTENDED_LIMIT_INFORMATION = 9
+    PROCESS_SET_QUOTA_AND_TERMINATE = 0x0100 | 0x0001
+
+    def __init__(self, pid):
+        import ctypes
+        from ctypes import wintypes
+
+        class BasicLimits(ctypes.Structure):
+            _fields_ = [("PerProcessUserTimeLimit", ctypes.c_int64), ("PerJobUserTimeLimit", ctypes.c_int64),
+                        ("LimitFlags", wintypes.DWORD), ("MinimumWorkingSetSize", ctypes.c_size_t),
+                        ("MaximumWorkingSetSize", ctypes.c_size_t), ("ActiveProcessLimit", wintypes.DWORD),
+                        ("Affinity", ctypes.c_size_t), ("PriorityClass", wintypes.DWORD),
+                        ("SchedulingClass", wintypes.DWORD)]
+
+        class ExtendedLimits(ctypes.Structure):
+            _fields_ = [("BasicLimitInformation", BasicLimits), ("IoInfo", ctypes.c_ulonglong * 6),
+                        ("ProcessMemoryLimit", ctypes.c_size_t), ("JobMemoryLimit", ctypes.c_size_t),
+                        ("PeakProcessMemoryUsed", ctypes.c_size_t), ("PeakJobMemoryUsed", ctypes.c_size_t)]
+
+        kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+        kernel32.CreateJobObjectW.restype = wintypes.HANDLE
+        kernel32.CreateJobObjectW.argtypes = (wintypes.LPVOID, wintypes.LPCWSTR)
+        kernel32.OpenProcess.restype = wintypes.HANDLE
+        kernel32.OpenProcess.argtypes = (wintypes.DWORD, wintypes.BOOL, wintypes.DWORD)
+        kernel32.SetInformationJobObject.argtypes = (wintypes.HANDLE, ctypes.c_int, wintypes.LPVOID, wintypes.DWORD)
+        kernel32.AssignProcessToJobObject.argtypes = (wintypes.HANDLE, wintypes.HANDLE)
+        kernel32.TerminateJobObject.argtypes = (wintypes.HANDLE, wintypes.UINT)
+        kernel32.CloseHandle.argtypes = (wintypes.HANDLE,)
+        self._kernel32 = kernel32
+
+        self._handle = kernel32.CreateJobObjectW(None, None)
+        if not self._handle:
+            raise OSError(ctypes.get_last_error(), "CreateJobObjectW failed")
+        limits = ExtendedLimits()
+        limits.BasicLimitInformation.LimitFlags = self.JOB_OBJECT_LIMIT_KILL_ON_JOB_CLOSE
+        process = kernel32.OpenProcess(self.PROCESS_SET_QUOTA_AND_TERMINATE, False, pid)
+        try:
+            if not (process
+                    and kernel32.SetInformationJobObject(self._handle, self.JOB_OBJECT_EXTENDED_LIMIT_INFORMATION,
+                                                         ctypes.byref(limits), ctypes.sizeof(limits))
+                    and kernel32.AssignProcessToJobObject(self._handle, process)):
+                error = ctypes.get_last_error()
+                self.close()
+                raise OSError(error, "Could not place the browser in a Job Object")
+        finally:
+            if process:
+                kernel32.CloseHandle(process)
+
+    def terminate(self):
+        if self._handle:
+            self._kernel32.TerminateJobObject(self._handle, 1)
+
+    def close(self):
+        if self._handle:
+            self._kernel32.CloseHandle(self._handle)
+            self._handle = None
+
+
+class _ProcessTree:
+    """One subprocess and everything it starts."""
+
+    def __init__(self, command):
+        self.command = command
+        self._lock = threading.Lock()
+        self._reaped = False
+        self._job = None
+        if WINDOWS:
+            self.proc = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                         stderr=subprocess.DEVNULL, creationflags=subprocess.CREATE_NEW_PROCESS_GROUP)
+            try:
+                self._job = _WindowsJob(self.proc.pid)
+            except OSError:
+                pass  # fall back to taskkill /T, which finds descendants by parent pid
+        else:
+            self.proc = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                         stderr=subprocess.DEVNULL, start_new_session=True)
+
+    def wait(self, timeout):
+        """Wait up to timeout seconds for the main process to exit, without reaping it."""
+        if WINDOWS or not hasattr(os, "waitid"):
+            try:
+                self.proc.wait(timeout)
+                return True
+            except subprocess.TimeoutExpired:
+                return False
+        deadline = time.monotonic() + timeout
+        delay = 0.001
+        while True:
+            try:
+                if os.waitid(os.P_PID, self.proc.pid, os.WEXITED | os.WNOWAIT | os.WNOHANG) is not None:
+                    return True
+            except ChildProcessError:
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, 0.05)
+
+    def kill(self):
+        """Kill every process left in the tree; safe to call from any thread."""
+        with self._lock:
+            if self._reaped:
+                return
+            if self._job is not None:
+                self._job.terminate()
+            elif WINDOWS:
+                subprocess.run(["taskkill", "/T", "/F", "/PID", str(self.proc.pid)],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            else:
+                try:
+                    os.killpg(self.proc.pid, signal.SIGKILL)
+                except (ProcessLookupError, PermissionError):
+                    pass
+
+    def finish(self):
+        """Kill whatever is left of the tree and reap the main process."""
+        self.kill()
+        with self._lock:
+            self.proc.wait()
+            self._reaped = True
+            if self._job is not None:
+                self._job.close()
+
+
+def run_process_tree(command, timeout):
+    """Run command to completion and leave none of its processes behind.
+
+    Behaves like subprocess.run(command, check=True, timeout=timeout) with
+    output discarded: raises subprocess.TimeoutExpired or
+    subprocess.CalledProcessError. Helpers the command started are killed
+    once it exits, and the whole tree is killed on timeout, on Ctrl+C, or
+    when kill_process_trees() is called from another thread.
+    """
+    tree = _ProcessTree(command)
+    with _live_lock:
+        _live.add(tree)
+    try:
+        exited = tree.wait(timeout)
+    finally:
+        tree.finish()
+        with _live_lock:
+            _live.discard(tree)
+    if not exited:
+        raise subprocess.TimeoutExpired(command, timeout)
+    if tree.proc.returncode:
+        raise subprocess.CalledProcessError(tree.proc.returncode, command)
+
+
+def kill_process_trees():
+    """Kill every process tree currently running; their run_process_tree() calls then raise."""
+    with _live_lock:
+        trees = list(_live)
+    for tree in trees:
+        tree.kill()
+
+
+def live_process_trees():
+    """Number of process trees currently running."""
+    with _live_lock:
+        return len(_live)
+
+
+# last resort for trees still running when the interpreter exits (e.g. a worker thread was abandoned)
+atexit.register(kill_process_trees)
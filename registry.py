@@ -0,0 +1,143 @@
+"""Local registry of generated transmittals.
+
+Every PDF produced through generate_transmittal() is recorded with its
+project number, submittal number, revision and input hash. A later request
+with identical inputs is answered with the existing file instead of running
+the render and conversion pipeline again. The hash covers the review date
+as printed (XmtlBuild.input_hash(resolve_dates=True)), so a blank date,
+which defaults to two weeks from the day of generation, only matches PDFs
+generated the same day. PDFs written with PdfOptions (deterministic,
+linearized, downsampled or size-budgeted) are keyed by the options as well,
+so a request is only answered with a PDF written the same way.
+"""
+import hashlib
+import os
+import sqlite3
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from metrics import REGISTRY
+
+LOOKUPS = REGISTRY.counter("xmtl_registry_lookups_total", "Transmittal registry lookups, by result (hit, miss).")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transmittals (
+    id               INTEGER PRIMARY KEY,
+    project_number   TEXT NOT NULL,
+    submittal_number TEXT NOT NULL,
+    revision         TEXT NOT NULL,
+    input_hash       TEXT NOT NULL,
+    output_path      TEXT NOT NULL,
+    created_at       REAL NOT NULL,
+    UNIQUE (input_hash, output_path)
+);
+CREATE INDEX IF NOT EXISTS transmittals_submittal
+    ON transmittals (project_number, submittal_number, revision);
+CREATE INDEX IF NOT EXISTS transmittals_hash ON transmittals (input_hash);
+"""
+
+
+def registry_key(build, pdf_options=None):
+    """The hash a build is registered under; plain PDFs keep the build's own input hash."""
+    key = build.input_hash(resolve_dates=True)
+    if pdf_options is not None and (options := pdf_options.canonical()):
+        key = hashlib.sha256(f"{key}\n{options}".encode("utf-8")).hexdigest()
+    return key
+
+
+def default_registry_path() -> Path:
+    """Per-user registry file; XMTL_REGISTRY overrides the location."""
+    override = os.environ.get("XMTL_REGISTRY")
+    if override:
+        return Path(override)
+    if sys.platform.startswith("win") and os.environ.get("LOCALAPPDATA"):
+        return Path(os.environ["LOCALAPPDATA"]) / "xmtl_factory" / "registry.sqlite3"
+    data_home = os.environ.get("XDG_DATA_HOME") or Path.home() / ".local" / "share"
+    return Path(data_home) / "xmtl_factory" / "registry.sqlite3"
+
+
+@dataclass
+class RegistryEntry:
+    project_number: str
+    submittal_number: str
+    revision: str
+    input_hash: str
+    output_path: str
+    created_at: float
+
+
+class TransmittalRegistry:
+    """SQLite index of generated transmittals, keyed by submittal identity and input hash.
+
+    One registry may be shared by the threads of a batch run (--rows-in-flight);
+    its connection is used by one thread at a time.
+    """
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path else default_registry_path()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._conn:
+            self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def lookup(self, build, pdf_options=None):
+        """Return the path of an existing PDF generated from identical inputs and options, or None.
+
+        Entries whose file has since been moved or deleted are skipped.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT output_path FROM transmittals WHERE input_hash = ? ORDER BY created_at DESC",
+                (registry_key(build, pdf_options),),
+            ).fetchall()
+        for (output_path,) in rows:
+            if Path(output_path).is_file():
+                LOOKUPS.inc(result="hit")
+                return Path(output_path)
+        LOOKUPS.inc(result="miss")
+        return None
+
+    def record(self, build, output_path, pdf_options=None):
+        """Record that build was written to output_path with pdf_options."""
+        values = (build.project_number.value, build.submittal_number.value, build.revision_number.processed_value,
+                  registry_key(build, pdf_options), str(Path(output_path).resolve()), time.time())
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO transmittals "
+                "(project_number, submittal_number, revision, input_hash, output_path, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                values,
+            )
+
+    def history(self, project_number=None, submittal_number=None, revision=None, limit=50):
+        """List past transmittals, newest first, optionally filtered by submittal identity."""
+        clauses, params = [], []
+        for column, value in (("project_number", project_number), ("submittal_number", submittal_number),
+                              ("revision", revision)):
+            if value:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT project_number, submittal_number, revision, input_hash, output_path, created_at "
+                f"FROM transmittals {where} ORDER BY created_at DESC LIMIT ?",
+                (*params, limit),
+            ).fetchall()
+        return [RegistryEntry(*row) for row in rows]
+
+
+def _hit_ratio():
+    hits, misses = LOOKUPS.value(result="hit"), LOOKUPS.value(result="miss")
+    return hits / (hits + misses) if hits + misses else None
+
+
+REGISTRY.gauge("xmtl_cache_hit_ratio", "Hit ratio of in-process caches.").set_function(_hit_ratio, cache="registry")
@@ -0,0 +1,115 @@
+"""Portable render bundles.
+
+A bundle is a directory named '<final pdf stem>.xmtl' holding the rendered
+HTML pages (with CSS and images inlined) and a plan.json describing the page
+order and the target filename. Bundles are produced by
+custom_fill.render_output(bundle_dir=...) and consumed by
+html_to_pdf.convert_bundles(), which may run on a different machine reading
+the same shared folder.
+"""
+import json
+import os
+import shutil
+import socket
+import uuid
+from pathlib import Path
+
+BUNDLE_SUFFIX = ".xmtl"
+PLAN_FILENAME = "plan.json"
+PLAN_VERSION = 1
+
+
+def bundle_path(bundle_dir, final_pdf_name) -> Path:
+    """Return the directory a bundle for final_pdf_name is written to inside bundle_dir."""
+    return Path(bundle_dir) / (Path(final_pdf_name).stem + BUNDLE_SUFFIX)
+
+
+def write_bundle(bundle_dir, final_pdf_name, pages):
+    """Write a bundle for one transmittal and return the HTML paths it contains.
+
+    Args:
+        bundle_dir:     Directory that collects bundles (e.g. a shared drop folder).
+        final_pdf_name: Filename of the merged PDF the bundle converts to.
+        pages:          List of (output_name, template_name, html) tuples in page order.
+
+    The bundle is written to a hidden temporary directory and renamed into
+    place once complete, so a converter polling the folder never picks up a
+    half-written bundle.
+
+    Raises:
+        FileExistsError: If a bundle for final_pdf_name is already waiting in
+                         bundle_dir; it may be converting right now, so it is
+                         never written over.
+    """
+    target = bundle_path(bundle_dir, final_pdf_name)
+    if target.exists():
+        raise FileExistsError(f"Render bundle '{target}' already exists and has not been converted yet")
+    # not mkdtemp: its private permissions would keep converters on other accounts out
+    partial = target.with_name(f".{target.name}.{uuid.uuid4().hex}.partial")
+    partial.mkdir(parents=True)
+    try:
+        for output_name, _, html in pages:
+            (partial / output_name).write_text(html, encoding="utf-8")
+        plan = {
+            "version": PLAN_VERSION,
+            "final_pdf_name": final_pdf_name,
+            "pages": [{"html": output_name, "template": template_name} for output_name, template_name, _ in pages],
+        }
+        (partial / PLAN_FILENAME).write_text(json.dumps(plan, indent=2), encoding="utf-8")
+        os.rename(partial, target)  # fails if a bundle of the same name appeared meanwhile
+    except BaseException:
+        shutil.rmtree(partial, ignore_errors=True)
+        raise
+    return [str(target / output_name) for output_name, _, _ in pages]
+
+
+def read_bundle(bundle):
+    """Load a bundle's plan and return (final_pdf_name, html_paths).
+
+    Raises:
+        RuntimeError: If the plan is missing, unreadable, from an unknown
+                      version, or references pages that are not in the bundle.
+    """
+    bundle = Path(bundle)
+    plan_path = bundle / PLAN_FILENAME
+    if not plan_path.is_file():
+        raise RuntimeError(f"Render bundle '{bundle}' has no {PLAN_FILENAME}")
+
+    try:
+        plan = json.loads(plan_path.read_text(encoding="utf-8"))
+        if plan.get("version") != PLAN_VERSION:
+            raise RuntimeError(f"Render bundle '{bundle}' has unsupported version {plan.get('version')!r}")
+        final_pdf_name = plan["final_pdf_name"]
+        html_files = [str(bundle / page["html"]) for page in plan["pages"]]
+    except (ValueError, KeyError, TypeError, AttributeError) as exc:
+        raise RuntimeError(f"Render bundle '{bundle}' has an unreadable {PLAN_FILENAME}: {exc!r}") from exc
+
+    missing = [f for f in html_files if not Path(f).is_file()]
+    if missing:
+        raise RuntimeError(f"Render bundle '{bundle}' is missing pages: {missing}")
+    return final_pdf_name, html_files
+
+
+def claim_bundle(bundle):
+    """Atomically claim a bundle for conversion by renaming it.
+
+    Returns the claimed path, or None if another converter got there first.
+    Rename is atomic on local filesystems and on SMB/NFS shares, so several
+    hosts can drain the same folder without converting a bundle twice.
+    """
+    bundle = Path(bundle)
+    claimed = bundle.with_name(f"{bundle.name}.claimed-{socket.gethostname()}-{os.getpid()}")
+    try:
+        os.rename(bundle, claimed)
+    except OSError:
+        return None
+    return claimed
+
+
+def pending_bundles(directory):
+    """Return complete, unclaimed bundles in directory, oldest first."""
+    bundles = [
+        path for path in Path(directory).glob("*" + BUNDLE_SUFFIX)
+        if path.is_dir() and (path / PLAN_FILENAME).is_file()
+    ]
+    return sorted(bundles, key=lambda path: path.stat().st_mtime)
@@ -0,0 +1,226 @@
+"""Timeouts, retries and a circuit breaker for browser conversions.
+
+ResilientConverter wraps each page conversion:
+
+- The timeout follows observed latency: a multiple of the p99 of recent
+  successful conversions, clamped between a floor and a ceiling, and
+  doubled for each retry of the same page.
+- Transient failures (a crash, an empty PDF, a timeout) are retried a
+  bounded number of times after a randomised exponential backoff, so
+  parallel jobs do not retry in lockstep.
+- A circuit breaker opens after several consecutive transient failures and
+  rejects conversions immediately until a cool-down has passed, then lets a
+  single trial through. A broken browser install therefore stops the
+  remaining jobs at once instead of each waiting out its timeout. Callers
+  catch CircuitOpenError before RuntimeError and leave the job pending,
+  since the failure belongs to this host and not to the job.
+
+Every outcome is counted in ConversionMetrics.
+"""
+import math
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+
+
+class TransientConversionError(RuntimeError):
+    """A conversion failure that may succeed if retried."""
+
+
+class ConversionTimeout(TransientConversionError):
+    """A conversion that ran past its timeout."""
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of converting while the circuit breaker is open."""
+
+
+class LatencyTracker:
+    """Derives a conversion timeout from recent successful latencies.
+
+    Until min_samples conversions have succeeded the initial timeout is used.
+    """
+
+    def __init__(self, initial=30.0, multiplier=3.0, floor=5.0, ceiling=120.0, window=200, min_samples=20):
+        self.initial = initial
+        self.multiplier = multiplier
+        self.floor = floor
+        self.ceiling = ceiling
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q):
+        """The q-th percentile (0-100) of recent latencies, or None with no samples."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        rank = math.ceil(q / 100 * len(samples))  # nearest-rank method
+        return samples[min(max(rank, 1), len(samples)) - 1]
+
+    def timeout(self):
+        with self._lock:
+            enough = len(self._samples) >= self.min_samples
+        if not enough:
+            return self.initial
+        return min(max(self.percentile(99) * self.multiplier, self.floor), self.ceiling)
+
+
+@dataclass
+class RetryPolicy:
+    """attempts includes the first try; backoff before retry n is uniform in [0, min(max_delay, base_delay * 2**n)]."""
+    attempts: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 8.0
+
+    def delay(self, retry_number, rng=random):
+        return rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry_number))
+
+
+class CircuitBreaker:
+    """Opens after failure_threshold consecutive failures; half-opens after reset_after seconds."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, failure_threshold=5, reset_after=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.clock = clock
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go ahead now."""
+        with self._lock:
+            if self.state == self.OPEN and self.clock() - self._opened_at >= self.reset_after:
+                self.state = self.HALF_OPEN
+            if self.state == self.OPEN or (self.state == self.HALF_OPEN and self._trial_in_flight):
+                retry_in = max(self.reset_after - (self.clock() - self._opened_at), 0)
+                raise CircuitOpenError(f"Browser conversions are failing; not trying again for {retry_in:.0f}s")
+            if self.state == self.HALF_OPEN:
+                self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        """Count a failure; returns True if it opened the circuit."""
+        with self._lock:
+            self.consecutive_failures += 1
+            self._trial_in_flight = False
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                opened = self.state != self.OPEN
+                self.state = self.OPEN
+                self._opened_at = self.clock()
+                return opened
+            return False
+
+    def release_trial(self):
+        """Give up a half-open trial slot without a verdict (e.g. a non-transient error)."""
+        with self._lock:
+            self._trial_in_flight = False
+
+
+class ConversionMetrics:
+    """Thread-safe counters for conversion outcomes."""
+
+    COUNTERS = ("attempts", "succeeded", "failed", "retries", "timeouts", "transient_failures",
+                "short_circuited", "circuit_opened")
+
+    def __init__(self):
+        self.counts = dict.fromkeys(self.COUNTERS, 0)
+        self._lock = threading.Lock()
+
+    def increment(self, name, amount=1):
+        with self._lock:
+            self.counts[name] += amount
+
+
+class ResilientConverter:
+    """Applies the timeout, retry and circuit-breaker policy to a conversion function.
+
+    Args:
+        latency:   LatencyTracker supplying each attempt's timeout.
+        retry:     RetryPolicy for transient failures.
+        breaker:   CircuitBreaker shared by every conversion.
+        sleep/rng: Injectable for tests.
+    """
+
+    def __init__(self, latency=None, retry=None, breaker=None, sleep=time.sleep, rng=random):
+        self.latency = latency or LatencyTracker()
+        self.retry = retry or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+        self.metrics = ConversionMetrics()
+        self.sleep = sleep
+        self.rng = rng
+
+    def call(self, convert, *args):
+        """Call convert(*args, timeout=...) under the policy and return its result.
+
+        TransientConversionError is retried; any other exception is raised at
+        once. Raises CircuitOpenError while the breaker is open.
+        """
+        for attempt in range(self.retry.attempts):
+            try:
+                self.breaker.before_call()
+            except CircuitOpenError:
+                self.metrics.increment("short_circuited")
+                raise
+            timeout = min(self.latency.timeout() * 2 ** attempt, self.latency.ceiling)
+            self.metrics.increment("attempts")
+            started = time.monotonic()
+            try:
+                result = convert(*args, timeout=timeout)
+            except TransientConversionError as exc:
+                self.metrics.increment("transient_failures")
+                if isinstance(exc, ConversionTimeout):
+                    self.metrics.increment("timeouts")
+                if self.breaker.record_failure():
+                    self.metrics.increment("circuit_opened")
+                if attempt + 1 == self.retry.attempts or self.breaker.state == CircuitBreaker.OPEN:
+                    self.metrics.increment("failed")
+                    raise
+                self.metrics.increment("retries")
+                self.sleep(self.retry.delay(attempt, self.rng))
+                continue
+            except BaseException:
+                self.breaker.release_trial()
+                self.metrics.increment("failed")
+                raise
+            self.latency.record(time.monotonic() - started)
+            self.breaker.record_success()
+            self.metrics.increment("succeeded")
+            return result
+
+    def snapshot(self):
+        """Counters plus the current timeout, latency percentiles and breaker state."""
+        p50, p99 = self.latency.percentile(50), self.latency.percentile(99)
+        return {
+            **self.metrics.counts,
+            "timeout_seconds": round(self.latency.timeout(), 3),
+            "latency_p50_seconds": round(p50, 3) if p50 is not None else None,
+            "latency_p99_seconds": round(p99, 3) if p99 is not None else None,
+            "circuit_state": self.breaker.state,
+        }
+
+    def summary(self):
+        """One-line human-readable summary of snapshot()."""
+        s = self.snapshot()
+        return (f"Conversions: {s['succeeded']} ok, {s['failed']} failed, {s['retries']} retried, "
+                f"{s['timeouts']} timed out, {s['short_circuited']} rejected by open circuit; "
+                f"timeout {s['timeout_seconds']}s, p99 {s['latency_p99_seconds']}s, circuit {s['circuit_state']}.")
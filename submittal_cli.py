@@ -1,3 +1,7 @@
+import functools
+import hashlib
+import json
+import os
 import re
 
 from rich.console import Console
@@ -5,13 +9,18 @@ from rich.table import Table
 from rich.panel import Panel
 from rich.align import Align
 import click
-from html_to_pdf import create_final_pdf
-from custom_fill import render_output
+from output_sink import COLLISION_POLICIES, OVERWRITE, OutputSink, as_sink
+from pdf_options import PdfOptions
+from memory_profile import PROFILER
+from template_store import TemplateLockError, load_templates, save_template
 from datetime import datetime, timedelta
 from dateutil import parser as dateutil_parser
 import yaml
 from pathlib import Path
+import contextlib
+import shutil
 import sys
+from typing import Callable, NamedTuple, Optional
 
 VERSION = "1.0.0"
 
@@ -32,6 +41,37 @@ def _default_templates_path() -> Path:
     return local_path
 
 
+# MM/DD/YYYY (or M/D/YYYY) and YYYY-MM-DD cover nearly every manifest; they skip dateutil
+_US_DATE = re.compile(r"(\d{1,2})/(\d{1,2})/(\d{4})")
+_ISO_DATE = re.compile(r"(\d{4})-(\d{1,2})-(\d{1,2})")
+
+
+@functools.lru_cache(maxsize=4096)
+def normalize_review_date(value: str):
+    """Return value formatted as MM/DD/YYYY, or None if it is blank or cannot be parsed.
+
+    Common numeric formats are parsed directly; anything else (e.g. 'March
+    15 2025') goes through dateutil.parser. Results are memoized, since a
+    manifest repeats the same few dates across thousands of rows.
+    """
+    value = value.strip()
+    if not value:
+        return None
+    if match := _US_DATE.fullmatch(value):
+        month, day, year = match.groups()
+    elif match := _ISO_DATE.fullmatch(value):
+        year, month, day = match.groups()
+    if match:
+        try:
+            return datetime(int(year), int(month), int(day)).strftime("%m/%d/%Y")
+        except ValueError:
+            pass  # e.g. 15/03/2025; let dateutil decide, as it always has
+    try:
+        return dateutil_parser.parse(value).strftime("%m/%d/%Y")
+    except (ValueError, OverflowError):
+        return None
+
+
 def _parse_review_date(value: str) -> str:
     """Parse a user-supplied date string and return it formatted as MM/DD/YYYY.
 
@@ -39,21 +79,52 @@ def _parse_review_date(value: str) -> str:
     'March 15 2025', '2025-03-15'). Returns a date two weeks from today
     if value is blank or cannot be parsed.
     """
+    if normalized := normalize_review_date(value):
+        return normalized
     if value.strip():
-        try:
-            return dateutil_parser.parse(value.strip()).strftime("%m/%d/%Y")
-        except (ValueError, OverflowError):
-            console.print(f"Could not parse date '{value}' — defaulting to two weeks from today.", style="yellow")
+        console.print(f"Could not parse date '{value}' — defaulting to two weeks from today.", style="yellow")
+    return _default_review_date()
+
+
+def _default_review_date():
     return (datetime.now() + timedelta(weeks=2)).strftime("%m/%d/%Y")
 
 
-class XmtlBuildField:
+class _FieldBehaviour:
+    """processed_value and fill_field(), shared by standalone and schema-backed fields."""
+    __slots__ = ()
+
+    @property
+    def processed_value(self):
+        """Return processor(value) if a processor is defined, otherwise return raw value.
+
+        The processor is called even when value is empty, allowing it to supply
+        a default (e.g. returning '0' for a blank revision number).
+        """
+        if self._processor:
+            return self._processor(self.value)
+        return self.value
+
+    def fill_field(self):
+        """Prompt the user for a value if the field is currently empty.
+
+        Always prompts once. The user may press Enter to leave optional fields
+        blank. Required field validation and retry logic is handled by
+        XmtlBuild.fill_all_fields().
+        """
+        if not self.value:
+            self.value = click.prompt(self.prompt, default="")
+            #console.print(f"{self.name} set to: {self.processed_value} \n", style="green")
+
+
+class XmtlBuildField(_FieldBehaviour):
     """A single data field on a transmittal build.
 
     Holds the field's name, current value, and CLI prompt text. Optionally
     enforces a non-empty value at prompt time and applies a processor function
     to transform the raw value before it is used in rendering.
     """
+    __slots__ = ("name", "value", "prompt", "required", "_processor", "max_length")
 
     def __init__(self, name, value, prompt, required=False, processor=None, max_length=None):
         """Initialise the field.
@@ -72,37 +143,104 @@ class XmtlBuildField:
         self._processor = processor
         self.max_length = max_length
 
+
+class FieldSpec(NamedTuple):
+    """Schema entry for one XmtlBuild field, shared by every build."""
+    attribute: str
+    name: str
+    prompt: str
+    required: bool = False
+    processor: Optional[Callable] = None
+    max_length: Optional[int] = None
+
+    def process(self, value):
+        return self.processor(value) if self.processor else value
+
+
+def _default_revision(value):
+    return value.strip() if value.strip() else "0"
+
+
+def _split_reviewers(value):
+    return [name.strip() for name in value.split(";") if name.strip()]
+
+
+class BoundField(_FieldBehaviour):
+    """The XmtlBuildField interface over one value stored in an XmtlBuild.
+
+    Created on attribute access (build.submittal_number); reading or setting
+    value reads or writes the build's storage.
+    """
+    __slots__ = ("_build", "_index")
+
+    def __init__(self, build, index):
+        self._build = build
+        self._index = index
+
     @property
-    def processed_value(self):
-        """Return processor(value) if a processor is defined, otherwise return raw value.
+    def spec(self):
+        return XmtlBuild.FIELDS[self._index]
 
-        The processor is called even when value is empty, allowing it to supply
-        a default (e.g. returning '0' for a blank revision number).
-        """
-        if self._processor:
-            return self._processor(self.value)
-        return self.value
+    name = property(lambda self: self.spec.name)
+    prompt = property(lambda self: self.spec.prompt)
+    required = property(lambda self: self.spec.required)
+    max_length = property(lambda self: self.spec.max_length)
+    _processor = property(lambda self: self.spec.processor)
 
-    def fill_field(self):
-        """Prompt the user for a value if the field is currently empty.
+    @property
+    def value(self):
+        return self._build._values[self._index]
+
+    @value.setter
+    def value(self, value):
+        self._build._values[self._index] = value
+
+
+class _FieldAttribute:
+    """Class attribute that returns a BoundField for one schema index."""
+
+    def __init__(self, index):
+        self.index = index
+
+    def __get__(self, build, owner=None):
+        if build is None:
+            return owner.FIELDS[self.index]
+        return BoundField(build, self.index)
 
-        Always prompts once. The user may press Enter to leave optional fields
-        blank. Required field validation and retry logic is handled by
-        XmtlBuild.fill_all_fields().
-        """
-        if not self.value:
-            self.value = click.prompt(self.prompt, default="")
-            #console.print(f"{self.name} set to: {self.processed_value} \n", style="green")
 
 class XmtlBuild:
     """Represents all data needed to generate a submittal transmittal PDF.
 
-    Each piece of data is stored as an XmtlBuildField, which carries its own
-    prompt text, required flag, and optional processor. The class supports
-    loading pre-filled data from an xmtl_templates.yaml entry and interactively
-    prompting the user for any fields that are still empty.
+    The fields are declared once in FIELDS; a build stores only its twelve
+    raw values. Each field is read through an attribute (build.project_number)
+    that behaves like an XmtlBuildField, with its own prompt text, required
+    flag, and optional processor. The class supports loading pre-filled data
+    from an xmtl_templates.yaml entry and interactively prompting the user for
+    any fields that are still empty.
     """
 
+    FIELDS = (
+        FieldSpec("project_number", "Project_Number", "Input Project Number (e.g. 3238)", required=True),
+        FieldSpec("project_title", "Project_Title", "Input Project Title (e.g. Bay Tree Bookstore - Building Renovation for Student Services)", required=True),
+        FieldSpec("submittal_number", "Submittal_Number", "Input Submittal Number (e.g. 321313-01)", required=True),
+        FieldSpec("revision_number", "Revision_Number", "Input Revision Number, if left blank auto-populated with 0",
+                  required=True, processor=_default_revision),
+        FieldSpec("specification_section", "Specification_Section", "Input Specification Section (e.g. 32 13 13 Concrete Pavement)", required=True),
+        FieldSpec("submittal_name", "Submittal_Name", "Input Submittal Name (e.g. Engine Generator Product Data)", required=True),
+        FieldSpec("date_review_ends", "Date_Review_Ends",
+                  "Input review end date (MM/DD/YYYY, leave blank to default to two weeks from today)",
+                  processor=_parse_review_date),
+        FieldSpec("project_manager_name", "Project_Manager", "Input Project Manager Name (e.g. John Doe)"),
+        FieldSpec("edp_line1", "EDP_Address_Line_1", "Input EDP Name (e.g. EDP Inc.)"),
+        FieldSpec("edp_line2", "EDP_Address_Line_2", "Input EDP Address Line (e.g. 123 Main St.)"),
+        FieldSpec("edp_line3", "EDP_Address_Line_3", "Input EDP City, State, Zip (e.g. City, ST 12345)"),
+        FieldSpec("reviewer_names", "Reviewer_Names",
+                  "Input Reviewer Names (semicolon-delimited) (e.g. 'David Jessen, UCSC PP; Jeff Clothier, UCSC PP')",
+                  processor=_split_reviewers, max_length=540),
+    )
+
+    __slots__ = ("_values",)
+
     def __init__(self, project_number="", project_title="", submittal_number="", revision_number="",
                  specification_section="", submittal_name="", date_review_ends="",
                  project_manager_name="", edp_line1="", edp_line2="", edp_line3="", reviewer_names=""):
@@ -112,35 +250,14 @@ class XmtlBuild:
         specification_section, submittal_name) must be non-empty before to_render_dict()
         is called — validate() or fill_all_fields() will surface any gaps.
         """
-        self.project_number        = XmtlBuildField("Project_Number",        project_number,        "Input Project Number (e.g. 3238)",        required=True)
-        self.project_title         = XmtlBuildField("Project_Title",         project_title,         "Input Project Title (e.g. Bay Tree Bookstore - Building Renovation for Student Services)",         required=True)
-        self.submittal_number      = XmtlBuildField("Submittal_Number",      submittal_number,      "Input Submittal Number (e.g. 321313-01)",      required=True)
-        self.revision_number       = XmtlBuildField(
-            "Revision_Number",
-            revision_number,
-            "Input Revision Number, if left blank auto-populated with 0",
-            required=True,
-            processor=lambda v: v.strip() if v.strip() else "0"
-        )
-        self.specification_section = XmtlBuildField("Specification_Section", specification_section, "Input Specification Section (e.g. 32 13 13 Concrete Pavement)", required=True)
-        self.submittal_name        = XmtlBuildField("Submittal_Name",        submittal_name,        "Input Submittal Name (e.g. Engine Generator Product Data)",        required=True)
-        self.date_review_ends      = XmtlBuildField(
-            "Date_Review_Ends",
-            date_review_ends,
-            "Input review end date (MM/DD/YYYY, leave blank to default to two weeks from today)",
-            processor=_parse_review_date
-        )
-        self.project_manager_name  = XmtlBuildField("Project_Manager",       project_manager_name,  "Input Project Manager Name (e.g. John Doe)")
-        self.edp_line1             = XmtlBuildField("EDP_Address_Line_1",    edp_line1,             "Input EDP Name (e.g. EDP Inc.)")
-        self.edp_line2             = XmtlBuildField("EDP_Address_Line_2",    edp_line2,             "Input EDP Address Line (e.g. 123 Main St.)")
-        self.edp_line3             = XmtlBuildField("EDP_Address_Line_3",    edp_line3,             "Input EDP City, State, Zip (e.g. City, ST 12345)")
-        self.reviewer_names        = XmtlBuildField(
-            "Reviewer_Names",
-            reviewer_names,
-            "Input Reviewer Names (semicolon-delimited) (e.g. 'David Jessen, UCSC PP; Jeff Clothier, UCSC PP')",
-            processor=lambda v: [name.strip() for name in v.split(";") if name.strip()],
-            max_length=540
-        )
+        # in FIELDS order
+        self._values = [project_number, project_title, submittal_number, revision_number, specification_section,
+                        submittal_name, date_review_ends, project_manager_name, edp_line1, edp_line2, edp_line3,
+                        reviewer_names]
+
+    def fields(self):
+        """Return every field, in schema order."""
+        return [BoundField(self, index) for index in range(len(self.FIELDS))]
 
     @classmethod
     def empty(cls):
@@ -160,13 +277,35 @@ class XmtlBuild:
 
         Note:
             Project_Title in the YAML is stored as "number, title" and is split
-            back into project_number and project_title on load.
+            back into project_number and project_title on load. Entries saved
+            with save_as_template() count even before they are compacted into
+            the file.
         """
-        with open(yaml_path, "r") as f:
-            defaults = yaml.safe_load(f)
+        defaults = load_templates(yaml_path)
         if key not in defaults:
             raise KeyError(f"Key '{key}' not found in {yaml_path}\n")
-        d = defaults[key]
+        return cls.from_dict(defaults[key])
+
+    @classmethod
+    def from_dict(cls, d):
+        """Create an XmtlBuild from a mapping keyed like an xmtl_templates.yaml entry.
+
+        Used for template entries, batch manifest rows and JSON input. Missing
+        keys and None values are treated as empty strings. A to_render_dict()
+        output is accepted too: its Reviewer_Name_N keys are joined into
+        reviewer_list when that key is absent.
+
+        Note:
+            Project_Title is stored as "number, title" and is split back into
+            project_number and project_title.
+        """
+        d = {key: "" if value is None else str(value) for key, value in d.items()}
+        if "reviewer_list" not in d:
+            numbered = sorted(
+                (int(key.rsplit("_", 1)[1]), value) for key, value in d.items()
+                if key.startswith("Reviewer_Name_") and key.rsplit("_", 1)[1].isdigit()
+            )
+            d["reviewer_list"] = ";".join(value for _, value in numbered)
         # yaml stores combined "number, title" — split them back out
         title_parts = d.get("Project_Title", "").split(", ", 1)
         project_number = title_parts[0] if len(title_parts) > 1 else ""
@@ -194,8 +333,8 @@ class XmtlBuild:
         considered satisfied without re-prompting the user.
         """
         return [
-            field.name for field in vars(self).values()
-            if isinstance(field, XmtlBuildField) and field.required and not field.processed_value
+            spec.name for spec, value in zip(self.FIELDS, self._values)
+            if spec.required and not spec.process(value)
         ]
 
     @property
@@ -254,8 +393,8 @@ class XmtlBuild:
         # Retry loop — re-prompt only fields still failing validation after the first pass
         while missing := self.validate():
             console.print(f"\nThe following required fields are still missing: {missing}", style="red")
-            for field in vars(self).values():
-                if isinstance(field, XmtlBuildField) and field.name in missing:
+            for field in self.fields():
+                if field.name in missing:
                     field.value = ""
                     field.fill_field()
 
@@ -265,22 +404,85 @@ class XmtlBuild:
         Uses processed_value for all fields so that any processor-generated
         defaults or transformations are reflected in the output.
         """
+        (project_number, project_title, submittal_number, revision_number, specification_section, submittal_name,
+         date_review_ends, project_manager_name, edp_line1, edp_line2, edp_line3, reviewer_names) = self._values
         d = {
-            "Project_Title":        f"{self.project_number.value}, {self.project_title.value}",
-            "Submittal_Number":     self.submittal_number.value,
-            "Revision_Number":      self.revision_number.processed_value,
-            "Date_Review_Ends":     self.date_review_ends.processed_value,
-            "Specification_Section": self.specification_section.value,
-            "Submittal_Name":       self.submittal_name.value,
-            "Project_Manager":      self.project_manager_name.value,
-            "EDP_Address_Line_1":   self.edp_line1.value,
-            "EDP_Address_Line_2":   self.edp_line2.value,
-            "EDP_Address_Line_3":   self.edp_line3.value,
+            "Project_Title":        f"{project_number}, {project_title}",
+            "Submittal_Number":     submittal_number,
+            "Revision_Number":      _default_revision(revision_number),
+            "Date_Review_Ends":     _parse_review_date(date_review_ends),
+            "Specification_Section": specification_section,
+            "Submittal_Name":       submittal_name,
+            "Project_Manager":      project_manager_name,
+            "EDP_Address_Line_1":   edp_line1,
+            "EDP_Address_Line_2":   edp_line2,
+            "EDP_Address_Line_3":   edp_line3,
         }
-        for i, name in enumerate(self.reviewer_names.processed_value or [], start=1):
+        for i, name in enumerate(_split_reviewers(reviewer_names), start=1):
             d[f"Reviewer_Name_{i}"] = name
         return d
 
+    def to_dict(self, skip_empty=False):
+        """Return the raw field values keyed by constructor argument name.
+
+        XmtlBuild(**build.to_dict()) recreates the build. With skip_empty,
+        blank fields are left out so the result can be layered over another
+        build's values.
+        """
+        return {
+            spec.attribute: value for spec, value in zip(self.FIELDS, self._values)
+            if value or not skip_empty
+        }
+
+    def to_template_dict(self):
+        """Return the raw field values keyed like an xmtl_templates.yaml entry; from_dict() reverses it.
+
+        The review date is left out, so each use of the template defaults it again.
+        """
+        values = self.to_dict()
+        number, title = values["project_number"], values["project_title"]
+        return {
+            "Project_Title":         f"{number}, {title}" if number else title,
+            "Submittal_Number":      values["submittal_number"],
+            "Revision_Number":       values["revision_number"],
+            "Specification_Section": values["specification_section"],
+            "Submittal_Name":        values["submittal_name"],
+            "Project_Manager":       values["project_manager_name"],
+            "EDP_Address_Line_1":    values["edp_line1"],
+            "EDP_Address_Line_2":    values["edp_line2"],
+            "EDP_Address_Line_3":    values["edp_line3"],
+            "reviewer_list":         values["reviewer_names"],
+        }
+
+    def save_as_template(self, key, yaml_path=None):
+        """Add or update the entry key in a templates file (xmtl_templates.yaml by default).
+
+        The entry is appended to the file's overlay journal under a lock
+        rather than rewriting the YAML; see template_store. Returns True if
+        the save also compacted the overlay into the file.
+        """
+        return save_template(yaml_path or _default_templates_path(), key, self.to_template_dict())
+
+    def input_hash(self, resolve_dates=False):
+        """Return a SHA-256 hex digest of the raw field values.
+
+        Raw values are hashed rather than to_render_dict(), so a blank review
+        date (which defaults relative to today) hashes the same on every run.
+        With resolve_dates, the review date is hashed as it would be printed
+        today instead, so the hash identifies the PDF's contents; the
+        transmittal registry uses this, so a later request does not get a
+        PDF with a stale default date.
+        """
+        values = {spec.name: value for spec, value in zip(self.FIELDS, self._values)}
+        if resolve_dates:
+            date = self.date_review_ends.value
+            values["Date_Review_Ends"] = normalize_review_date(date) or _default_review_date()
+        return hashlib.sha256(json.dumps(values, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+for _index, _spec in enumerate(XmtlBuild.FIELDS):
+    setattr(XmtlBuild, _spec.attribute, _FieldAttribute(_index))
+
 
 def review_dictionary(dictionary, title):
     """Print a Rich table summarising a render dictionary then ask the user to confirm.
@@ -332,13 +534,80 @@ def submittal_filename(project_number: str, revision: str, submittal_number: str
     
     return filename_str
 
+def build_filename(build):
+    """Return the submittal_filename() for a build."""
+    return submittal_filename(
+        project_number=build.project_number.value,
+        revision=build.revision_number.processed_value,
+        submittal_number=build.submittal_number.value,
+        submittal_title=build.submittal_name.value
+    )
+
+
+def generate_transmittal(build, output_dir=None, work_dir=None, concurrency=None, registry=None, pdf_options=None,
+                         final_pdf_name=None):
+    """Render and print a complete build without any prompting.
+
+    The PDF is named final_pdf_name, or build_filename(build) if not given,
+    and written to output_dir: a folder, an output_sink.OutputSink or a
+    zip_sink.ZipSink.
+
+    work_dir holds the intermediate HTML and PDF pages (the current directory
+    if not given); concurrent callers must each use their own. concurrency and
+    pdf_options are passed through to create_final_pdf(). If a registry.TransmittalRegistry
+    is given, a build identical to one already generated with the same
+    pdf_options returns the existing PDF immediately, and new PDFs are
+    recorded in it.
+
+    Returns:
+        The path of the final PDF.
+
+    Raises:
+        ValueError:   If required fields are missing.
+        RuntimeError: If conversion fails.
+    """
+    from custom_fill import render_output
+    from html_to_pdf import create_final_pdf
+
+    if missing := build.validate():
+        raise ValueError(f"Missing required fields: {missing}")
+    final_pdf_name = final_pdf_name or build_filename(build)
+    sink = as_sink(output_dir)
+    if registry is not None and (existing := registry.lookup(build, pdf_options)):
+        if existing == sink.path_for(final_pdf_name).resolve():
+            return existing
+        with open(existing, "rb") as source:
+            target = sink.write(final_pdf_name, lambda f: shutil.copyfileobj(source, f),
+                                input_hash=build.input_hash())
+        registry.record(build, target, pdf_options)
+        return target
+    HTML_FILES = render_output(build.to_render_dict(), work_dir=work_dir)
+    final_path = create_final_pdf(final_pdf_name, HTML_FILES, output_dir=sink, concurrency=concurrency,
+                                  pdf_options=pdf_options, input_hash=build.input_hash())
+    if registry is not None:
+        registry.record(build, final_path, pdf_options)
+    return final_path
+
+
 def create_table_from_list(title, input_list):
     table = Table(border_style="yellow")
     table.add_column(title, style="yellow", header_style="bold yellow", no_wrap=True) 
     for key in input_list: table.add_row(key)
     console.print((table))
 
-if __name__ == "__main__":
+def run_interactive(bundle_dir=None, inline_assets=False, registry=None, pdf_options=None, preview=False,
+                    client=None):
+    """Run the interactive prompt loop until the user chooses to exit.
+
+    If bundle_dir is given, each confirmed submittal is written there as a
+    render bundle for a later `convert` run instead of being printed to PDF.
+    inline_assets embeds the stylesheet and images in each page as data URIs.
+    With a registry, a submittal identical to one already generated is
+    served from the existing PDF. pdf_options is passed to create_final_pdf().
+    With preview, a text mock-up of every page is shown before confirmation.
+    With client, a daemon.DaemonClient, the templates file is parsed and
+    each submittal rendered and printed by the resident daemon.
+    """
     console.print(r"""
  __  __     __    __     ______   __            ______   ______     ______     ______   ______     ______     __  __    
 /\_\_\_\   /\ "-./  \   /\__  _\ /\ \          /\  ___\ /\  __ \   /\  ___\   /\__  _\ /\  __ \   /\  == \   /\ \_\ \   
@@ -365,8 +634,10 @@ if __name__ == "__main__":
         yaml_path = _default_templates_path()
 
         if yaml_path.is_file():
-            with open(yaml_path, "r", encoding="utf-8") as f:
-                defaults = yaml.safe_load(f) or {}
+            if client is not None:
+                defaults = dict(client.templates(yaml_path.resolve()))
+            else:
+                defaults = load_templates(yaml_path)
             defaults.pop("KEY", None)
             if defaults: create_table_from_list("Template Keys", defaults.keys())
 
@@ -377,7 +648,12 @@ if __name__ == "__main__":
 
         if default_key:
             try:
-                build = XmtlBuild.from_yaml(str(_default_templates_path()), default_key)
+                if client is not None:
+                    if default_key not in defaults:
+                        raise KeyError(f"Key '{default_key}' not found in {yaml_path}\n")
+                    build = XmtlBuild.from_dict(defaults[default_key])
+                else:
+                    build = XmtlBuild.from_yaml(str(_default_templates_path()), default_key)
                 console.print(f"\nXmtl template '{default_key}' loaded. You will be prompted for any missing values.\n", style="bold green")
                 build.fill_all_fields(True)
 
@@ -402,23 +678,61 @@ if __name__ == "__main__":
             console.print("\nSummary of Submittal Inputs", style="bold yellow")
 
         dictionary = build.to_render_dict()
+        if preview:
+            from preview import render_preview
+
+            console.print(*render_preview(dictionary))
         if not review_dictionary(dictionary, "Submittal Details"):
             console.print("\nStarting new submittal generation...", style="green")
             continue
 
-        HTML_FILES = render_output(dictionary)
         #final_pdf_name = click.prompt("Input name for final submittal file")
-        final_pdf_name = submittal_filename(
-            project_number=build.project_number.value,
-            revision=build.revision_number.processed_value,
-            submittal_number=build.submittal_number.value,
-            submittal_title=build.submittal_name.value
-        )
+        final_pdf_name = build_filename(build)
         console.print(f"\nGenerated submittal filename: {final_pdf_name}\n", style="green")
-        create_final_pdf(final_pdf_name, HTML_FILES)
 
-        console.rule(style="green")
-        console.print(f"[bold green]✔ Submittal PDF '[cyan]{final_pdf_name}[/cyan]' generated successfully![/bold green]\n")
+        if bundle_dir:
+            from custom_fill import render_output
+
+            try:
+                render_output(dictionary, bundle_dir=bundle_dir, final_pdf_name=final_pdf_name)
+            except FileExistsError as exc:
+                console.print(f"Could not write the render bundle: {exc}", style="red")
+            else:
+                console.rule(style="green")
+                console.print(f"[bold green]✔ Render bundle for '[cyan]{final_pdf_name}[/cyan]' written to {bundle_dir}[/bold green]\n")
+        elif registry is not None and (existing := registry.lookup(build, pdf_options)):
+            console.rule(style="green")
+            console.print(f"[bold green]✔ An identical submittal was already generated: [cyan]{existing}[/cyan][/bold green]\n")
+        else:
+            if client is not None:
+                final_path = client.generate(build, final_pdf_name, inline_assets=inline_assets,
+                                             pdf_options=pdf_options)
+            else:
+                # imported here so that a client of the daemon never loads the PDF and template stack
+                from custom_fill import render_output
+                from html_to_pdf import create_final_pdf
+
+                HTML_FILES = render_output(dictionary, inline_assets=inline_assets)
+                final_path = create_final_pdf(final_pdf_name, HTML_FILES, pdf_options=pdf_options)
+            if registry is not None:
+                registry.record(build, final_path, pdf_options)
+
+            console.rule(style="green")
+            console.print(f"[bold green]✔ Submittal PDF '[cyan]{final_pdf_name}[/cyan]' generated successfully![/bold green]\n")
+
+        # only values typed in by hand are offered; a loaded template is already saved
+        save_key = "" if default_key else str(click.prompt(
+            "Save these values as a template? Input a key to save them under (press ENTER to skip)", default=""
+        )).strip()
+        if save_key:
+            try:
+                build.save_as_template(save_key, yaml_path)
+                console.print(f"[green]✔ Saved as template '{save_key}'[/green]\n")
+            except (ValueError, TemplateLockError, OSError, yaml.YAMLError) as exc:
+                console.print(f"Could not save template '{save_key}': {exc}", style="red")
+
+        if growth := PROFILER.iteration():
+            console.print(f"[yellow]{growth}[/yellow]")
         if not click.confirm("Would you like to generate another submittal?", default=False):
             console.rule(style="dim")
             console.print(Align.center("Thank you for using XMTL Factory! Goodbye!", style="bold green"))
@@ -429,10 +743,584 @@ if __name__ == "__main__":
         console.print()
 
 
+def _report_concurrency(decision):
+    if decision.new_limit != decision.old_limit:
+        click.echo(f"Concurrency {decision.old_limit} -> {decision.new_limit}: {decision.reason}", err=True)
 
 
+def concurrency_options(command):
+    """Add the page-conversion concurrency options to a click command.
 
+    The decorated function receives a single `concurrency` argument: None for
+    sequential conversion, or an AdaptiveConcurrency when --max-concurrency > 1.
+    """
+    @click.option("--min-concurrency", type=int, default=1, show_default=True,
+                  help="Lower bound on simultaneous browser conversions.")
+    @click.option("--max-concurrency", type=int, default=1, show_default=True,
+                  help="Upper bound on simultaneous browser conversions; above 1 the limit adapts to available memory.")
+    @click.option("--memory-reserve-mb", type=int, default=1024, show_default=True,
+                  help="Memory to keep free; concurrency backs off below it.")
+    @functools.wraps(command)
+    def wrapper(*args, min_concurrency, max_concurrency, memory_reserve_mb, **kwargs):
+        concurrency = None
+        if max_concurrency > 1:
+            from concurrency import AdaptiveConcurrency
+
+            concurrency = AdaptiveConcurrency(min_limit=min(min_concurrency, max_concurrency),
+                                              max_limit=max_concurrency, reserve_mb=memory_reserve_mb,
+                                              on_decision=_report_concurrency)
+        return command(*args, concurrency=concurrency, **kwargs)
+    return wrapper
+
+
+def output_options(command):
+    """Add --output-dir and the output sink options to a click command.
+
+    The decorated function receives a single `sink` argument, an OutputSink
+    that is flushed when the command returns.
+    """
+    @click.option("--output-dir", type=click.Path(file_okay=False), default=None,
+                  help="Folder for the final PDFs (defaults to ~/Downloads).")
+    @click.option("--on-collision", type=click.Choice(COLLISION_POLICIES), default=OVERWRITE, show_default=True,
+                  help="What to do when a PDF with the same name already exists.")
+    @click.option("--fsync-every", type=click.IntRange(min=0), default=1, show_default=True,
+                  help="Sync written PDFs to disk in batches of N (0 to never); larger batches are faster on "
+                       "network shares.")
+    @functools.wraps(command)
+    def wrapper(*args, output_dir, on_collision, fsync_every, **kwargs):
+        with OutputSink(output_dir, collision=on_collision, fsync_every=fsync_every) as sink:
+            return command(*args, sink=sink, **kwargs)
+    return wrapper
+
+
+def metrics_options(command):
+    """Add options to expose the metrics registry over HTTP or as a file while the command runs."""
+    @click.option("--metrics-port", type=int, default=None,
+                  help="Serve Prometheus metrics at http://127.0.0.1:PORT/metrics while running.")
+    @click.option("--metrics-file", type=click.Path(dir_okay=False), default=None,
+                  help="Write Prometheus metrics to this file periodically and on exit.")
+    @click.option("--metrics-interval", type=float, default=15.0, show_default=True,
+                  help="Seconds between --metrics-file writes.")
+    @functools.wraps(command)
+    def wrapper(*args, metrics_port, metrics_file, metrics_interval, **kwargs):
+        import metrics
+
+        server = metrics.serve(port=metrics_port) if metrics_port is not None else None
+        dumper = metrics.FileDumper(metrics_file, interval=metrics_interval).start() if metrics_file else None
+        try:
+            return command(*args, **kwargs)
+        finally:
+            if dumper:
+                dumper.stop()
+            if server:
+                server.shutdown()
+    return wrapper
+
+
+def _report_conversions():
+    """Print the conversion retry/timeout/circuit-breaker counters on stderr, if anything was converted."""
+    from html_to_pdf import conversion_guard
+
+    counts = conversion_guard.metrics.counts
+    if counts["attempts"] or counts["short_circuited"]:
+        click.echo(conversion_guard.summary(), err=True)
+
+
+@contextlib.contextmanager
+def _stop_when_circuit_opens():
+    """Exit with status 1 when the circuit breaker stops a command; unfinished work is left for a later run."""
+    from resilience import CircuitOpenError
+
+    try:
+        yield
+    except CircuitOpenError as exc:
+        click.echo(f"Stopped: {exc}. Unfinished work was left pending.", err=True)
+        _report_conversions()
+        sys.exit(1)
+
+
+@contextlib.contextmanager
+def _manifest_errors():
+    """Report a manifest that cannot be read as a plain error, not a traceback."""
+    from batch import ManifestError
+
+    try:
+        yield
+    except ManifestError as exc:
+        raise click.ClickException(str(exc))
+
+
+def registry_option(command):
+    """Add --no-registry to a click command; the function receives a `registry` argument."""
+    @click.option("--no-registry", is_flag=True, default=False,
+                  help="Always regenerate, without consulting or updating the transmittal registry.")
+    @functools.wraps(command)
+    def wrapper(*args, no_registry, **kwargs):
+        from registry import TransmittalRegistry
+
+        return command(*args, registry=None if no_registry else TransmittalRegistry(), **kwargs)
+    return wrapper
+
+
+def pdf_output_options(command):
+    """Add options for how the merged PDF is written; the function receives a `pdf_options` argument."""
+    @click.option("--deterministic", is_flag=True, default=False,
+                  help="Write byte-identical PDFs for identical inputs (dates from SOURCE_DATE_EPOCH, if set).")
+    @click.option("--linearize", is_flag=True, default=False,
+                  help="Write linearized (fast web view) PDFs that open quickly from network shares. "
+                       "Needs pikepdf or qpdf.")
+    @click.option("--image-dpi", type=click.IntRange(min=36), default=None,
+                  help="Downsample images displayed above this resolution (e.g. 150). Needs Pillow.")
+    @click.option("--max-pdf-bytes", "max_bytes", type=click.IntRange(min=1), default=None,
+                  help="Fail any PDF still larger than this after downsampling images further to fit.")
+    @functools.wraps(command)
+    def wrapper(*args, deterministic, linearize, image_dpi, max_bytes, **kwargs):
+        pdf_options = PdfOptions(deterministic=deterministic, linearize=linearize, image_dpi=image_dpi,
+                                 max_bytes=max_bytes)
+        return command(*args, pdf_options=pdf_options, **kwargs)
+    return wrapper
+
+
+@click.group(invoke_without_command=True)
+@click.option("--bundle-dir", type=click.Path(file_okay=False), default=None,
+              help="Write render bundles to this folder instead of printing PDFs.")
+@click.option("--inline-assets", is_flag=True, default=False,
+              help="Embed the stylesheet and images in each page as data URIs.")
+@click.option("--no-registry", is_flag=True, default=False,
+              help="Always regenerate, without consulting or updating the transmittal registry.")
+@click.option("--preview", is_flag=True, default=False,
+              help="Show a text mock-up of every page before asking for confirmation.")
+@click.option("--no-daemon", is_flag=True, default=False,
+              help="Render and print in this process even if a daemon (`daemon start`) is running.")
+@click.option("--profile-memory", is_flag=True, default=False,
+              help="Trace memory per stage (render, convert, merge, write) and print a report on exit; slow.")
+@pdf_output_options
+@click.pass_context
+def cli(ctx, bundle_dir, inline_assets, no_registry, preview, no_daemon, profile_memory, pdf_options):
+    """Generate submittal transmittal PDFs. Runs the interactive prompts when no command is given."""
+    if profile_memory:
+        PROFILER.enable()
+        ctx.call_on_close(lambda: click.echo(PROFILER.report(), err=True))
+        no_daemon = True  # profile the work in this process, not in the daemon
+    if ctx.invoked_subcommand is None:
+        from daemon import connect
+        from registry import TransmittalRegistry
+
+        client = None if no_daemon or bundle_dir else connect()
+        try:
+            run_interactive(bundle_dir=bundle_dir, inline_assets=inline_assets,
+                            registry=None if no_registry else TransmittalRegistry(), pdf_options=pdf_options,
+                            preview=preview, client=client)
+        finally:
+            if client is not None:
+                client.close()
+
+
+# (option, XmtlBuild argument, help) for every field `generate` accepts on the command line
+GENERATE_FIELD_OPTIONS = [
+    ("--project-number", "project_number", "Project number (e.g. 3238)."),
+    ("--project-title", "project_title", "Project title."),
+    ("--submittal-number", "submittal_number", "Submittal number (e.g. 321313-01)."),
+    ("--revision", "revision_number", "Revision number (defaults to 0)."),
+    ("--spec-section", "specification_section", "Specification section (e.g. '32 13 13 Concrete Pavement')."),
+    ("--submittal-name", "submittal_name", "Submittal name."),
+    ("--review-ends", "date_review_ends", "Review end date (defaults to two weeks from today)."),
+    ("--project-manager", "project_manager_name", "Project manager name."),
+    ("--edp-line1", "edp_line1", "EDP name; omit to skip the EDP page."),
+    ("--edp-line2", "edp_line2", "EDP address line."),
+    ("--edp-line3", "edp_line3", "EDP city, state and zip."),
+    ("--reviewers", "reviewer_names", "Semicolon-delimited reviewer names."),
+]
+
+
+def _generate_field_options(command):
+    for option, argument, help_text in reversed(GENERATE_FIELD_OPTIONS):
+        command = click.option(option, argument, default=None, help=help_text)(command)
+    return command
+
+
+def _fail(error_type, message, exit_code, **details):
+    """Print a structured error as JSON on stderr and exit."""
+    click.echo(json.dumps({"error": error_type, "message": message, **details}), err=True)
+    sys.exit(exit_code)
+
+
+def _layered_build(templates_path, template_key, json_input, fields):
+    """Build an XmtlBuild from a template key, then a JSON object, then field options; exits on bad input."""
+    values = {}
+    if template_key:
+        try:
+            values.update(XmtlBuild.from_yaml(str(templates_path), template_key).to_dict())
+        except KeyError:
+            _fail("unknown_template", f"Template key '{template_key}' not found", 2)
+    if json_input:
+        try:
+            payload = json.load(json_input)
+        except json.JSONDecodeError as exc:
+            _fail("invalid_json", str(exc), 2)
+        if not isinstance(payload, dict):
+            _fail("invalid_json", "Expected a JSON object", 2)
+        values.update(XmtlBuild.from_dict(payload).to_dict(skip_empty=True))
+    values.update({argument: value for argument, value in fields.items() if value is not None})
+    return XmtlBuild(**values)
+
+
+@contextlib.contextmanager
+def _quiet_console():
+    """Silence the shared Rich console until the block exits, then restore it."""
+    quiet, console.quiet = console.quiet, True
+    try:
+        yield
+    finally:
+        console.quiet = quiet
+
+
+@cli.command()
+@click.option("--template", "template_key", default=None, help="Start from this xmtl_templates.yaml key.")
+@click.option("--json", "json_input", type=click.File("r"), default=None,
+              help="Read field values from a JSON object ('-' for stdin), keyed like a template "
+                   "entry or a render dictionary.")
+@_generate_field_options
+@click.option("--output", type=click.Path(dir_okay=False), default=None,
+              help="Final PDF path (defaults to the generated filename in ~/Downloads).")
+@click.option("--on-collision", type=click.Choice(COLLISION_POLICIES), default=OVERWRITE, show_default=True,
+              help="What to do when a PDF with the same name already exists.")
+@registry_option
+@pdf_output_options
+def generate(template_key, json_input, output, on_collision, registry, pdf_options, **fields):
+    """Generate one transmittal without prompting and print its path.
+
+    Values are layered: the template first, then the JSON object, then any
+    field options. Errors are printed to stderr as a JSON object with exit
+    status 2 for invalid input and 1 for conversion failures or a PDF that
+    could not be written.
+    """
+    with _quiet_console():
+        build = _layered_build(_default_templates_path(), template_key, json_input, fields)
 
+        if missing := build.validate():
+            _fail("missing_fields", f"Missing required fields: {missing}", 2, fields=missing)
+
+        output_dir = final_pdf_name = None
+        if output:
+            output_dir, final_pdf_name = Path(output).resolve().parent, Path(output).name
+        try:
+            # progress messages from the conversion go to stderr so stdout carries only the path
+            with contextlib.redirect_stdout(sys.stderr):
+                final_path = generate_transmittal(build, output_dir=OutputSink(output_dir, collision=on_collision),
+                                                  registry=registry,
+                                                  pdf_options=pdf_options, final_pdf_name=final_pdf_name)
+        except RuntimeError as exc:
+            _fail("conversion_failed", str(exc), 1)
+        except OSError as exc:
+            _fail("output_failed", str(exc), 1)
+        click.echo(str(Path(final_path).resolve()))
+
+
+@cli.command("save-template")
+@click.argument("key")
+@click.option("--template", "template_key", default=None, help="Start from this existing template key.")
+@click.option("--json", "json_input", type=click.File("r"), default=None,
+              help="Read field values from a JSON object ('-' for stdin), keyed like a template entry.")
+@_generate_field_options
+@click.option("--templates", "templates_path", type=click.Path(dir_okay=False), default=None,
+              help="Templates file to save into (defaults to xmtl_templates.yaml).")
+def save_template_command(key, template_key, json_input, templates_path, **fields):
+    """Add or update template KEY without rewriting the whole templates file.
+
+    Values are layered as in `generate`. The entry is appended to the
+    templates file's overlay journal and folded into the YAML every few
+    saves. Errors are printed to stderr as a JSON object.
+    """
+    templates_path = Path(templates_path) if templates_path else _default_templates_path()
+    build = _layered_build(templates_path, template_key, json_input, fields)
+    try:
+        compacted = build.save_as_template(key, templates_path)
+    except ValueError as exc:
+        _fail("invalid_key", str(exc), 2)
+    except TemplateLockError as exc:
+        _fail("locked", str(exc), 1)
+    click.echo(f"Saved template '{key.strip()}' to {templates_path}" + (" (compacted)" if compacted else ""))
+
+
+@cli.command()
+@click.argument("bundle_dir", type=click.Path(exists=True, file_okay=False))
+@output_options
+@concurrency_options
+@pdf_output_options
+@metrics_options
+def convert(bundle_dir, sink, concurrency, pdf_options):
+    """Convert every render bundle in BUNDLE_DIR to a final PDF."""
+    from html_to_pdf import convert_bundles
+
+    with _stop_when_circuit_opens():
+        converted, failed = convert_bundles(bundle_dir, output_dir=sink, concurrency=concurrency,
+                                            pdf_options=pdf_options)
+    click.echo(f"Converted {len(converted)} bundle(s), {len(failed)} failed.")
+    _report_conversions()
+    if failed:
+        sys.exit(1)
+
+
+@cli.command()
+@click.argument("manifest", type=click.Path(exists=True, dir_okay=False))
+@output_options
+@click.option("--journal", "journal_path", type=click.Path(dir_okay=False), default=None,
+              help="Checkpoint journal (defaults to MANIFEST.journal.jsonl).")
+@concurrency_options
+@registry_option
+@click.option("--zip", "zip_path", type=click.Path(dir_okay=False), default=None,
+              help="Stream the PDFs into this zip archive (placed in the output folder if relative).")
+@click.option("--zip-max-bytes", type=click.IntRange(min=1), default=None,
+              help="Start a new archive (NAME-2.zip, ...) before one grows past this size.")
+@click.option("--rows-in-flight", "window", type=click.IntRange(min=1), default=1, show_default=True,
+              help="Generate up to N manifest rows at once, each in its own work folder "
+                   "(more while an adaptive --max-concurrency limit is higher).")
+@pdf_output_options
+@metrics_options
+def batch(manifest, sink, journal_path, zip_path, zip_max_bytes, window, concurrency, registry, pdf_options):
+    """Generate a transmittal for every row of a CSV or NDJSON MANIFEST.
+
+    Completed rows are recorded in a journal, so rerunning the same manifest
+    after a crash or Ctrl+C skips them and retries only failures. With
+    --zip, each PDF is added to the archive as soon as it is produced.
+    """
+    from batch import run_batch
+    from zip_sink import ZipSink
+
+    with _stop_when_circuit_opens(), _manifest_errors():
+        if zip_path:
+            with ZipSink(zip_path, directory=sink.directory, max_bytes=zip_max_bytes) as archive:
+                summary = run_batch(manifest, output_dir=archive, journal_path=journal_path,
+                                    concurrency=concurrency, registry=registry, pdf_options=pdf_options,
+                                    window=window)
+            for path in archive.archives:
+                click.echo(f"Wrote {path}")
+        else:
+            summary = run_batch(manifest, output_dir=sink, journal_path=journal_path, concurrency=concurrency,
+                                registry=registry, pdf_options=pdf_options, window=window)
+    click.echo(f"{summary['done']} generated, {summary['skipped']} already done, "
+               f"{summary['duplicate']} duplicate, {summary['failed']} failed.")
+    _report_conversions()
+    if summary["failed"]:
+        sys.exit(1)
+
+
+@cli.command()
+@click.argument("manifest", type=click.Path(exists=True, dir_okay=False))
+@click.option("--json", "as_json", is_flag=True, default=False, help="Print the report as a JSON object.")
+def validate(manifest, as_json):
+    """Check every row of MANIFEST without generating anything.
+
+    Reports missing required fields, unparseable review dates, over-long
+    reviewer lists, and output filenames that are illegal or used by more
+    than one row. Exits with status 1 if any row has a problem.
+    """
+    from preflight import validate_manifest
+
+    with _manifest_errors():
+        report = validate_manifest(manifest)
+    click.echo(json.dumps(report.to_dict(), indent=2) if as_json else report.format())
+    if not report.ok:
+        sys.exit(1)
+
+
+@cli.command()
+@click.argument("manifest", type=click.Path(exists=True, dir_okay=False))
+@click.option("--queue", "queue_path", type=click.Path(dir_okay=False), required=True,
+              help="Shared queue database file.")
+def enqueue(manifest, queue_path):
+    """Add every row of MANIFEST to a shared work queue for `worker` processes."""
+    from batch import enqueue_manifest
+
+    with _manifest_errors():
+        queued = enqueue_manifest(manifest, queue_path)
+    click.echo(f"Queued {queued} new job(s).")
+
+
+@cli.command()
+@click.option("--queue", "queue_path", type=click.Path(dir_okay=False), required=True,
+              help="Shared queue database file.")
+@output_options
+@click.option("--worker-id", default=None, help="Name for this worker (defaults to host-pid).")
+@click.option("--lease-seconds", type=int, default=300, show_default=True,
+              help="How long a job stays reserved before other workers may reclaim it.")
+@click.option("--poll-interval", type=float, default=1.0, show_default=True)
+@click.option("--forever", is_flag=True, default=False, help="Keep polling after the queue drains.")
+@concurrency_options
+@registry_option
+@pdf_output_options
+@metrics_options
+def worker(queue_path, sink, worker_id, lease_seconds, poll_interval, forever, concurrency, registry,
+           pdf_options):
+    """Pull jobs from a shared queue and generate them until it is drained."""
+    from batch import transmittal_handler
+    from work_queue import run_worker
+
+    with _stop_when_circuit_opens():
+        stats = run_worker(queue_path, transmittal_handler(sink, concurrency, registry, pdf_options),
+                           worker_id=worker_id, poll_interval=poll_interval, exit_when_idle=not forever,
+                           lease_seconds=lease_seconds)
+    click.echo(f"{stats['worker_id']}: {stats['jobs_done']} done, {stats['jobs_failed']} failed, "
+               f"{stats['jobs_per_minute']} jobs/min.")
+    _report_conversions()
+
+
+@cli.command()
+@click.option("--templates", "templates_path", type=click.Path(dir_okay=False), default=None,
+              help="Templates file to watch (defaults to xmtl_templates.yaml).")
+@click.option("--drop-dir", type=click.Path(file_okay=False), default=None,
+              help="Folder to watch for CSV or NDJSON manifests.")
+@click.option("--debounce", type=float, default=0.5, show_default=True,
+              help="Seconds files must be quiet before a burst of changes is processed.")
+@click.option("--poll-interval", type=float, default=1.0, show_default=True,
+              help="Seconds between checks when watchdog is not installed.")
+@output_options
+@concurrency_options
+@registry_option
+@pdf_output_options
+@metrics_options
+def watch(templates_path, drop_dir, debounce, poll_interval, sink, concurrency, registry, pdf_options):
+    """Regenerate transmittals whenever templates are edited or manifests are dropped in.
+
+    Only template entries that were added or changed are generated; manifests
+    resume from their journals. Runs until interrupted with Ctrl+C.
+    """
+    import watch as watch_mode
+    from custom_fill import asset_cache_dir
+    from html_to_pdf import discover_edge_path
+
+    templates_path = templates_path or _default_templates_path()
+    # fail before watching if Edge is missing, and extract assets now rather than on the first save
+    discover_edge_path()
+    asset_cache_dir()
+
+    if drop_dir:
+        Path(drop_dir).mkdir(parents=True, exist_ok=True)
+    watcher = watch_mode.Watcher(templates_path, drop_dir, output_dir=sink, concurrency=concurrency,
+                                 registry=registry, pdf_options=pdf_options)
+    monitor = watch_mode.make_monitor(templates_path, drop_dir, poll_interval=poll_interval)
+    click.echo(f"Watching {templates_path}" + (f" and {drop_dir}" if drop_dir else "") + " (Ctrl+C to stop).")
+    try:
+        watch_mode.run_watch(watcher, monitor, debounce=debounce)
+    except KeyboardInterrupt:
+        click.echo("Stopped watching.")
+
+
+@cli.command("queue-status")
+@click.option("--queue", "queue_path", type=click.Path(exists=True, dir_okay=False), required=True,
+              help="Shared queue database file.")
+def queue_status(queue_path):
+    """Show job counts and per-worker throughput for a shared queue."""
+    from work_queue import WorkQueue
+
+    queue = WorkQueue(queue_path)
+    try:
+        click.echo(", ".join(f"{status}: {count}" for status, count in queue.counts().items()))
+        for stats in queue.worker_stats():
+            click.echo(f"  {stats['worker_id']}: {stats['jobs_done']} done, {stats['jobs_failed']} failed, "
+                       f"{stats['busy_seconds']}s busy, {stats['jobs_per_minute']} jobs/min")
+    finally:
+        queue.close()
+
+
+@cli.command()
+@click.option("--project", "project_number", default=None, help="Only this project number.")
+@click.option("--submittal", "submittal_number", default=None, help="Only this submittal number.")
+@click.option("--revision", default=None, help="Only this revision.")
+@click.option("--limit", type=int, default=50, show_default=True)
+def history(project_number, submittal_number, revision, limit):
+    """List previously generated transmittals, newest first."""
+    from registry import TransmittalRegistry
+
+    registry = TransmittalRegistry()
+    try:
+        entries = registry.history(project_number, submittal_number, revision, limit=limit)
+    finally:
+        registry.close()
+    table = Table(title="Generated Transmittals")
+    for column in ("Project", "Submittal", "Rev", "Generated", "Output"):
+        table.add_column(column)
+    for entry in entries:
+        table.add_row(entry.project_number, entry.submittal_number, entry.revision,
+                      datetime.fromtimestamp(entry.created_at).strftime("%m/%d/%Y %H:%M"), entry.output_path)
+    console.print(table)
 
 
+@cli.group("daemon")
+def daemon_group():
+    """Keep the rendering stack warm in a background process so interactive runs start quickly."""
+
+
+def _self_command(*args):
+    """argv that runs this CLI (the executable itself when frozen by PyInstaller) with args."""
+    if getattr(sys, "frozen", False):
+        return [sys.executable, *args]
+    return [sys.executable, str(Path(__file__).resolve()), *args]
+
+
+@daemon_group.command("run")
+@click.option("--idle-timeout", type=click.IntRange(min=0), default=0, show_default=True,
+              help="Exit after this many seconds with no client connected (0 to run until stopped).")
+def daemon_run(idle_timeout):
+    """Run the daemon in the foreground until stopped."""
+    from daemon import DaemonError, DaemonServer
+
+    server = DaemonServer(idle_timeout=idle_timeout or None)
+    server.warm()
+    click.echo(f"Daemon {os.getpid()} listening on {server.address}")
+    try:
+        server.serve_forever()
+    except DaemonError as exc:
+        raise click.ClickException(str(exc))
+
+
+@daemon_group.command("start")
+@click.option("--idle-timeout", type=click.IntRange(min=0), default=0, show_default=True,
+              help="Exit after this many seconds with no client connected (0 to run until stopped).")
+def daemon_start(idle_timeout):
+    """Start the daemon in the background and wait until it is ready."""
+    import daemon
+
+    if (client := daemon.connect()) is not None:
+        with client:
+            click.echo(f"Daemon {client.status()['pid']} is already running.")
+        return
+    try:
+        status = daemon.start_background(_self_command("daemon", "run", "--idle-timeout", str(idle_timeout)))
+    except daemon.DaemonError as exc:
+        raise click.ClickException(str(exc))
+    click.echo(f"Daemon {status['pid']} started.")
+
+
+@daemon_group.command("stop")
+def daemon_stop():
+    """Stop the running daemon."""
+    from daemon import connect
+
+    client = connect()
+    if client is None:
+        click.echo("No daemon is running.")
+        return
+    with client:
+        client.shutdown()
+    click.echo("Daemon stopped.")
+
+
+@daemon_group.command("status")
+def daemon_status():
+    """Show whether a daemon is running. Exits with status 1 if not."""
+    from daemon import connect
+
+    client = connect()
+    if client is None:
+        click.echo("No daemon is running.")
+        sys.exit(1)
+    with client:
+        status = client.status()
+    started = datetime.fromtimestamp(status["started"]).strftime("%m/%d/%Y %H:%M")
+    click.echo(f"Daemon {status['pid']} running since {started}; {status['requests']} requests served.")
 
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,340 @@
+"""Saving builds as templates without rewriting xmtl_templates.yaml on every save.
+
+The templates file usually lives on a shared drive, is edited by hand, and
+is read by everyone's CLI. Saving a template does not re-serialize it;
+instead, one line is appended to an overlay journal next to it
+(xmtl_templates.yaml.journal.jsonl):
+
+    {"key": "3238", "template": {"Project_Title": "3238, ...", ...}, "time": "..."}
+
+load_templates() reads the overlay, then the YAML, and lays the overlay
+entries over the YAML ones (later lines win). When a save brings the
+overlay to COMPACT_AFTER entries, that save folds them into the YAML. Only
+the blocks of the saved keys are replaced, and new keys go at the end, so
+comments and hand formatting elsewhere survive. The new document is written
+beside the old one and renamed over it, so a reader sees either the old or
+the new file, never a torn one. The overlay is emptied only after the
+rename. A reader that looks between the two steps sees the same templates
+either way, because overlay entries win.
+
+Writers serialize on a lock file created with O_EXCL, because fcntl and
+msvcrt locks are unreliable over SMB and NFS. The holder touches the lock
+while it holds it, so a lock not modified for STALE_LOCK_SECONDS was left
+behind by a crashed writer and is broken. Waiters break it one at a time,
+through a second O_EXCL file, and only if it is still the stale file they
+saw, so a lock just taken by another waiter is never removed. The lock
+records a token, and a writer removes it on release only while it still
+holds that token. Appends are fsynced. A torn final line from a crash is
+ignored on load, as in the batch journal.
+"""
+import json
+import os
+import re
+import socket
+import stat
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+import yaml
+
+from output_sink import create_temp_file
+
+OVERLAY_SUFFIX = ".journal.jsonl"
+LOCK_SUFFIX = ".lock"
+BREAK_SUFFIX = ".break"
+# Overlay entries before a save compacts them into the YAML file
+COMPACT_AFTER = 25
+LOCK_TIMEOUT = 30.0
+STALE_LOCK_SECONDS = 120.0
+# The reference entry at the top of the file
+RESERVED_KEY = "KEY"
+_REPLACE_ATTEMPTS = 40
+
+
+class TemplateLockError(RuntimeError):
+    """Another writer held the templates file's lock for longer than the timeout."""
+
+
+def overlay_path(templates_path) -> Path:
+    """The overlay journal for templates_path, e.g. xmtl_templates.yaml.journal.jsonl."""
+    templates_path = Path(templates_path)
+    return templates_path.with_name(templates_path.name + OVERLAY_SUFFIX)
+
+
+def _lock_path(templates_path):
+    templates_path = Path(templates_path)
+    return templates_path.with_name(templates_path.name + LOCK_SUFFIX)
+
+
+@contextmanager
+def template_lock(templates_path, timeout=LOCK_TIMEOUT):
+    """Hold the writer lock for templates_path, waiting up to timeout seconds for it."""
+    path = _lock_path(templates_path)
+    token = f"{socket.gethostname()} pid {os.getpid()} ({uuid.uuid4().hex[:8]})\n"
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                seen = path.stat()
+                if time.time() - seen.st_mtime > STALE_LOCK_SECONDS:
+                    _break_stale_lock(path, seen)
+                    continue
+                holder = path.read_text(encoding="utf-8").strip()
+            except OSError:
+                continue  # released (or broken) while we looked
+            if time.monotonic() > deadline:
+                raise TemplateLockError(f"{templates_path} is being saved by {holder or 'another process'}; "
+                                        f"try again, or delete {path} if it was left by a crash")
+            time.sleep(0.05)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(token)
+    released = threading.Event()
+    heartbeat = threading.Thread(target=_keep_fresh, args=(path, released), name="template-lock", daemon=True)
+    heartbeat.start()
+    try:
+        yield
+    finally:
+        released.set()
+        heartbeat.join()
+        try:
+            if path.read_text(encoding="utf-8") == token:
+                path.unlink()
+        except OSError:
+            pass  # already gone
+
+
+def _keep_fresh(path, released):
+    """Touch the lock until released is set, so waiters never take a held lock for a stale one."""
+    while not released.wait(STALE_LOCK_SECONDS / 4):
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+
+def _break_stale_lock(path, seen):
+    """Remove the lock at path if it is still the stale file seen (an os.stat_result) describes."""
+    breaker = path.with_name(path.name + BREAK_SUFFIX)
+    try:
+        fd = os.open(breaker, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        try:
+            if time.time() - breaker.stat().st_mtime > STALE_LOCK_SECONDS:
+                breaker.unlink(missing_ok=True)  # a waiter crashed while breaking
+        except OSError:
+            pass
+        return  # another waiter is breaking it; retry
+    os.close(fd)
+    try:
+        current = path.stat()
+        # any other waiter that broke it already took a fresh lock, which is a different file
+        if (current.st_ino, current.st_mtime_ns) == (seen.st_ino, seen.st_mtime_ns):
+            path.unlink()
+    except FileNotFoundError:
+        pass
+    finally:
+        breaker.unlink(missing_ok=True)
+
+
+def _read_overlay(path):
+    try:
+        f = open(path, "r", encoding="utf-8", errors="replace")
+    except FileNotFoundError:
+        return
+    with f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(entry, dict) and "key" in entry and isinstance(entry.get("template"), dict):
+                yield entry
+
+
+def _saved_entries(templates_path):
+    return {str(entry["key"]): entry["template"] for entry in _read_overlay(overlay_path(templates_path))}
+
+
+def _parse(text):
+    templates = yaml.safe_load(text) or {}
+    if not isinstance(templates, dict):
+        raise ValueError("expected a mapping of template keys at the top level")
+    return {str(key): value for key, value in templates.items()}
+
+
+def load_templates(templates_path):
+    """Return {key: entry} for templates_path with the saved overlay entries applied.
+
+    Keys are strings, so an unquoted key such as 3238 is found as '3238'.
+
+    Raises:
+        OSError:        If the YAML file cannot be read.
+        yaml.YAMLError: If it cannot be parsed.
+        ValueError:     If its top level is not a mapping.
+    """
+    # the overlay is read first: a compaction replaces the YAML before it empties the overlay
+    saved = _saved_entries(templates_path)
+    with open(templates_path, "r", encoding="utf-8") as f:
+        templates = _parse(f)
+    templates.update(saved)
+    return templates
+
+
+def templates_stamp(templates_path):
+    """A value that changes whenever load_templates(templates_path) may return something new."""
+    stamps = []
+    for path in (Path(templates_path), overlay_path(templates_path)):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            stamps.append(None)
+        else:
+            stamps.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(stamps)
+
+
+def save_template(templates_path, key, template, compact_after=COMPACT_AFTER):
+    """Add or replace the entry key, a mapping keyed like an xmtl_templates.yaml entry.
+
+    The entry is appended to the overlay under the writer lock. The YAML
+    file is only rewritten when the overlay reaches compact_after entries,
+    or when it does not exist yet.
+
+    Returns:
+        True if this save also compacted the overlay into the YAML file.
+
+    Raises:
+        ValueError:        If key is blank or the reserved 'KEY' entry.
+        TemplateLockError: If the lock could not be taken.
+    """
+    key = str(key).strip()
+    if not key:
+        raise ValueError("Template key must not be blank")
+    if key == RESERVED_KEY:
+        raise ValueError(f"'{RESERVED_KEY}' is the reference entry and cannot be saved over")
+    templates_path = Path(templates_path)
+    entry = {
+        "key": key,
+        "template": {str(name): "" if value is None else str(value) for name, value in template.items()},
+        "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+    with template_lock(templates_path):
+        pending = _append(overlay_path(templates_path), entry)
+        if pending >= compact_after or not templates_path.exists():
+            _compact(templates_path)
+            return True
+    return False
+
+
+def compact(templates_path):
+    """Fold the overlay into the YAML file now; returns the number of keys written."""
+    with template_lock(templates_path):
+        return _compact(Path(templates_path))
+
+
+def _append(overlay, entry):
+    """Append entry to the overlay and return how many entries it now holds."""
+    line = (json.dumps(entry) + "\n").encode("utf-8")
+    with open(overlay, "a+b") as f:
+        f.seek(0)
+        existing = f.read()
+        if existing and not existing.endswith(b"\n"):
+            line = b"\n" + line  # a crash left a torn line; start on a clean one
+        f.write(line)
+        f.flush()
+        os.fsync(f.fileno())
+    return existing.count(b"\n") + 1
+
+
+def _compact(templates_path):
+    saved = _saved_entries(templates_path)
+    overlay = overlay_path(templates_path)
+    if not saved:
+        return 0
+    text = templates_path.read_text(encoding="utf-8") if templates_path.exists() else ""
+    expected = _parse(text)
+    expected.update(saved)
+    merged = _merge_text(text, saved)
+    if _parse(merged) != expected:
+        # something in the file defeated the line-based edit (duplicate keys, flow style, ...)
+        merged = yaml.safe_dump(expected, sort_keys=False, allow_unicode=True)
+    _replace(templates_path, merged)
+    with open(overlay, "r+b") as f:
+        f.truncate(0)
+        os.fsync(f.fileno())
+    return len(saved)
+
+
+def _replace(path, text):
+    fd, temp = create_temp_file(path, suffix=".tmp")
+    try:
+        if path.exists():
+            os.chmod(temp, stat.S_IMODE(path.stat().st_mode))  # colleagues keep the access they had
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        for attempt in range(_REPLACE_ATTEMPTS):
+            try:
+                os.replace(temp, path)
+                return
+            except PermissionError:
+                # Windows refuses to rename over a file a reader has open; readers are quick
+                if attempt == _REPLACE_ATTEMPTS - 1:
+                    raise
+                time.sleep(0.05)
+    finally:
+        Path(temp).unlink(missing_ok=True)
+
+
+def _scalar(value):
+    return value if re.fullmatch(r"\w+", value) else json.dumps(value)
+
+
+def _entry_lines(key, template):
+    # JSON strings are valid YAML double-quoted scalars, and match the file's quoted keys
+    return [f"{json.dumps(key)}:"] + [f"  {_scalar(name)}: {json.dumps(value)}" for name, value in template.items()]
+
+
+def _top_level_key(line):
+    """The key a column-0 'key:' line starts, or None for comments, indented lines and anything else."""
+    if not line.strip() or line[0] in " \t#-":
+        return None
+    try:
+        parsed = yaml.safe_load(line)
+    except yaml.YAMLError:
+        return None
+    return str(next(iter(parsed))) if isinstance(parsed, dict) and len(parsed) == 1 else None
+
+
+def _merge_text(text, saved):
+    """Replace the block of each saved key in text, and add keys not already there at the end."""
+    lines = text.splitlines()
+    pending = dict(saved)
+    merged = []
+    i = 0
+    while i < len(lines):
+        key = _top_level_key(lines[i])
+        if key not in pending:
+            merged.append(lines[i])
+            i += 1
+            continue
+        end = i + 1
+        while end < len(lines) and (not lines[end].strip() or lines[end][0] in " \t"):
+            end += 1
+        while end > i + 1 and not lines[end - 1].strip():
+            end -= 1  # blank lines before the next key stay where they are
+        merged.extend(_entry_lines(key, pending.pop(key)))
+        i = end
+    for key, template in pending.items():
+        if merged and merged[-1].strip():
+            merged.append("")
+        merged.extend(_entry_lines(key, template))
+    return "\n".join(merged) + "\n"
@@ -33,3 +33,12 @@ def no_edp_build():
         submittal_name="G3 Provost Shingle Sample",
         reviewer_names="Matt DeMonner, UCSC PPC",
     )
+
+
+@pytest.fixture(autouse=True)
+def fresh_conversion_guard(monkeypatch):
+    """Give every test its own retry/circuit-breaker state for page conversions."""
+    import html_to_pdf
+    from resilience import ResilientConverter
+
+    monkeypatch.setattr(html_to_pdf, "conversion_guard", ResilientConverter(sleep=lambda seconds: None))
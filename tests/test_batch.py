@@ -0,0 +1,379 @@
+"""Tests for batch manifest reading and the resumable checkpoint journal.
+
+generate_transmittal is patched so no rendering or conversion happens.
+"""
+import csv
+import json
+import threading
+import time
+import tracemalloc
+from unittest.mock import patch
+
+import pytest
+from pypdf.errors import PdfReadError
+
+import batch
+
+
+ROW = {
+    "Project_Title": "3238, Westside Research Park",
+    "Submittal_Number": "001",
+    "Revision_Number": "0",
+    "Specification_Section": "07 31 13",
+    "Submittal_Name": "Shingle Sample",
+    "reviewer_list": "Alice;Bob",
+}
+
+
+def write_csv(path, rows):
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(ROW))
+        writer.writeheader()
+        writer.writerows(rows)
+    return path
+
+
+def rows(count):
+    return [{**ROW, "Submittal_Number": f"{i:03d}"} for i in range(1, count + 1)]
+
+
+def fake_generate(tmp_path):
+    def generate(build, **kwargs):
+        output = tmp_path / f"{build.submittal_number.value}.pdf"
+        output.write_bytes(b"%PDF-stub")
+        return output
+    return generate
+
+
+# ---------------------------------------------------------------------------
+# read_manifest
+# ---------------------------------------------------------------------------
+
+def test_reads_csv_rows_into_builds(tmp_path):
+    manifest = write_csv(tmp_path / "m.csv", rows(2))
+    builds = list(batch.read_manifest(manifest))
+    assert [n for n, _ in builds] == [1, 2]
+    assert builds[0][1].project_number.value == "3238"
+    assert builds[1][1].submittal_number.value == "002"
+
+
+def test_reads_ndjson_rows_into_builds(tmp_path):
+    manifest = tmp_path / "m.ndjson"
+    manifest.write_text("\n".join(json.dumps(r) for r in rows(2)) + "\n\n")
+    builds = list(batch.read_manifest(manifest))
+    assert len(builds) == 2
+    assert builds[0][1].reviewer_names.processed_value == ["Alice", "Bob"]
+
+
+def test_json_array_manifest_is_rejected_clearly(tmp_path):
+    manifest = tmp_path / "m.json"
+    manifest.write_text(json.dumps(rows(2), indent=2))
+    with pytest.raises(batch.ManifestError, match="JSON array"):
+        list(batch.read_manifest(manifest))
+
+
+def test_ndjson_line_that_is_not_an_object_is_rejected(tmp_path):
+    manifest = tmp_path / "m.ndjson"
+    manifest.write_text(json.dumps(ROW) + "\n42\n")
+    with pytest.raises(batch.ManifestError, match="not a JSON object"):
+        list(batch.read_manifest(manifest))
+
+
+# ---------------------------------------------------------------------------
+# BatchJournal
+# ---------------------------------------------------------------------------
+
+def test_journal_ignores_torn_final_line(tmp_path):
+    journal_path = tmp_path / "j.jsonl"
+    output = tmp_path / "out.pdf"
+    output.write_bytes(b"%PDF")
+    journal = batch.BatchJournal(journal_path)
+    journal.record(1, "aaa", batch.STATUS_DONE, output=output)
+    with open(journal_path, "a") as f:
+        f.write('{"row": 2, "input_hash": "bb')  # crash mid-write
+
+    reloaded = batch.BatchJournal(journal_path)
+    assert reloaded.is_done("aaa")
+    assert not reloaded.is_done("bbb")
+
+    reloaded.record(2, "bbb", batch.STATUS_DONE, output=output)
+    assert batch.BatchJournal(journal_path).is_done("bbb")
+
+
+def test_journal_done_requires_output_to_exist(tmp_path):
+    journal = batch.BatchJournal(tmp_path / "j.jsonl")
+    journal.record(1, "aaa", batch.STATUS_DONE, output=tmp_path / "gone.pdf")
+    assert not journal.is_done("aaa")
+
+
+# ---------------------------------------------------------------------------
+# run_batch
+# ---------------------------------------------------------------------------
+
+def test_rerun_skips_completed_rows(tmp_path):
+    manifest = write_csv(tmp_path / "m.csv", rows(3))
+    with patch("batch.generate_transmittal", side_effect=fake_generate(tmp_path)) as mock_generate:
+        first = batch.run_batch(manifest)
+        second = batch.run_batch(manifest)
+
+    assert first == {"done": 3, "skipped": 0, "duplicate": 0, "failed": 0}
+    assert second == {"done": 0, "skipped": 3, "duplicate": 0, "failed": 0}
+    assert mock_generate.call_count == 3
+
+
+def test_rerun_retries_only_failures(tmp_path):
+    manifest = write_csv(tmp_path / "m.csv", rows(3))
+    generate = fake_generate(tmp_path)
+
+    def flaky(build, **kwargs):
+        if build.submittal_number.value == "002":
+            raise RuntimeError("Edge PDF conversion failed")
+        return generate(build)
+
+    with patch("batch.generate_transmittal", side_effect=flaky):
+        first = batch.run_batch(manifest)
+    with patch("batch.generate_transmittal", side_effect=generate) as mock_generate:
+        second = batch.run_batch(manifest)
+
+    assert first == {"done": 2, "skipped": 0, "duplicate": 0, "failed": 1}
+    assert second == {"done": 1, "skipped": 2, "duplicate": 0, "failed": 0}
+    assert mock_generate.call_args.args[0].submittal_number.value == "002"
+
+
+@pytest.mark.parametrize("window", [1, 3])
+@pytest.mark.parametrize("error", [PdfReadError("EOF marker not found"), PermissionError("output folder is read-only")])
+def test_any_row_error_fails_the_row_and_the_batch_goes_on(tmp_path, capsys, window, error):
+    manifest = write_csv(tmp_path / "m.csv", rows(3))
+    generate = fake_generate(tmp_path)
+
+    def flaky(build, **kwargs):
+        if build.submittal_number.value == "002":
+            raise error
+        return generate(build)
+
+    with patch("batch.generate_transmittal", side_effect=flaky):
+        summary = batch.run_batch(manifest, window=window)
+    assert summary == {"done": 2, "skipped": 0, "duplicate": 0, "failed": 1}
+    assert f"Row 2 failed: {error}" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("window", [1, 3])
+def test_duplicate_rows_are_reported_and_generated_once(tmp_path, capsys, window):
+    manifest = write_csv(tmp_path / "m.csv", [*rows(2), rows(1)[0]])
+    with patch("batch.generate_transmittal", side_effect=fake_generate(tmp_path)) as generate:
+        summary = batch.run_batch(manifest, window=window)
+    assert summary == {"done": 2, "skipped": 0, "duplicate": 1, "failed": 0}
+    assert generate.call_count == 2
+    assert "Row 3 repeats an earlier row" in capsys.readouterr().out
+
+
+def test_rows_finished_by_an_earlier_run_are_skipped_not_duplicates(tmp_path, capsys):
+    manifest = write_csv(tmp_path / "m.csv", rows(3))
+    with patch("batch.generate_transmittal", side_effect=fake_generate(tmp_path)):
+        batch.run_batch(manifest)
+    new_row = {**ROW, "Submittal_Number": "099"}
+    write_csv(manifest, [new_row, *rows(3), rows(3)[1]])
+    with patch("batch.generate_transmittal", side_effect=fake_generate(tmp_path)) as generate:
+        summary = batch.run_batch(manifest)
+    assert summary == {"done": 1, "skipped": 4, "duplicate": 0, "failed": 0}
+    assert generate.call_count == 1
+    assert "repeats" not in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("window", [1, 3])
+def test_open_circuit_stops_the_batch_without_failing_rows(tmp_path, window):
+    from resilience import CircuitOpenError
+
+    manifest = write_csv(tmp_path / "m.csv", rows(6))
+    generate = fake_generate(tmp_path)
+
+    def broken_after_first(build, **kwargs):
+        if build.submittal_number.value != "001":
+            raise CircuitOpenError("Browser conversions are failing")
+        return generate(build)
+
+    with patch("batch.generate_transmittal", side_effect=broken_after_first) as mock_generate:
+        with pytest.raises(CircuitOpenError):
+            batch.run_batch(manifest, window=window)
+    assert mock_generate.call_count < 6
+
+    journal = (tmp_path / "m.csv.journal.jsonl").read_text().splitlines()
+    assert [json.loads(line)["status"] for line in journal] == ["done"]
+    with patch("batch.generate_transmittal", side_effect=generate):
+        assert batch.run_batch(manifest) == {"done": 5, "skipped": 1, "duplicate": 0, "failed": 0}
+
+
+def test_changed_row_is_regenerated(tmp_path):
+    manifest = write_csv(tmp_path / "m.csv", rows(1))
+    with patch("batch.generate_transmittal", side_effect=fake_generate(tmp_path)):
+        batch.run_batch(manifest)
+        write_csv(manifest, [{**rows(1)[0], "Submittal_Name": "Changed"}])
+        summary = batch.run_batch(manifest)
+    assert summary["done"] == 1
+
+
+def test_interrupted_run_resumes_after_last_finished_row(tmp_path):
+    manifest = write_csv(tmp_path / "m.csv", rows(3))
+    generate = fake_generate(tmp_path)
+    calls = []
+
+    def interrupted(build, **kwargs):
+        calls.append(build.submittal_number.value)
+        if len(calls) == 2:
+            raise KeyboardInterrupt
+        return generate(build)
+
+    with patch("batch.generate_transmittal", side_effect=interrupted):
+        with pytest.raises(KeyboardInterrupt):
+            batch.run_batch(manifest)
+    with patch("batch.generate_transmittal", side_effect=generate):
+        summary = batch.run_batch(manifest)
+
+    assert summary == {"done": 2, "skipped": 1, "duplicate": 0, "failed": 0}
+
+
+# ---------------------------------------------------------------------------
+# Streaming reads and checkpoints
+# ---------------------------------------------------------------------------
+
+def test_checkpoints_resume_mid_file(tmp_path):
+    quoted = [{**row, "Submittal_Name": f"Line one\nline two {n}"} for n, row in enumerate(rows(4))]
+    for manifest in (write_csv(tmp_path / "m.csv", quoted), tmp_path / "m.ndjson"):
+        if manifest.suffix == ".ndjson":
+            manifest.write_text("".join(json.dumps(r) + "\n\n" for r in quoted))
+        records = list(batch.read_manifest_records(manifest))
+        resumed = list(batch.read_manifest_records(manifest, start=records[1].checkpoint))
+        assert resumed == records[2:]
+        assert [r.row["Submittal_Name"] for r in resumed] == ["Line one\nline two 2", "Line one\nline two 3"]
+
+
+def test_csv_byte_order_mark_is_stripped(tmp_path):
+    manifest = write_csv(tmp_path / "m.csv", rows(1))
+    manifest.write_bytes(b"\xef\xbb\xbf" + manifest.read_bytes())
+    assert list(batch.read_manifest_rows(manifest))[0][1]["Project_Title"] == ROW["Project_Title"]
+
+
+def test_rerun_seeks_past_finished_rows(tmp_path):
+    manifest = write_csv(tmp_path / "m.csv", rows(3))
+    with patch("batch.generate_transmittal", side_effect=fake_generate(tmp_path)):
+        batch.run_batch(manifest)
+        with patch("batch.read_manifest_records", wraps=batch.read_manifest_records) as reader:
+            summary = batch.run_batch(manifest)
+
+    assert summary == {"done": 0, "skipped": 3, "duplicate": 0, "failed": 0}
+    assert list(reader.call_args.kwargs["start"]) == [manifest.stat().st_size, 3]
+
+
+def test_rows_before_the_checkpoint_are_regenerated_when_their_outputs_are_gone(tmp_path):
+    manifest = write_csv(tmp_path / "m.csv", rows(3))
+    with patch("batch.generate_transmittal", side_effect=fake_generate(tmp_path)):
+        batch.run_batch(manifest)
+        (tmp_path / "002.pdf").unlink()
+        summary = batch.run_batch(manifest)
+        again = batch.run_batch(manifest)
+
+    assert summary == {"done": 1, "skipped": 2, "duplicate": 0, "failed": 0}
+    assert (tmp_path / "002.pdf").exists()
+    assert again == {"done": 0, "skipped": 3, "duplicate": 0, "failed": 0}
+
+
+def test_rows_in_an_unfinished_zip_are_regenerated(tmp_path):
+    from zip_sink import ZipSink
+
+    manifest = write_csv(tmp_path / "m.csv", rows(3))
+
+    def generate(build, output_dir, **kwargs):
+        return output_dir.write_bytes(f"{build.submittal_number.value}.pdf", b"%PDF")
+
+    with patch("batch.generate_transmittal", side_effect=generate):
+        crashed = ZipSink("out.zip", directory=tmp_path)
+        batch.run_batch(manifest, output_dir=crashed)  # never closed, as if the process died
+        with ZipSink("out.zip", directory=tmp_path) as sink:
+            summary = batch.run_batch(manifest, output_dir=sink)
+
+    assert summary == {"done": 3, "skipped": 0, "duplicate": 0, "failed": 0}
+
+
+def test_checkpoint_stops_at_first_failure(tmp_path):
+    manifest = write_csv(tmp_path / "m.csv", rows(4))
+    generate = fake_generate(tmp_path)
+
+    def flaky(build, **kwargs):
+        if build.submittal_number.value == "002":
+            raise RuntimeError("Edge PDF conversion failed")
+        return generate(build)
+
+    with patch("batch.generate_transmittal", side_effect=flaky):
+        batch.run_batch(manifest)
+    journal = batch.BatchJournal(batch.default_journal_path(manifest), stamp=batch.manifest_stamp(manifest))
+    assert journal.checkpoint.row_number == 1
+    assert len(journal.outputs) == 2  # rows 3 and 4 are still known to be done
+
+
+def test_window_generates_rows_concurrently_in_bounded_flight(tmp_path):
+    manifest = write_csv(tmp_path / "m.csv", rows(12))
+    generate = fake_generate(tmp_path)
+    lock = threading.Lock()
+    active = peak = 0
+    work_dirs = set()
+
+    def slow(build, work_dir=None, **kwargs):
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        work_dirs.add(work_dir)
+        time.sleep(0.01)
+        with lock:
+            active -= 1
+        return generate(build)
+
+    with patch("batch.generate_transmittal", side_effect=slow):
+        summary = batch.run_batch(manifest, window=3)
+
+    assert summary == {"done": 12, "skipped": 0, "duplicate": 0, "failed": 0}
+    assert 1 < peak <= 3
+    assert len(work_dirs) == 12 and None not in work_dirs
+    journal = batch.BatchJournal(batch.default_journal_path(manifest), stamp=batch.manifest_stamp(manifest))
+    assert journal.checkpoint.row_number == 12
+
+
+def test_adaptive_concurrency_limit_also_admits_rows(tmp_path):
+    from concurrency import AdaptiveConcurrency
+
+    manifest = write_csv(tmp_path / "m.csv", rows(12))
+    generate = fake_generate(tmp_path)
+    controller = AdaptiveConcurrency(min_limit=3, max_limit=4, sample_interval=0.01)
+    lock = threading.Lock()
+    active = peak = 0
+
+    def slow(build, work_dir=None, concurrency=None, **kwargs):
+        nonlocal active, peak
+        assert concurrency is controller
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        time.sleep(0.02)
+        with lock:
+            active -= 1
+        return generate(build)
+
+    with patch("batch.generate_transmittal", side_effect=slow):
+        summary = batch.run_batch(manifest, concurrency=controller)
+
+    assert summary == {"done": 12, "skipped": 0, "duplicate": 0, "failed": 0}
+    assert 1 < peak <= 3  # the limit, not the window of 1 or the maximum of 4
+
+
+def test_reading_memory_does_not_grow_with_manifest_size(tmp_path):
+    def peak_reading(count):
+        manifest = tmp_path / f"m{count}.ndjson"
+        manifest.write_text("".join(json.dumps(r) + "\n" for r in rows(count)))
+        tracemalloc.start()
+        for _ in batch.read_manifest(manifest):
+            pass
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return peak
+
+    assert peak_reading(5000) < 2 * peak_reading(500)
@@ -0,0 +1,106 @@
+"""Tests for the memory-aware AdaptiveConcurrency controller.
+
+The limit policy is driven through adjust() with synthetic memory samples;
+map_concurrent is exercised with real threads and a sleep in place of a
+browser conversion.
+"""
+import threading
+import time
+
+import pytest
+import concurrency
+from concurrency import MB, AdaptiveConcurrency, map_concurrent
+
+
+def test_rejects_inverted_bounds():
+    with pytest.raises(ValueError):
+        AdaptiveConcurrency(min_limit=3, max_limit=2)
+
+
+def test_grows_only_when_work_is_queued_and_memory_allows():
+    controller = AdaptiveConcurrency(min_limit=1, max_limit=4, reserve_mb=1000, per_job_mb=300)
+    controller.in_flight, controller.waiting = 1, 2
+
+    decision = controller.adjust(8000 * MB, 300 * MB)
+
+    assert (decision.old_limit, decision.new_limit) == (1, 2)
+    assert controller.limit == 2
+
+
+def test_does_not_grow_when_idle():
+    controller = AdaptiveConcurrency(min_limit=1, max_limit=4)
+    assert controller.adjust(64000 * MB, 0).new_limit == 1
+
+
+def test_does_not_grow_without_room_for_another_browser():
+    controller = AdaptiveConcurrency(min_limit=1, max_limit=4, reserve_mb=1000)
+    controller.in_flight, controller.waiting = 1, 1
+    # 1 browser observed at 600 MB; 1500 MB free leaves < 1000 MB after another
+    assert controller.adjust(1500 * MB, 600 * MB).new_limit == 1
+    assert controller.per_job_mb == pytest.approx(600)
+
+
+def test_halves_below_reserve_but_not_under_min():
+    controller = AdaptiveConcurrency(min_limit=2, max_limit=8, reserve_mb=1000)
+    controller.limit = 8
+    assert controller.adjust(500 * MB, 0).new_limit == 4
+    assert controller.adjust(500 * MB, 0).new_limit == 2
+    assert controller.adjust(500 * MB, 0).new_limit == 2
+
+
+def test_never_exceeds_max():
+    controller = AdaptiveConcurrency(min_limit=1, max_limit=2, reserve_mb=0, per_job_mb=1)
+    controller.in_flight, controller.waiting = 2, 1
+    controller.limit = 2
+    assert controller.adjust(64000 * MB, 0).new_limit == 2
+
+
+def test_holds_when_memory_cannot_be_read():
+    controller = AdaptiveConcurrency(min_limit=1, max_limit=4)
+    controller.in_flight, controller.waiting = 1, 3
+    decision = controller.adjust(None, None)
+    assert decision.new_limit == 1
+    assert "unavailable" in decision.reason
+
+
+def test_decisions_are_recorded_and_reported():
+    seen = []
+    controller = AdaptiveConcurrency(on_decision=seen.append)
+    controller.adjust(4000 * MB, 0)
+    assert list(controller.decisions) == seen
+    assert seen[0].available_mb == pytest.approx(4000)
+
+
+def test_map_concurrent_preserves_order_and_respects_limit(monkeypatch):
+    monkeypatch.setattr(concurrency, "available_memory", lambda: 64000 * MB)
+    monkeypatch.setattr(concurrency, "child_process_rss", lambda: 0)
+    controller = AdaptiveConcurrency(min_limit=1, max_limit=3, reserve_mb=0, per_job_mb=1, sample_interval=0)
+    lock = threading.Lock()
+    peak = [0]
+
+    def work(n):
+        with lock:
+            peak[0] = max(peak[0], controller.in_flight)
+        time.sleep(0.01)
+        return n * 2
+
+    assert map_concurrent(work, range(12), controller) == [n * 2 for n in range(12)]
+    assert 1 < peak[0] <= 3
+    assert controller.in_flight == 0
+
+
+def test_map_concurrent_propagates_errors():
+    controller = AdaptiveConcurrency(min_limit=2, max_limit=2)
+
+    def work(n):
+        if n == 1:
+            raise RuntimeError("Edge PDF conversion failed")
+        return n
+
+    with pytest.raises(RuntimeError, match="conversion failed"):
+        map_concurrent(work, range(3), controller)
+    assert controller.in_flight == 0
+
+
+def test_child_process_rss_reads_without_error():
+    assert concurrency.child_process_rss() is None or concurrency.child_process_rss() >= 0
@@ -5,6 +5,7 @@ globals loaded at import time, so we monkeypatch them with MagicMocks that
 return minimal HTML. Output files are written to pytest's tmp_path so the
 working directory remains clean.
 """
+from pathlib import Path
 from unittest.mock import MagicMock
 
 import pytest
@@ -20,6 +21,10 @@ def isolated_output(monkeypatch, tmp_path):
     monkeypatch.setattr(custom_fill, "template_1", mock_tmpl)
     monkeypatch.setattr(custom_fill, "template_2", mock_tmpl)
     monkeypatch.setattr(custom_fill, "template_3", mock_tmpl)
+    monkeypatch.setenv("XMTL_ASSET_CACHE", str(tmp_path / "asset_cache"))
+    for cached in (custom_fill.asset_cache_dir, custom_fill.file_asset_url, custom_fill.inline_asset_url,
+                   custom_fill.render_page):
+        cached.cache_clear()
 
 
 def base_dict(edp=False, reviewer_count=0):
@@ -127,3 +132,108 @@ def test_old_output_files_removed_before_render(tmp_path):
     all_output = list(tmp_path.glob("output_*.html"))
     names = {f.name for f in all_output}
     assert "output_old_page.html" not in names
+
+
+# ---------------------------------------------------------------------------
+# Render bundles
+# ---------------------------------------------------------------------------
+
+def test_bundle_mode_writes_pages_into_bundle(tmp_path):
+    files = custom_fill.render_output(base_dict(edp=True, reviewer_count=3), bundle_dir=tmp_path / "bundles", final_pdf_name="final.pdf")
+    bundle = tmp_path / "bundles" / "final.xmtl"
+    assert [Path(f).name for f in files] == ["output_page1.html", "output_page2.html", "output_page3_1.html"]
+    assert all(Path(f).parent == bundle for f in files)
+    assert (bundle / "plan.json").exists()
+
+
+def test_bundle_mode_leaves_cwd_untouched(tmp_path):
+    custom_fill.render_output(base_dict(), bundle_dir=tmp_path / "bundles", final_pdf_name="final.pdf")
+    assert not list(tmp_path.glob("output_*.html"))
+    assert not (tmp_path / "styles.css").exists()
+
+
+def test_bundle_mode_requires_final_pdf_name(tmp_path):
+    with pytest.raises(ValueError):
+        custom_fill.render_output(base_dict(), bundle_dir=tmp_path / "bundles")
+
+
+def test_bundle_mode_renders_with_inline_assets(tmp_path):
+    custom_fill.render_output(base_dict(), bundle_dir=tmp_path / "bundles", final_pdf_name="final.pdf")
+    asset_url = custom_fill.template_1.render.call_args.kwargs["asset_url"]
+    assert asset_url("styles.css").startswith("data:text/css;base64,")
+
+
+# ---------------------------------------------------------------------------
+# Asset cache
+# ---------------------------------------------------------------------------
+
+def test_default_render_does_not_copy_assets_into_cwd(tmp_path):
+    custom_fill.render_output(base_dict())
+    assert not (tmp_path / "styles.css").exists()
+    assert not (tmp_path / "images").exists()
+
+
+def test_default_render_uses_file_uris():
+    custom_fill.render_output(base_dict())
+    asset_url = custom_fill.template_1.render.call_args.kwargs["asset_url"]
+    assert asset_url("styles.css").startswith("file://")
+
+
+def test_inline_assets_option_uses_data_uris():
+    custom_fill.render_output(base_dict(), inline_assets=True)
+    asset_url = custom_fill.template_1.render.call_args.kwargs["asset_url"]
+    assert asset_url("images/UCSC Emblem.png").startswith("data:image/png;base64,")
+
+
+def test_asset_cache_is_keyed_by_content_and_skips_non_template_files(tmp_path):
+    cache_dir = custom_fill.asset_cache_dir()
+    assert cache_dir.parent == tmp_path / "asset_cache"
+    assert (cache_dir / "styles.css").exists()
+    cached_images = {p.name for p in (cache_dir / "images").iterdir()}
+    assert "Thumbs.db" not in cached_images
+    assert "images.zip" not in cached_images
+
+
+def test_asset_lookup_is_case_insensitive():
+    # templates say '.png', the bundled file is '.PNG'
+    assert custom_fill._find_asset("images/Title 3rd page.png").exists()
+
+
+def test_missing_asset_raises():
+    with pytest.raises(RuntimeError, match="Missing template asset"):
+        custom_fill._find_asset("images/nope.png")
+
+
+def test_work_dir_receives_pages_instead_of_cwd(tmp_path):
+    work_dir = tmp_path / "worker"
+    work_dir.mkdir()
+    files = custom_fill.render_output(base_dict(), work_dir=work_dir)
+    assert files == [str(work_dir / "output_page1.html"), str(work_dir / "output_page3_1.html")]
+    assert not list(tmp_path.glob("output_*.html"))
+
+
+# ---------------------------------------------------------------------------
+# Page memo
+# ---------------------------------------------------------------------------
+
+def test_repeated_pages_are_rendered_once():
+    custom_fill.render_output(base_dict(edp=True, reviewer_count=7))
+    calls = custom_fill.template_1.render.call_count
+    custom_fill.render_output({**base_dict(edp=True, reviewer_count=7), "Submittal_Number": "002"})
+    # only the cover page differs; Page 2 and Page 3 come from the memo
+    assert custom_fill.template_1.render.call_count == calls + 1
+
+
+def test_render_pages_returns_html_and_page_hash():
+    import hashlib
+
+    pages = custom_fill.render_pages(base_dict(edp=True))
+    assert [template for _, template, _ in pages] == ["Page1.HTML", "Page2.HTML"]
+    html, page_hash = pages[0][2]
+    assert page_hash == hashlib.sha256(html.encode("utf-8")).hexdigest()
+
+
+def test_page_memo_is_keyed_by_asset_url_style():
+    custom_fill.render_output(base_dict())
+    custom_fill.render_output(base_dict(), inline_assets=True)
+    assert custom_fill.render_page.cache_info().hits == 0
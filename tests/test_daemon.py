@@ -0,0 +1,142 @@
+"""Tests for the resident daemon and its client.
+
+A real DaemonServer listens in a background thread in a temporary
+XMTL_DAEMON_DIR; rendering and conversion are patched out.
+"""
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+import daemon
+from daemon import DaemonServer, connect
+
+
+@pytest.fixture
+def daemon_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("XMTL_DAEMON_DIR", str(tmp_path / "d"))
+    return tmp_path / "d"
+
+
+def start_server(idle_timeout=None):
+    server = DaemonServer(idle_timeout=idle_timeout)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    for _ in range(100):
+        if (client := connect()) is not None:
+            return server, thread, client
+        time.sleep(0.02)
+    raise AssertionError("daemon did not start")
+
+
+@pytest.fixture
+def running(daemon_dir):
+    server, thread, client = start_server()
+    yield server, client
+    client.shutdown()
+    client.close()
+    thread.join(timeout=5)
+
+
+def test_connect_without_a_daemon_returns_none(daemon_dir):
+    assert connect() is None
+
+
+def test_status_reports_the_process(running):
+    server, client = running
+    status = client.status()
+    assert status["pid"] > 0
+    assert status["requests"] == 1
+
+
+def test_templates_are_parsed_again_only_when_changed(running, tmp_path):
+    _, client = running
+    templates = tmp_path / "t.yaml"
+    templates.write_text("A: {Submittal_Name: one}\n")
+    with patch("yaml.safe_load", wraps=__import__("yaml").safe_load) as load:
+        assert client.templates(templates) == {"A": {"Submittal_Name": "one"}}
+        client.templates(templates)
+        assert load.call_count == 1
+        time.sleep(0.01)
+        templates.write_text("A: {Submittal_Name: two}\n")
+        assert client.templates(templates)["A"]["Submittal_Name"] == "two"
+
+
+def test_generate_renders_in_the_daemon(running, full_build, tmp_path):
+    _, client = running
+    calls = []
+
+    def fake_render(dictionary, inline_assets=False, work_dir=None):
+        calls.append((dictionary["Submittal_Name"], inline_assets, Path(work_dir).name))
+        return []
+
+    with patch("custom_fill.render_output", side_effect=fake_render), \
+         patch("html_to_pdf.create_final_pdf", side_effect=lambda name, *a, **k: tmp_path / name) as create:
+        path = client.generate(full_build, "out.pdf", inline_assets=True)
+
+    assert path == tmp_path / "out.pdf"
+    assert calls == [("G3 Provost Shingle Sample", True, calls[0][2])]
+    assert calls[0][2].startswith("xmtl-daemon-")
+    assert create.call_args.kwargs["input_hash"] == full_build.input_hash()
+
+
+def test_errors_are_raised_again_in_the_client(running, no_edp_build):
+    _, client = running
+    no_edp_build.submittal_name.value = ""
+    with pytest.raises(ValueError, match="Missing required fields"):
+        client.generate(no_edp_build, "out.pdf")
+    with pytest.raises(ValueError, match="Unknown daemon operation"):
+        client.request("reboot")
+    assert client.status()["pid"]  # the connection is still usable
+
+
+def test_second_daemon_refuses_to_start(running):
+    with pytest.raises(daemon.DaemonError, match="already listening"):
+        DaemonServer().serve_forever()
+
+
+def test_idle_daemon_exits_once_no_client_is_connected(daemon_dir):
+    server, thread, client = start_server(idle_timeout=0.2)
+    time.sleep(0.4)
+    assert thread.is_alive()  # a connected client keeps it up
+    client.close()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+    assert connect() is None
+
+
+def test_interactive_run_uses_the_daemon(running, tmp_path, monkeypatch):
+    import submittal_cli
+
+    _, client = running
+    templates = tmp_path / "xmtl_templates.yaml"
+    templates.write_text("'3238':\n  Project_Title: '3238, Park'\n  Specification_Section: '07'\n"
+                         "  reviewer_list: Alice\n")
+    monkeypatch.setattr(submittal_cli, "_default_templates_path", lambda: templates)
+    answers = iter(["3238", "001", "0", "Sample"])
+    generated = []
+
+    with patch.object(client, "generate", side_effect=lambda build, name, **kw: generated.append(name) or
+                      tmp_path / name), \
+         patch("custom_fill.render_output") as local_render, \
+         patch("click.prompt", side_effect=lambda *a, **k: next(answers, "")), \
+         patch("click.confirm", return_value=False), \
+         patch("submittal_cli.review_dictionary", return_value=True), \
+         patch.object(submittal_cli.XmtlBuild, "from_yaml") as from_yaml:
+        submittal_cli.run_interactive(client=client)
+
+    assert generated and generated[0].startswith("3238")
+    local_render.assert_not_called()
+    from_yaml.assert_not_called()
+
+
+def test_client_path_does_not_import_the_pdf_stack():
+    code = ("import sys, daemon, submittal_cli; "
+            "print(sorted(m for m in ('html_to_pdf', 'custom_fill', 'pypdf', 'pikepdf', 'jinja2') if m in sys.modules))")
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                            cwd=Path(__file__).resolve().parent.parent)
+    assert result.stdout.strip() == "[]"
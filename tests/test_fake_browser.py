@@ -0,0 +1,115 @@
+"""Tests for the fake browser backend, and end-to-end runs of the real pipeline through it.
+
+Nothing here is mocked: HTML is rendered from the real templates, printed by
+fake_browser.py in a subprocess, and merged with pypdf.
+"""
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+from pypdf import PdfReader
+
+import custom_fill
+import fake_browser
+import html_to_pdf
+from submittal_cli import generate_transmittal
+
+
+@pytest.fixture
+def fake_backend(monkeypatch, tmp_path):
+    monkeypatch.setenv("XMTL_BROWSER", "fake")
+    monkeypatch.setenv("XMTL_ASSET_CACHE", str(tmp_path / "asset_cache"))
+    for cached in (custom_fill.asset_cache_dir, custom_fill.file_asset_url, custom_fill.inline_asset_url):
+        cached.cache_clear()
+    yield
+    for cached in (custom_fill.asset_cache_dir, custom_fill.file_asset_url, custom_fill.inline_asset_url):
+        cached.cache_clear()
+
+
+def print_page(tmp_path, html, **env):
+    page = tmp_path / "page.html"
+    page.write_text(html)
+    output = tmp_path / "page.pdf"
+    result = subprocess.run([sys.executable, fake_browser.__file__, "--headless=new",
+                             f"--print-to-pdf={output}", page.as_uri()],
+                            env={**os.environ, **env})
+    return result.returncode, output
+
+
+class TestFakeBrowser:
+    def test_minimal_pdf_is_valid(self, tmp_path):
+        path = tmp_path / "x.pdf"
+        path.write_bytes(fake_browser.minimal_pdf(3))
+        assert len(PdfReader(path).pages) == 3
+
+    def test_forced_page_breaks_add_pages(self, tmp_path):
+        code, output = print_page(tmp_path, '<div style="page-break-after: always">1</div>'
+                                            '<div style="break-after: page">2</div><div>3</div>')
+        assert code == 0
+        assert len(PdfReader(output).pages) == 3
+
+    def test_failure_rate_one_always_crashes(self, tmp_path):
+        code, output = print_page(tmp_path, "<html></html>", XMTL_FAKE_FAILURE="1")
+        assert code == 1
+        assert not output.exists()
+
+    def test_latency_is_applied(self, tmp_path):
+        started = time.monotonic()
+        print_page(tmp_path, "<html></html>", XMTL_FAKE_LATENCY="0.3:0.4")
+        assert time.monotonic() - started >= 0.3
+
+    @pytest.mark.skipif(not Path("/proc/self").exists(), reason="reads child memory from /proc")
+    def test_memory_is_held_while_printing(self, tmp_path):
+        from concurrency import MB, child_process_rss
+
+        page = tmp_path / "page.html"
+        page.write_text("<html></html>")
+        env = {**os.environ, "XMTL_FAKE_MEMORY_MB": "64", "XMTL_FAKE_LATENCY": "1"}
+        proc = subprocess.Popen([sys.executable, fake_browser.__file__, f"--print-to-pdf={tmp_path / 'p.pdf'}",
+                                 page.as_uri()], env=env)
+        try:
+            peak = 0
+            deadline = time.monotonic() + 5
+            while proc.poll() is None and time.monotonic() < deadline:
+                peak = max(peak, child_process_rss() or 0)
+                time.sleep(0.05)
+        finally:
+            proc.wait()
+        assert peak >= 64 * MB
+
+
+class TestDiscovery:
+    def test_xmtl_browser_fake_selects_fake_backend(self, monkeypatch):
+        monkeypatch.setenv("XMTL_BROWSER", "fake")
+        assert html_to_pdf.discover_edge_path() == Path(fake_browser.__file__).resolve()
+
+    def test_python_backends_run_under_this_interpreter(self):
+        assert html_to_pdf.browser_command(Path("fake_browser.py")) == [sys.executable, "fake_browser.py"]
+        assert html_to_pdf.browser_command(Path("msedge.exe")) == ["msedge.exe"]
+
+
+class TestEndToEnd:
+    def test_generates_merged_pdf_with_one_page_per_template_page(self, fake_backend, full_build, tmp_path):
+        final_path = generate_transmittal(full_build, output_dir=tmp_path / "out", work_dir=tmp_path)
+
+        expected_pages = len(custom_fill.plan_pages(full_build.to_render_dict()))
+        assert len(PdfReader(final_path).pages) == expected_pages
+        assert not list(tmp_path.glob("output_page*"))
+
+    def test_concurrent_conversion(self, fake_backend, full_build, tmp_path, monkeypatch):
+        from concurrency import AdaptiveConcurrency
+
+        monkeypatch.setenv("XMTL_FAKE_LATENCY", "0.1")
+        full_build.reviewer_names.value = ";".join(f"Reviewer {n}" for n in range(20))
+        final_path = generate_transmittal(full_build, output_dir=tmp_path, work_dir=tmp_path,
+                                          concurrency=AdaptiveConcurrency(min_limit=4, max_limit=4))
+        assert len(PdfReader(final_path).pages) == len(custom_fill.plan_pages(full_build.to_render_dict()))
+
+    def test_failing_backend_retries_then_fails(self, fake_backend, full_build, tmp_path, monkeypatch):
+        monkeypatch.setenv("XMTL_FAKE_FAILURE", "1")
+        with pytest.raises(RuntimeError, match="conversion failed"):
+            generate_transmittal(full_build, output_dir=tmp_path, work_dir=tmp_path)
+        assert html_to_pdf.conversion_guard.metrics.counts["retries"] == 2
@@ -0,0 +1,147 @@
+"""Tests for the non-interactive `generate` command.
+
+generate_transmittal is patched, so these cover option parsing, value
+layering, and the structured error contract rather than conversion.
+"""
+import json
+import textwrap
+from unittest.mock import patch
+
+import pytest
+from click.testing import CliRunner
+
+import submittal_cli
+
+REQUIRED = ["--project-number", "3238", "--project-title", "Westside Research Park",
+            "--submittal-number", "001", "--spec-section", "07 31 13", "--submittal-name", "Shingle Sample"]
+
+
+@pytest.fixture
+def generated(tmp_path):
+    """Patch generate_transmittal; yields the list of builds it was called with."""
+    calls = []
+
+    def fake(build, **kwargs):
+        calls.append((build, kwargs))
+        return tmp_path / (kwargs.get("final_pdf_name") or "generated.pdf")
+
+    with patch("submittal_cli.generate_transmittal", side_effect=fake):
+        yield calls
+
+
+def invoke(args, stdin=None):
+    return CliRunner().invoke(submittal_cli.cli, ["generate", "--no-registry", *args], input=stdin)
+
+
+def test_prints_only_the_path_on_success(generated, tmp_path):
+    result = invoke(REQUIRED)
+    assert result.exit_code == 0
+    assert result.stdout.strip() == str((tmp_path / "generated.pdf").resolve())
+
+
+def test_field_options_populate_build(generated):
+    invoke(REQUIRED + ["--reviewers", "Alice;Bob", "--edp-line1", "EHDD"])
+    build, _ = generated[0]
+    assert build.project_number.value == "3238"
+    assert build.reviewer_names.processed_value == ["Alice", "Bob"]
+    assert build.has_edp
+
+
+def test_render_dict_json_on_stdin(generated):
+    render_dict = submittal_cli.XmtlBuild(
+        project_number="3238", project_title="P", submittal_number="001", revision_number="2",
+        specification_section="01", submittal_name="N", reviewer_names="Alice;Bob",
+    ).to_render_dict()
+    result = invoke(["--json", "-"], stdin=json.dumps(render_dict))
+    assert result.exit_code == 0
+    build, _ = generated[0]
+    assert build.revision_number.value == "2"
+    assert build.reviewer_names.processed_value == ["Alice", "Bob"]
+
+
+def test_options_override_json_which_overrides_template(generated, tmp_path, monkeypatch):
+    templates = tmp_path / "xmtl_templates.yaml"
+    templates.write_text(textwrap.dedent("""\
+        "T":
+          Project_Title: "3238, From Template"
+          Submittal_Number: "001"
+          Specification_Section: "07 31 13"
+          Submittal_Name: "Template Name"
+          Project_Manager: "Template PM"
+    """))
+    monkeypatch.setattr(submittal_cli, "_default_templates_path", lambda: templates)
+
+    result = invoke(["--template", "T", "--json", "-", "--submittal-name", "From Option"],
+                    stdin=json.dumps({"Project_Manager": "From JSON", "Submittal_Name": "From JSON"}))
+
+    assert result.exit_code == 0
+    build, _ = generated[0]
+    assert build.project_title.value == "From Template"
+    assert build.project_manager_name.value == "From JSON"
+    assert build.submittal_name.value == "From Option"
+
+
+def test_output_path_sets_directory_and_name(generated, tmp_path):
+    invoke(REQUIRED + ["--output", str(tmp_path / "out" / "final.pdf")])
+    _, kwargs = generated[0]
+    assert kwargs["output_dir"].directory == (tmp_path / "out").resolve()
+    assert kwargs["final_pdf_name"] == "final.pdf"
+
+
+def test_collision_policy_is_passed_to_sink(generated):
+    invoke(REQUIRED + ["--on-collision", "suffix"])
+    _, kwargs = generated[0]
+    assert kwargs["output_dir"].collision == "suffix"
+
+
+def test_missing_fields_give_structured_error(generated):
+    result = invoke(["--project-number", "3238"])
+    assert result.exit_code == 2
+    error = json.loads(result.stderr)
+    assert error["error"] == "missing_fields"
+    assert "Submittal_Number" in error["fields"]
+    assert not generated
+
+
+def test_unknown_template_is_an_input_error(generated, tmp_path, monkeypatch):
+    templates = tmp_path / "xmtl_templates.yaml"
+    templates.write_text('"T": {}\n')
+    monkeypatch.setattr(submittal_cli, "_default_templates_path", lambda: templates)
+    result = invoke(["--template", "nope"])
+    assert result.exit_code == 2
+    assert json.loads(result.stderr)["error"] == "unknown_template"
+
+
+def test_conversion_failure_exits_one(tmp_path):
+    with patch("submittal_cli.generate_transmittal", side_effect=RuntimeError("Edge PDF conversion failed")):
+        result = invoke(REQUIRED)
+    assert result.exit_code == 1
+    assert json.loads(result.stderr) == {"error": "conversion_failed", "message": "Edge PDF conversion failed"}
+
+
+def test_unwritable_output_is_a_structured_error(tmp_path):
+    error = PermissionError(13, "Permission denied", str(tmp_path / "out.pdf"))
+    with patch("submittal_cli.generate_transmittal", side_effect=error):
+        result = invoke(REQUIRED)
+    assert result.exit_code == 1
+    assert json.loads(result.stderr) == {"error": "output_failed", "message": str(error)}
+
+
+def test_invalid_json_is_an_input_error(generated):
+    result = invoke(["--json", "-"], stdin="{not json")
+    assert result.exit_code == 2
+    assert json.loads(result.stderr)["error"] == "invalid_json"
+
+
+@pytest.mark.parametrize("args", [REQUIRED, ["--project-number", "3238"]])
+def test_console_is_only_quiet_while_generating(generated, args):
+    layered_build, seen = submittal_cli._layered_build, []
+
+    def recording(*a):
+        seen.append(submittal_cli.console.quiet)
+        return layered_build(*a)
+
+    with patch("submittal_cli._layered_build", side_effect=recording):
+        invoke(args)
+    assert seen == [True]
+    assert submittal_cli.console.quiet is False
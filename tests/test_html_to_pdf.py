@@ -7,6 +7,7 @@ import subprocess
 from unittest.mock import MagicMock, patch
 
 import pytest
+from pypdf.errors import PdfReadError
 import html_to_pdf
 
 
@@ -55,7 +56,7 @@ class TestConvertHtml:
         def fake_run(*args, **kwargs):
             pdf_out.write_bytes(b"%PDF-1.7")
 
-        with patch("html_to_pdf.subprocess.run", side_effect=fake_run) as mock_run:
+        with patch("html_to_pdf.run_process_tree", side_effect=fake_run) as mock_run:
             result = html_to_pdf.convert_html(str(html_file), str(pdf_out), edge_exe)
 
         assert result == pdf_out.resolve()
@@ -69,7 +70,7 @@ class TestConvertHtml:
         edge_exe = tmp_path / "msedge.exe"
         edge_exe.write_text("edge")
 
-        with patch("html_to_pdf.subprocess.run", side_effect=lambda *a, **k: pdf_out.write_bytes(b"%PDF-1.7")):
+        with patch("html_to_pdf.run_process_tree", side_effect=lambda *a, **k: pdf_out.write_bytes(b"%PDF-1.7")):
             result = html_to_pdf.convert_html(str(html_file), str(pdf_out), edge_exe)
 
         assert result == pdf_out.resolve()
@@ -80,7 +81,7 @@ class TestConvertHtml:
         edge_exe = tmp_path / "msedge.exe"
         edge_exe.write_text("edge")
 
-        with patch("html_to_pdf.subprocess.run", side_effect=subprocess.CalledProcessError(1, "msedge")):
+        with patch("html_to_pdf.run_process_tree", side_effect=subprocess.CalledProcessError(1, "msedge")):
             with pytest.raises(RuntimeError, match="Edge PDF conversion failed"):
                 html_to_pdf.convert_html(str(html_file), str(tmp_path / "out.pdf"), edge_exe)
 
@@ -90,7 +91,7 @@ class TestConvertHtml:
         edge_exe = tmp_path / "msedge.exe"
         edge_exe.write_text("edge")
 
-        with patch("html_to_pdf.subprocess.run", return_value=None):
+        with patch("html_to_pdf.run_process_tree", return_value=None):
             with pytest.raises(RuntimeError, match="did not produce a valid PDF"):
                 html_to_pdf.convert_html(str(html_file), str(tmp_path / "out.pdf"), edge_exe)
 
@@ -108,9 +109,9 @@ class TestCreateFinalPdf:
             paths.append(str(p))
         return paths
 
-    def test_exits_when_html_file_missing(self, tmp_path):
+    def test_raises_when_html_file_missing(self, tmp_path):
         with patch("html_to_pdf.discover_edge_path", return_value=tmp_path / "msedge.exe"):
-            with pytest.raises(SystemExit):
+            with pytest.raises(RuntimeError, match="Missing HTML files"):
                 html_to_pdf.create_final_pdf("out.pdf", [str(tmp_path / "missing.html")])
 
     def test_fails_quickly_when_edge_is_not_detected(self, tmp_path):
@@ -138,7 +139,7 @@ class TestCreateFinalPdf:
         convert_calls = iter(fake_pdfs)
 
         with patch("html_to_pdf.discover_edge_path", return_value=edge_exe), \
-             patch("html_to_pdf.convert_html", side_effect=lambda h, p, e: next(convert_calls)) as mock_convert, \
+             patch("html_to_pdf.convert_html", side_effect=lambda h, p, e, timeout=None: next(convert_calls)) as mock_convert, \
              patch("html_to_pdf.PdfWriter", return_value=mock_writer):
             html_to_pdf.create_final_pdf(str(tmp_path / "final.pdf"), html_files)
 
@@ -158,8 +159,251 @@ class TestCreateFinalPdf:
         convert_iter = iter(fake_pdfs)
 
         with patch("html_to_pdf.discover_edge_path", return_value=edge_exe), \
-             patch("html_to_pdf.convert_html", side_effect=lambda h, p, e: next(convert_iter)), \
+             patch("html_to_pdf.convert_html", side_effect=lambda h, p, e, timeout=None: next(convert_iter)), \
              patch("html_to_pdf.PdfWriter", return_value=mock_writer):
             html_to_pdf.create_final_pdf(str(tmp_path / "final.pdf"), html_files)
 
         assert mock_writer.append.call_count == 2
+
+    def test_concurrent_conversion_merges_in_page_order(self, tmp_path):
+        from concurrency import AdaptiveConcurrency
+
+        html_files = self._make_html_files(tmp_path, count=3)
+        mock_writer = MagicMock()
+
+        def slow_first_page(html, pdf_name, edge_path, timeout=None):
+            if html.endswith("page1.html"):
+                import time
+                time.sleep(0.05)
+            Path(pdf_name).write_bytes(b"%PDF-stub")
+            return Path(pdf_name)
+
+        with patch("html_to_pdf.discover_edge_path", return_value=tmp_path / "msedge.exe"), \
+             patch("html_to_pdf.convert_html", side_effect=slow_first_page), \
+             patch("html_to_pdf.PdfWriter", return_value=mock_writer):
+            html_to_pdf.create_final_pdf("final.pdf", html_files, output_dir=tmp_path,
+                                         concurrency=AdaptiveConcurrency(min_limit=3, max_limit=3))
+
+        appended = [Path(c.args[0]).name for c in mock_writer.append.call_args_list]
+        assert appended == ["output_page1.pdf", "output_page2.pdf", "output_page3.pdf"]
+
+
+    def test_transient_page_failure_is_retried(self, tmp_path):
+        from resilience import TransientConversionError
+
+        html_files = self._make_html_files(tmp_path, count=2)
+        attempts = []
+
+        def flaky_print(html, pdf_name, edge_path, timeout=None):
+            attempts.append(html)
+            if len(attempts) == 1:
+                raise TransientConversionError("renderer crashed")
+            Path(pdf_name).write_bytes(b"%PDF-stub")
+            return Path(pdf_name)
+
+        with patch("html_to_pdf.discover_edge_path", return_value=tmp_path / "msedge.exe"), \
+             patch("html_to_pdf.convert_html", side_effect=flaky_print), \
+             patch("html_to_pdf.PdfWriter", return_value=MagicMock()):
+            html_to_pdf.create_final_pdf("final.pdf", html_files, output_dir=tmp_path)
+
+        assert len(attempts) == 3
+        assert html_to_pdf.conversion_guard.metrics.counts["retries"] == 1
+
+    def test_skip_policy_returns_existing_without_converting(self, tmp_path):
+        from output_sink import OutputSink
+
+        html_files = self._make_html_files(tmp_path, count=1)
+        (tmp_path / "final.pdf").write_bytes(b"%PDF-old")
+
+        with patch("html_to_pdf.discover_edge_path", return_value=tmp_path / "msedge.exe"), \
+             patch("html_to_pdf.convert_html") as mock_convert:
+            result = html_to_pdf.create_final_pdf("final.pdf", html_files,
+                                                  output_dir=OutputSink(tmp_path, collision="skip"))
+
+        assert result == tmp_path / "final.pdf"
+        assert result.read_bytes() == b"%PDF-old"
+        mock_convert.assert_not_called()
+        assert not Path(html_files[0]).exists()
+
+
+# ---------------------------------------------------------------------------
+# convert_bundles
+# ---------------------------------------------------------------------------
+
+class TestConvertBundles:
+    PAGES = [("output_page1.html", "Page1.HTML", "<html>1</html>")]
+
+    def test_converted_bundle_is_removed(self, tmp_path):
+        from render_bundle import write_bundle
+
+        write_bundle(tmp_path / "bundles", "final.pdf", self.PAGES)
+
+        with patch("html_to_pdf.discover_edge_path"), \
+             patch("html_to_pdf.create_final_pdf", return_value=tmp_path / "final.pdf") as mock_create:
+            converted, failed = html_to_pdf.convert_bundles(tmp_path / "bundles", output_dir=tmp_path)
+
+        assert converted == [tmp_path / "final.pdf"]
+        assert failed == []
+        assert mock_create.call_args.args[0] == "final.pdf"
+        assert mock_create.call_args.kwargs["output_dir"] == tmp_path
+        assert not list((tmp_path / "bundles").iterdir())
+
+    def test_failed_bundle_is_kept_for_inspection(self, tmp_path):
+        from render_bundle import write_bundle
+
+        write_bundle(tmp_path / "bundles", "final.pdf", self.PAGES)
+
+        with patch("html_to_pdf.discover_edge_path"), \
+             patch("html_to_pdf.create_final_pdf", side_effect=RuntimeError("boom")):
+            converted, failed = html_to_pdf.convert_bundles(tmp_path / "bundles")
+
+        assert converted == []
+        assert failed == [tmp_path / "bundles" / "final.xmtl.failed"]
+        assert failed[0].is_dir()
+
+    @pytest.mark.parametrize("error", [PdfReadError("bad xref"), KeyError("/Pages"), OSError("share went away")])
+    def test_any_conversion_error_marks_the_bundle_failed(self, tmp_path, error):
+        from render_bundle import write_bundle
+
+        write_bundle(tmp_path / "bundles", "a.pdf", self.PAGES)
+        write_bundle(tmp_path / "bundles", "b.pdf", self.PAGES)
+
+        with patch("html_to_pdf.discover_edge_path"), \
+             patch("html_to_pdf.create_final_pdf", side_effect=[error, tmp_path / "b.pdf"]):
+            converted, failed = html_to_pdf.convert_bundles(tmp_path / "bundles")
+
+        assert converted == [tmp_path / "b.pdf"]
+        assert [path.name for path in (tmp_path / "bundles").iterdir()] == ["a.xmtl.failed"]
+
+    def test_unreadable_plan_marks_the_bundle_failed(self, tmp_path):
+        from render_bundle import write_bundle
+
+        write_bundle(tmp_path / "bundles", "final.pdf", self.PAGES)
+        (tmp_path / "bundles" / "final.xmtl" / "plan.json").write_text("{not json")
+
+        with patch("html_to_pdf.discover_edge_path"):
+            converted, failed = html_to_pdf.convert_bundles(tmp_path / "bundles")
+
+        assert failed == [tmp_path / "bundles" / "final.xmtl.failed"]
+
+    def test_open_circuit_hands_the_bundle_back_and_stops(self, tmp_path):
+        from render_bundle import write_bundle
+        from resilience import CircuitOpenError
+
+        write_bundle(tmp_path / "bundles", "a.pdf", self.PAGES)
+        write_bundle(tmp_path / "bundles", "b.pdf", self.PAGES)
+
+        with patch("html_to_pdf.discover_edge_path"), \
+             patch("html_to_pdf.create_final_pdf", side_effect=CircuitOpenError("open")) as mock_create:
+            with pytest.raises(CircuitOpenError):
+                html_to_pdf.convert_bundles(tmp_path / "bundles")
+
+        assert mock_create.call_count == 1
+        assert sorted(path.name for path in (tmp_path / "bundles").iterdir()) == ["a.xmtl", "b.xmtl"]
+
+    def test_nothing_claimed_when_edge_is_missing(self, tmp_path):
+        from render_bundle import write_bundle
+
+        write_bundle(tmp_path / "bundles", "final.pdf", self.PAGES)
+
+        with patch("html_to_pdf.discover_edge_path", side_effect=RuntimeError("Edge missing")):
+            with pytest.raises(RuntimeError):
+                html_to_pdf.convert_bundles(tmp_path / "bundles")
+
+        assert (tmp_path / "bundles" / "final.xmtl").is_dir()
+
+
+# ---------------------------------------------------------------------------
+# Deterministic output
+# ---------------------------------------------------------------------------
+
+class TestDeterministicOutput:
+    """Conversion is patched to write real single-page PDFs that, like browser
+    output, carry a fresh creation date, random /ID and page timestamp each time."""
+
+    @staticmethod
+    def fake_browser_print(html, pdf_name, edge_path, timeout=None):
+        import os
+        from datetime import datetime
+        from pypdf import PdfWriter
+        from pypdf.generic import ArrayObject, ByteStringObject, NameObject, TextStringObject
+
+        writer = PdfWriter()
+        page = writer.add_blank_page(612, 792)
+        page[NameObject("/LastModified")] = TextStringObject(datetime.now().strftime("D:%Y%m%d%H%M%S%f"))
+        writer.add_metadata({"/CreationDate": datetime.now().strftime("D:%Y%m%d%H%M%S%f")})
+        writer._ID = ArrayObject([ByteStringObject(os.urandom(16)), ByteStringObject(os.urandom(16))])
+        writer.write(pdf_name)
+        return Path(pdf_name)
+
+    def _generate(self, tmp_path, name, options):
+        html_files = []
+        for i in (1, 2):
+            html = tmp_path / f"output_page{i}.html"
+            html.write_text(f"<html>{i}</html>")
+            html_files.append(str(html))
+        with patch("html_to_pdf.discover_edge_path", return_value=tmp_path / "msedge.exe"), \
+             patch("html_to_pdf.convert_html", side_effect=self.fake_browser_print):
+            return html_to_pdf.create_final_pdf(name, html_files, output_dir=tmp_path, pdf_options=options)
+
+    def test_identical_inputs_give_identical_bytes(self, tmp_path):
+        options = html_to_pdf.PdfOptions(deterministic=True)
+        first = self._generate(tmp_path, "a.pdf", options).read_bytes()
+        second = self._generate(tmp_path, "b.pdf", options).read_bytes()
+        assert first == second
+
+    def test_default_output_is_not_normalised(self, tmp_path):
+        from pypdf import PdfReader
+
+        reader = PdfReader(self._generate(tmp_path, "a.pdf", html_to_pdf.PdfOptions()))
+        assert "/LastModified" in reader.pages[0]
+
+    def test_stable_id_and_fixed_dates(self, tmp_path, monkeypatch):
+        from pypdf import PdfReader
+
+        monkeypatch.setenv("SOURCE_DATE_EPOCH", "1700000000")
+        reader = PdfReader(self._generate(tmp_path, "a.pdf", html_to_pdf.PdfOptions(deterministic=True)))
+
+        assert reader.trailer["/ID"][0] == reader.trailer["/ID"][1]
+        assert reader.metadata["/CreationDate"] == "D:20231114221320Z"
+        assert reader.metadata["/Producer"] == "xmtl-factory"
+        assert "/LastModified" not in reader.pages[0]
+
+    def test_dates_omitted_without_timestamp(self, tmp_path, monkeypatch):
+        from pypdf import PdfReader
+
+        monkeypatch.delenv("SOURCE_DATE_EPOCH", raising=False)
+        reader = PdfReader(self._generate(tmp_path, "a.pdf", html_to_pdf.PdfOptions(deterministic=True)))
+        assert "/CreationDate" not in reader.metadata
+
+
+# ---------------------------------------------------------------------------
+# Linearized output
+# ---------------------------------------------------------------------------
+
+class TestLinearizedOutput:
+    fake_browser_print = staticmethod(TestDeterministicOutput.fake_browser_print)
+    _generate = TestDeterministicOutput._generate
+
+    def test_output_is_linearized(self, tmp_path):
+        pikepdf = pytest.importorskip("pikepdf")
+        path = self._generate(tmp_path, "a.pdf", html_to_pdf.PdfOptions(linearize=True))
+        with pikepdf.open(path) as pdf:
+            assert pdf.is_linearized
+            assert len(pdf.pages) == 2
+
+    def test_deterministic_linearized_output_is_stable(self, tmp_path):
+        pytest.importorskip("pikepdf")
+        options = html_to_pdf.PdfOptions(deterministic=True, linearize=True)
+        first = self._generate(tmp_path, "a.pdf", options).read_bytes()
+        second = self._generate(tmp_path, "b.pdf", options).read_bytes()
+        assert first == second
+
+    def test_missing_linearizer_fails_before_converting(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(html_to_pdf, "pikepdf", None)
+        monkeypatch.setattr(html_to_pdf.shutil, "which", lambda name: None)
+        with patch("html_to_pdf.convert_html") as convert:
+            with pytest.raises(RuntimeError, match="pikepdf"):
+                html_to_pdf.create_final_pdf("a.pdf", [], output_dir=tmp_path,
+                                             pdf_options=html_to_pdf.PdfOptions(linearize=True))
+        convert.assert_not_called()
@@ -0,0 +1,72 @@
+"""Tests for the tracemalloc memory profiler."""
+import sysconfig
+from pathlib import Path
+
+import pytest
+
+import memory_profile
+from memory_profile import MemoryProfiler, package_of, short_location
+
+
+@pytest.fixture
+def profiler():
+    profiler = MemoryProfiler()
+    profiler.enable()
+    yield profiler
+    profiler.disable()
+
+
+def test_disabled_profiler_records_nothing():
+    profiler = MemoryProfiler()
+    with profiler.stage("render"):
+        data = bytearray(100_000)
+    assert profiler.stages == {}
+    assert profiler.iteration() is None
+    del data
+
+
+def test_stage_records_net_change_and_top_allocator(profiler):
+    kept = []
+    with profiler.stage("merge"):
+        kept.append(bytearray(1_000_000))
+    with profiler.stage("merge"):
+        pass
+
+    stats = profiler.stages["merge"]
+    assert stats.calls == 2
+    assert stats.net > 1_000_000
+    assert stats.largest > 1_000_000
+    top_line, size = stats.lines.most_common(1)[0]
+    assert top_line.startswith("test_memory_profile.py:") and size > 1_000_000
+    assert "merge" in profiler.report()
+
+
+def test_growth_across_iterations_is_flagged(profiler, monkeypatch):
+    monkeypatch.setattr(memory_profile, "GROWTH_ITERATIONS", 3)
+    leak = []
+    messages = []
+    for _ in range(4):
+        leak.append(bytearray(200_000))
+        messages.append(profiler.iteration())
+
+    assert messages[:3] == [None, None, None]
+    assert messages[3].startswith("Memory rose in each of the last 3 iterations")
+    assert "test_memory_profile" in messages[3]
+    assert "WARNING: Memory rose" in profiler.report()
+
+
+def test_steady_loop_is_not_flagged(profiler):
+    for _ in range(5):
+        scratch = bytearray(200_000)
+        del scratch
+        assert profiler.iteration() is None
+
+
+def test_locations_are_grouped_by_package():
+    site = Path("/venv/lib/python3.11/site-packages/jinja2/environment.py")
+    stdlib = Path(sysconfig.get_paths()["stdlib"]) / "re" / "_parser.py"
+    assert package_of(str(site)) == "jinja2"
+    assert package_of(str(stdlib)) == "stdlib"
+    assert package_of("/work/xmtl_factory/html_to_pdf.py") == "html_to_pdf"
+    assert short_location(str(site), 12) == "jinja2/environment.py:12"
+    assert short_location(str(stdlib), 3) == "re/_parser.py:3"
@@ -0,0 +1,133 @@
+"""Tests for the metrics registry and its Prometheus exposition."""
+import os
+import urllib.request
+
+import pytest
+
+import metrics
+from metrics import FileDumper, MetricsRegistry, serve, write_metrics_file
+
+
+@pytest.fixture
+def registry():
+    return MetricsRegistry()
+
+
+def test_counter_renders_help_type_and_labelled_series(registry):
+    pages = registry.counter("xmtl_pages_total", "Pages converted.")
+    pages.inc()
+    pages.inc(2, outcome="ok")
+    pages.inc(outcome='bad "quote"')
+
+    text = registry.render()
+
+    assert "# HELP xmtl_pages_total Pages converted.\n# TYPE xmtl_pages_total counter\n" in text
+    assert "xmtl_pages_total 1\n" in text
+    assert 'xmtl_pages_total{outcome="ok"} 2\n' in text
+    assert 'xmtl_pages_total{outcome="bad \\"quote\\""} 1\n' in text
+
+
+def test_counter_rejects_negative_increments(registry):
+    with pytest.raises(ValueError):
+        registry.counter("xmtl_total", "x").inc(-1)
+
+
+def test_declaring_a_name_twice_returns_the_same_metric(registry):
+    assert registry.gauge("xmtl_depth", "x") is registry.gauge("xmtl_depth", "x")
+    with pytest.raises(ValueError):
+        registry.counter("xmtl_depth", "x")
+
+
+def test_histogram_buckets_are_cumulative(registry):
+    seconds = registry.histogram("xmtl_seconds", "Durations.", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 3.0):
+        seconds.observe(value)
+
+    text = registry.render()
+
+    assert 'xmtl_seconds_bucket{le="0.1"} 1\n' in text
+    assert 'xmtl_seconds_bucket{le="1"} 3\n' in text
+    assert 'xmtl_seconds_bucket{le="+Inf"} 4\n' in text
+    assert "xmtl_seconds_sum 4.25\n" in text
+    assert "xmtl_seconds_count 4\n" in text
+    assert seconds.value() == (4, 4.25)
+
+
+def test_histogram_time_observes_the_block(registry):
+    seconds = registry.histogram("xmtl_seconds", "Durations.")
+    with pytest.raises(RuntimeError):
+        with seconds.time(stage="merge"):
+            raise RuntimeError("boom")
+    assert seconds.value(stage="merge")[0] == 1
+
+
+def test_gauge_tracks_blocks_in_progress(registry):
+    in_flight = registry.gauge("xmtl_in_flight", "x")
+    with in_flight.track_in_progress():
+        assert in_flight.value() == 1
+    assert in_flight.value() == 0
+
+
+def test_function_backed_gauge_is_read_at_collection_time(registry):
+    depth = {"pending": 3}
+    gauge = registry.gauge("xmtl_queue_depth", "x")
+    gauge.set_function(lambda: depth["pending"])
+    gauge.set_function(lambda: None, queue="unknown")
+    gauge.set_function(lambda: 1 / 0, queue="broken")
+
+    assert "xmtl_queue_depth 3\n" in registry.render()
+    depth["pending"] = 7
+    text = registry.render()
+    assert "xmtl_queue_depth 7\n" in text
+    assert "unknown" not in text and "broken" not in text
+
+
+def test_serve_exposes_the_registry_over_http(registry):
+    registry.counter("xmtl_jobs_total", "Jobs.").inc(5)
+    server = serve(registry, port=0)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        with urllib.request.urlopen(url, timeout=5) as response:
+            body = response.read().decode("utf-8")
+            content_type = response.headers["Content-Type"]
+    finally:
+        server.shutdown()
+
+    assert content_type.startswith("text/plain; version=0.0.4")
+    assert "xmtl_jobs_total 5\n" in body
+
+
+def test_metrics_file_is_written_atomically_and_on_stop(tmp_path, registry):
+    path = tmp_path / "textfile" / "xmtl.prom"
+    jobs = registry.counter("xmtl_jobs_total", "Jobs.")
+    write_metrics_file(path, registry)
+    assert "xmtl_jobs_total" in path.read_text()
+
+    dumper = FileDumper(path, interval=3600, registry=registry).start()
+    jobs.inc()
+    dumper.stop()
+
+    assert "xmtl_jobs_total 1\n" in path.read_text()
+    assert [p.name for p in path.parent.iterdir()] == ["xmtl.prom"]
+
+
+@pytest.mark.skipif(os.name != "posix", reason="POSIX permission bits")
+def test_metrics_file_is_readable_by_a_collector_running_as_another_user(tmp_path, registry):
+    old_umask = os.umask(0o022)
+    try:
+        write_metrics_file(tmp_path / "xmtl.prom", registry)
+    finally:
+        os.umask(old_umask)
+    assert (tmp_path / "xmtl.prom").stat().st_mode & 0o777 == 0o644
+
+
+def test_shared_registry_declares_the_pipeline_metrics():
+    import custom_fill  # noqa: F401
+    import html_to_pdf  # noqa: F401
+    import registry  # noqa: F401
+    import work_queue  # noqa: F401
+
+    text = metrics.REGISTRY.render()
+    for name in ("xmtl_render_seconds", "xmtl_convert_seconds", "xmtl_merge_seconds", "xmtl_jobs_total",
+                 "xmtl_registry_lookups_total", "xmtl_queue_jobs", "xmtl_conversion_timeout_seconds"):
+        assert f"# TYPE {name} " in text
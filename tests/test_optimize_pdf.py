@@ -0,0 +1,113 @@
+"""Tests for image downsampling and PDF byte budgets.
+
+Uses the browser-printed transmittals in examples/, whose header images are
+wrapped in form XObjects the way Edge writes them.
+"""
+from io import BytesIO
+from pathlib import Path
+
+import pytest
+from pypdf import PdfReader, PdfWriter
+
+pytest.importorskip("PIL")
+
+import optimize_pdf
+from optimize_pdf import ImageCache, PdfBudgetExceeded, image_placements, optimize_writer
+
+EXAMPLE = Path(__file__).resolve().parent.parent / "examples" / "Untitled.pdf"
+
+
+def merged(*paths):
+    writer = PdfWriter()
+    for path in paths or (EXAMPLE,):
+        writer.append(str(path))
+    return writer
+
+
+def image_sizes(writer):
+    buffer = BytesIO()
+    writer.write(buffer)
+    return [image.image.size for page in PdfReader(buffer).pages for image in page.images]
+
+
+def test_placements_follow_images_into_form_xobjects():
+    writer = merged()
+    placements = image_placements(writer)
+    widths = sorted(round(width) for width, _ in placements.values())
+    assert widths == [173, 214]
+    for idnum in placements:
+        assert writer.get_object(idnum)["/Subtype"] == "/Image"
+
+
+def test_images_are_resampled_to_the_target_dpi():
+    writer = merged()
+    report = optimize_writer(writer, dpi=100, cache=ImageCache())
+
+    assert report.optimized_bytes < report.original_bytes
+    # the 214 x 90 pt cover image at 100 DPI
+    assert (297, 125) in image_sizes(writer)
+    assert report.images_resampled >= 2
+
+
+def test_images_already_below_the_target_are_left_alone():
+    writer = merged()
+    report = optimize_writer(writer, dpi=1200, cache=ImageCache())
+    assert report.images_resampled == 0
+    assert (1421, 596) in image_sizes(writer)
+
+
+def test_resampled_images_are_reused_across_documents():
+    cache = ImageCache()
+    first = optimize_writer(merged(), dpi=100, cache=cache)
+    second = optimize_writer(merged(), dpi=100, cache=cache)
+
+    assert second.images_resampled == 0
+    assert second.images_reused == first.images_resampled + first.images_reused
+    assert second.optimized_bytes == first.optimized_bytes
+
+
+def test_budget_lowers_dpi_until_the_document_fits():
+    unconstrained = optimize_writer(merged(), dpi=150, cache=ImageCache())
+    report = optimize_writer(merged(), dpi=150, max_bytes=unconstrained.optimized_bytes - 1, cache=ImageCache())
+    assert report.dpi < 150
+    assert report.optimized_bytes < unconstrained.optimized_bytes
+
+
+def test_unreachable_budget_raises():
+    with pytest.raises(PdfBudgetExceeded, match="over its budget of 1,000 bytes"):
+        optimize_writer(merged(), max_bytes=1000, cache=ImageCache())
+
+
+def test_summary_reports_savings():
+    report = optimize_pdf.OptimizationReport(1000, 400, images_resampled=2, images_reused=1, dpi=150)
+    assert report.summary() == ("Optimized PDF: 1,000 -> 400 bytes (60% smaller); "
+                                "2 images resampled to 150 DPI, 1 from cache.")
+
+
+def test_budget_applies_to_the_finished_bytes():
+    unconstrained = optimize_writer(merged(), dpi=150, cache=ImageCache())
+    budget = unconstrained.optimized_bytes + 1000
+    report = optimize_writer(merged(), dpi=150, max_bytes=budget, cache=ImageCache(),
+                             finish=lambda writer: optimize_pdf.serialize(writer) + bytes(2000))
+    assert report.dpi < 150
+    assert report.optimized_bytes == len(report.data) <= budget
+
+
+def test_linearized_output_meets_the_budget(tmp_path):
+    import shutil
+    from unittest.mock import patch
+
+    import html_to_pdf
+
+    pytest.importorskip("pikepdf")
+
+    def generate(name, **options):
+        html = tmp_path / f"{name}.html"
+        html.write_text("<html></html>")
+        with patch("html_to_pdf.discover_edge_path", return_value=tmp_path / "msedge.exe"), \
+             patch("html_to_pdf.convert_html", side_effect=lambda html, pdf, edge, **kw: Path(shutil.copy(EXAMPLE, pdf))):
+            return html_to_pdf.create_final_pdf(name, [str(html)], output_dir=tmp_path,
+                                                pdf_options=html_to_pdf.PdfOptions(linearize=True, **options))
+
+    budget = generate("a.pdf", image_dpi=150).stat().st_size - 1
+    assert generate("b.pdf", image_dpi=150, max_bytes=budget).stat().st_size <= budget
@@ -0,0 +1,164 @@
+"""Tests for output_sink: atomic placement, collision policies and fsync batching."""
+import os
+import threading
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+import output_sink
+from output_sink import OutputSink
+
+
+def partial_files(directory):
+    return list(directory.glob(".*.partial"))
+
+
+class TestAtomicWrite:
+    def test_writes_file_and_leaves_no_temporary(self, tmp_path):
+        path = OutputSink(tmp_path).write_bytes("a.pdf", b"%PDF-new")
+        assert path == tmp_path / "a.pdf"
+        assert path.read_bytes() == b"%PDF-new"
+        assert not partial_files(tmp_path)
+
+    def test_failed_write_keeps_previous_file(self, tmp_path):
+        (tmp_path / "a.pdf").write_bytes(b"%PDF-old")
+
+        def crash(f):
+            f.write(b"%PDF-tru")
+            raise RuntimeError("writer died")
+
+        with pytest.raises(RuntimeError):
+            OutputSink(tmp_path).write("a.pdf", crash)
+        assert (tmp_path / "a.pdf").read_bytes() == b"%PDF-old"
+        assert not partial_files(tmp_path)
+
+    def test_creates_missing_directory(self, tmp_path):
+        OutputSink(tmp_path / "new" / "dir").write_bytes("a.pdf", b"x")
+        assert (tmp_path / "new" / "dir" / "a.pdf").is_file()
+
+    def test_rejects_unknown_policy(self, tmp_path):
+        with pytest.raises(ValueError):
+            OutputSink(tmp_path, collision="merge")
+
+
+class TestCollisionPolicies:
+    def test_overwrite_replaces(self, tmp_path):
+        sink = OutputSink(tmp_path)
+        sink.write_bytes("a.pdf", b"1")
+        assert sink.write_bytes("a.pdf", b"2").read_bytes() == b"2"
+
+    def test_suffix_keeps_existing(self, tmp_path):
+        sink = OutputSink(tmp_path, collision="suffix")
+        paths = [sink.write_bytes("a.pdf", str(n).encode()) for n in range(3)]
+        assert [p.name for p in paths] == ["a.pdf", "a (1).pdf", "a (2).pdf"]
+        assert (tmp_path / "a.pdf").read_bytes() == b"0"
+
+    def test_skip_keeps_existing_and_discards_new(self, tmp_path):
+        sink = OutputSink(tmp_path, collision="skip")
+        sink.write_bytes("a.pdf", b"first")
+        assert sink.write_bytes("a.pdf", b"second") == tmp_path / "a.pdf"
+        assert (tmp_path / "a.pdf").read_bytes() == b"first"
+        assert sink.existing("a.pdf") == tmp_path / "a.pdf"
+        assert not partial_files(tmp_path)
+
+    def test_existing_is_none_unless_skipping(self, tmp_path):
+        (tmp_path / "a.pdf").write_bytes(b"x")
+        assert OutputSink(tmp_path).existing("a.pdf") is None
+
+    def test_suffix_without_hard_links(self, tmp_path):
+        sink = OutputSink(tmp_path, collision="suffix")
+        with patch("output_sink.os.link", side_effect=PermissionError):
+            first = sink.write_bytes("a.pdf", b"1")
+            second = sink.write_bytes("a.pdf", b"2")
+        assert (first.read_bytes(), second.read_bytes()) == (b"1", b"2")
+        assert not partial_files(tmp_path)
+
+    @pytest.mark.parametrize("policy", ["overwrite", "suffix", "skip"])
+    def test_concurrent_writers_never_mix_output(self, tmp_path, policy):
+        sink = OutputSink(tmp_path, collision=policy)
+        payloads = [bytes([65 + n]) * 200_000 for n in range(8)]
+        barrier = threading.Barrier(len(payloads))
+
+        def write(payload):
+            barrier.wait()
+            sink.write("same.pdf", lambda f: [f.write(payload[i:i + 4096]) for i in range(0, len(payload), 4096)])
+
+        threads = [threading.Thread(target=write, args=(p,)) for p in payloads]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        outputs = sorted(tmp_path.glob("same*.pdf"))
+        assert len(outputs) == {"overwrite": 1, "suffix": 8, "skip": 1}[policy]
+        assert all(out.read_bytes() in payloads for out in outputs)
+        assert not partial_files(tmp_path)
+
+
+class TestFsyncBatching:
+    def test_every_file_synced_by_default(self, tmp_path):
+        with patch("output_sink.os.fsync") as fsync:
+            OutputSink(tmp_path).write_bytes("a.pdf", b"x")
+        assert fsync.call_count == 2  # the file, then its folder
+
+    def test_batched_syncs_deferred_until_batch_fills(self, tmp_path):
+        sink = OutputSink(tmp_path, fsync_every=3)
+        with patch("output_sink._fsync_path") as fsync_path, patch("output_sink.os.fsync") as fsync:
+            sink.write_bytes("a.pdf", b"x")
+            sink.write_bytes("b.pdf", b"x")
+            assert fsync_path.call_count == 0
+            sink.write_bytes("c.pdf", b"x")
+            assert fsync_path.call_count == 4  # three files and one folder
+        fsync.assert_not_called()
+
+    def test_close_flushes_partial_batch(self, tmp_path):
+        with patch("output_sink._fsync_path") as fsync_path:
+            with OutputSink(tmp_path, fsync_every=10) as sink:
+                sink.write_bytes("a.pdf", b"x")
+            assert fsync_path.call_count == 2
+
+    def test_zero_never_syncs(self, tmp_path):
+        with patch("output_sink._fsync_path") as fsync_path, patch("output_sink.os.fsync") as fsync:
+            with OutputSink(tmp_path, fsync_every=0) as sink:
+                sink.write_bytes("a.pdf", b"x")
+        fsync_path.assert_not_called()
+        fsync.assert_not_called()
+
+    def test_files_are_opened_for_writing_and_their_sync_errors_raised(self, tmp_path):
+        sink = OutputSink(tmp_path, fsync_every=2)
+        path = sink.write_bytes("a.pdf", b"x")
+        opened = []
+        real_open = os.open
+
+        def recording_open(name, flags, *args):
+            opened.append((Path(name), flags))
+            return real_open(name, flags, *args)
+
+        with patch("output_sink.os.open", side_effect=recording_open), \
+             patch("output_sink.os.fsync", side_effect=OSError(5, "I/O error")):
+            with pytest.raises(OSError):
+                sink.flush()
+        assert opened[0][0] == path and opened[0][1] & os.O_RDWR
+
+    def test_folder_sync_errors_are_ignored(self, tmp_path):
+        with patch("output_sink.os.fsync", side_effect=OSError(22, "Invalid argument")):
+            output_sink._fsync_path(tmp_path)
+
+
+def test_as_sink_wraps_folders_and_passes_sinks_through(tmp_path):
+    sink = OutputSink(tmp_path, collision="skip")
+    assert output_sink.as_sink(sink) is sink
+    assert output_sink.as_sink(tmp_path).directory == tmp_path
+    assert output_sink.as_sink(None).directory == output_sink.default_output_dir()
+
+
+@pytest.mark.skipif(os.name != "posix", reason="POSIX permission bits")
+@pytest.mark.parametrize("collision", ["overwrite", "suffix"])
+def test_written_files_follow_the_umask_not_private_temp_permissions(tmp_path, collision):
+    old_umask = os.umask(0o022)
+    try:
+        path = OutputSink(tmp_path, collision=collision).write_bytes("a.pdf", b"x")
+    finally:
+        os.umask(old_umask)
+    assert path.stat().st_mode & 0o777 == 0o644
@@ -0,0 +1,106 @@
+"""Tests for whole-manifest pre-flight validation and the validate command."""
+import json
+from unittest.mock import patch
+
+from click.testing import CliRunner
+
+import submittal_cli
+from preflight import filename_problems, validate_manifest
+from submittal_cli import cli, normalize_review_date
+
+
+ROW = {
+    "Project_Title": "3238, Westside Research Park",
+    "Submittal_Number": "001",
+    "Revision_Number": "0",
+    "Specification_Section": "07 31 13",
+    "Submittal_Name": "Shingle Sample",
+    "Date_Review_Ends": "03/15/2025",
+    "reviewer_list": "Alice;Bob",
+}
+
+
+def write_ndjson(path, rows):
+    path.write_text("".join(json.dumps(row) + "\n" for row in rows))
+    return path
+
+
+def rows(count, **overrides):
+    return [{**ROW, "Submittal_Number": f"{i:03d}", **overrides} for i in range(1, count + 1)]
+
+
+def test_clean_manifest_has_no_problems(tmp_path):
+    report = validate_manifest(write_ndjson(tmp_path / "m.ndjson", rows(3)))
+    assert report.ok
+    assert report.rows == 3
+    assert report.format() == "3 rows checked, no problems found."
+
+
+def test_problems_are_collected_across_the_whole_manifest(tmp_path):
+    manifest = rows(6)
+    manifest[1]["Submittal_Name"] = ""
+    manifest[2]["Date_Review_Ends"] = "someday"
+    manifest[3]["reviewer_list"] = "R" * 541
+    manifest[4]["Revision_Number"] = ""  # defaults to 0, so not missing
+    manifest[5]["Submittal_Number"] = "001"
+
+    report = validate_manifest(write_ndjson(tmp_path / "m.ndjson", manifest))
+
+    assert report.to_dict()["problems"] == [
+        {"field": "Date_Review_Ends", "message": "cannot parse date 'someday'", "rows": [3]},
+        {"field": "Reviewer_Names", "message": "longer than 540 characters", "rows": [4]},
+        {"field": "Submittal_Name", "message": "required field is empty", "rows": [2]},
+        {"field": "filename", "message": "same output file as row 1", "rows": [6]},
+    ]
+    assert report.failed_rows == 4
+
+
+def test_report_consolidates_repeated_problems(tmp_path):
+    report = validate_manifest(write_ndjson(tmp_path / "m.ndjson", rows(15, Submittal_Name="")))
+    text = report.format(max_rows=4)
+    assert "Submittal_Name: required field is empty (rows 1-4 and 11 more)" in text
+    assert "filename" not in text  # rows with missing fields are not checked twice
+
+
+def test_filename_problems():
+    assert filename_problems("3238_-_001_R0_-_Shingles.pdf") == []
+    assert filename_problems("CON.pdf") == ["filename is a reserved Windows device name"]
+    assert filename_problems("x" * 300 + ".pdf") == ["filename is longer than 255 characters"]
+    assert filename_problems("name..pdf") == ["filename ends with a dot or space before .pdf"]
+
+
+def test_dates_are_parsed_once_per_distinct_value(tmp_path):
+    normalize_review_date.cache_clear()
+    with patch.object(submittal_cli.dateutil_parser, "parse", wraps=submittal_cli.dateutil_parser.parse) as parse:
+        validate_manifest(write_ndjson(tmp_path / "m.ndjson", rows(50, Date_Review_Ends="March 15 2025")))
+    assert parse.call_count == 1
+
+
+def test_common_formats_skip_dateutil():
+    normalize_review_date.cache_clear()
+    with patch.object(submittal_cli.dateutil_parser, "parse") as parse:
+        assert normalize_review_date("3/5/2025") == "03/05/2025"
+        assert normalize_review_date("2025-03-05") == "03/05/2025"
+    parse.assert_not_called()
+    assert normalize_review_date("15/03/2025") == "03/15/2025"  # not a month first; dateutil swaps it
+    assert normalize_review_date("02/30/2025") is None
+
+
+def test_validate_command_exit_status_and_json(tmp_path):
+    runner = CliRunner()
+    good = write_ndjson(tmp_path / "good.ndjson", rows(2))
+    bad = write_ndjson(tmp_path / "bad.ndjson", rows(2, Specification_Section=""))
+
+    assert runner.invoke(cli, ["validate", str(good)]).exit_code == 0
+    result = runner.invoke(cli, ["validate", str(bad), "--json"])
+    assert result.exit_code == 1
+    assert json.loads(result.output)["failed_rows"] == 2
+
+
+def test_validate_command_reports_a_json_array_manifest(tmp_path):
+    manifest = tmp_path / "m.json"
+    manifest.write_text(json.dumps(rows(2)))
+    result = CliRunner().invoke(cli, ["validate", str(manifest)])
+    assert result.exit_code == 1
+    assert "holds a JSON array" in result.output
+    assert result.exception is None or isinstance(result.exception, SystemExit)
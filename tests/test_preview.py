@@ -0,0 +1,48 @@
+"""Tests for the text-mode page preview."""
+from rich.console import Console
+
+from custom_fill import plan_pages
+from preview import SLOT_WIDTHS, render_preview, slot_warnings, template_slots
+from submittal_cli import XmtlBuild
+
+
+def make_dictionary(**overrides):
+    fields = dict(project_number="3238", project_title="Westside Research Park", submittal_number="001",
+                  revision_number="0", specification_section="07 31 13", submittal_name="Shingle Sample",
+                  date_review_ends="01/15/2026")
+    return XmtlBuild(**{**fields, **overrides}).to_render_dict()
+
+
+def as_text(renderables):
+    console = Console(record=True, width=120)
+    console.print(*renderables)
+    return console.export_text()
+
+
+def test_template_slots_follow_template_order():
+    assert template_slots("Page1.HTML")[:3] == ["Project_Title", "Submittal_Number", "Revision_Number"]
+    assert "asset_url" not in template_slots("Page1.HTML")
+    assert template_slots("Page3.HTML") == [f"Reviewer_Name_{n}" for n in range(1, 5)]
+
+
+def test_preview_has_one_panel_per_planned_page():
+    dictionary = make_dictionary(edp_line1="EDP Inc.", reviewer_names="A;B;C;D;E")
+    text = as_text(render_preview(dictionary))
+
+    assert len(render_preview(dictionary)) == len(plan_pages(dictionary)) == 3
+    assert "Page 1: Cover" in text and "Page 2: EDP and reviewers" in text and "Page 3: Additional reviewers" in text
+    assert "output_page3_1.html" in text
+
+
+def test_blank_slots_are_shown_as_lines():
+    text = as_text(render_preview(make_dictionary()))
+    assert "Project_Manager" in text
+    assert "________________" in text
+
+
+def test_values_over_their_line_budget_are_flagged():
+    title = "T" * (SLOT_WIDTHS["Project_Title"] + 1)
+    text = as_text(render_preview(make_dictionary(project_title=title)))
+
+    assert "Project_Title is" in text and "will wrap" in text
+    assert slot_warnings({"Project_Title": "short", "Submittal_Number": "N" * 500}) == []
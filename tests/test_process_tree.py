@@ -0,0 +1,150 @@
+"""Tests for process_tree using a fake browser that leaves helper processes behind.
+
+The fake browser is a shell script that, like Edge, starts helpers which
+outlive it (one a direct child, one double-forked away from it). Every
+process it starts carries a marker in its environment, so leaks are found
+by scanning /proc.
+"""
+import os
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+
+import pytest
+
+import html_to_pdf
+import process_tree
+
+pytestmark = pytest.mark.skipif(sys.platform.startswith("win") or not Path("/proc/self/environ").exists(),
+                                reason="needs /bin/sh and /proc")
+
+FAKE_BROWSER = """\
+#!/bin/sh
+for arg in "$@"; do
+  case "$arg" in --print-to-pdf=*) out="${arg#--print-to-pdf=}" ;; esac
+done
+sleep 300 &
+( sleep 300 & )
+if [ -n "$FAKE_BROWSER_HANG" ]; then sleep 300; fi
+if [ -n "$FAKE_BROWSER_FAIL" ]; then exit 3; fi
+printf '%%PDF-1.4\\n' > "$out"
+"""
+
+# Leak check over many jobs; raise with XMTL_LEAK_JOBS for a longer soak
+LEAK_JOBS = int(os.environ.get("XMTL_LEAK_JOBS", "1000"))
+
+
+@pytest.fixture
+def marker(monkeypatch):
+    """Environment entry inherited by every process the fake browser starts."""
+    run_id = uuid.uuid4().hex
+    monkeypatch.setenv("FAKE_BROWSER_RUN", run_id)
+    return f"FAKE_BROWSER_RUN={run_id}".encode()
+
+
+@pytest.fixture
+def fake_browser(tmp_path, marker):
+    browser = tmp_path / "msedge"
+    browser.write_text(FAKE_BROWSER)
+    browser.chmod(0o755)
+    return browser
+
+
+def live_processes(marker):
+    """PIDs of running (non-zombie) processes whose environment contains marker."""
+    pids = []
+    for environ in Path("/proc").glob("[0-9]*/environ"):
+        try:
+            if marker in environ.read_bytes():
+                pids.append(int(environ.parent.name))
+        except OSError:
+            continue
+    return [pid for pid in pids if pid != os.getpid()]
+
+
+def assert_no_leaks(marker):
+    # killed processes can take a moment to disappear from /proc
+    deadline = time.monotonic() + 5
+    while (leaked := live_processes(marker)) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert leaked == []
+
+
+def convert(browser, tmp_path, n=0):
+    html = tmp_path / "page.html"
+    html.write_text("<html></html>")
+    return html_to_pdf.convert_html(str(html), str(tmp_path / f"page{n}.pdf"), browser)
+
+
+def test_helpers_are_killed_after_success(fake_browser, marker, tmp_path):
+    assert convert(fake_browser, tmp_path).read_bytes().startswith(b"%PDF")
+    assert_no_leaks(marker)
+
+
+def test_whole_tree_is_killed_on_timeout(fake_browser, marker, tmp_path, monkeypatch):
+    monkeypatch.setenv("FAKE_BROWSER_HANG", "1")
+    started = time.monotonic()
+    with pytest.raises(subprocess.TimeoutExpired):
+        process_tree.run_process_tree([str(fake_browser), "--print-to-pdf=/dev/null"], timeout=0.3)
+    assert time.monotonic() - started < 5
+    assert_no_leaks(marker)
+    assert process_tree.live_process_trees() == 0
+
+
+def test_failed_browser_is_reported_and_cleaned_up(fake_browser, marker, tmp_path, monkeypatch):
+    monkeypatch.setenv("FAKE_BROWSER_FAIL", "1")
+    with pytest.raises(RuntimeError, match="conversion failed"):
+        convert(fake_browser, tmp_path)
+    assert_no_leaks(marker)
+
+
+def test_kill_from_another_thread_cancels_running_conversion(fake_browser, marker, tmp_path, monkeypatch):
+    monkeypatch.setenv("FAKE_BROWSER_HANG", "1")
+    errors = []
+
+    def run():
+        try:
+            process_tree.run_process_tree([str(fake_browser), "--print-to-pdf=/dev/null"], timeout=60)
+        except subprocess.CalledProcessError as exc:
+            errors.append(exc)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    while not process_tree.live_process_trees():
+        time.sleep(0.01)
+    process_tree.kill_process_trees()
+    thread.join(timeout=5)
+
+    assert not thread.is_alive()
+    assert errors and errors[0].returncode == -9
+    assert_no_leaks(marker)
+
+
+def test_interrupted_concurrent_conversion_kills_in_flight_trees(fake_browser, marker, tmp_path, monkeypatch):
+    from concurrency import AdaptiveConcurrency, map_concurrent
+
+    monkeypatch.setenv("FAKE_BROWSER_HANG", "1")
+
+    def job(n):
+        if n == 0:
+            while process_tree.live_process_trees() < 2:
+                time.sleep(0.01)
+            raise KeyboardInterrupt
+        process_tree.run_process_tree([str(fake_browser), "--print-to-pdf=/dev/null"], timeout=60)
+
+    started = time.monotonic()
+    with pytest.raises(KeyboardInterrupt):
+        map_concurrent(job, range(3), AdaptiveConcurrency(min_limit=3, max_limit=3),
+                       on_interrupt=process_tree.kill_process_trees)
+    assert time.monotonic() - started < 10
+    assert_no_leaks(marker)
+
+
+def test_no_processes_leak_across_many_jobs(fake_browser, marker, tmp_path):
+    for n in range(LEAK_JOBS):
+        convert(fake_browser, tmp_path, n % 4)
+    assert_no_leaks(marker)
+    assert process_tree.live_process_trees() == 0
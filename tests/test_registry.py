@@ -0,0 +1,178 @@
+"""Tests for the generated-transmittal registry and its use in generate_transmittal().
+
+Rendering and conversion are patched out; create_final_pdf is replaced with a
+stub that writes a placeholder PDF.
+"""
+from unittest.mock import patch
+
+import pytest
+import submittal_cli
+from registry import TransmittalRegistry
+from submittal_cli import XmtlBuild
+
+
+@pytest.fixture
+def registry(tmp_path):
+    registry = TransmittalRegistry(tmp_path / "registry.sqlite3")
+    yield registry
+    registry.close()
+
+
+def make_build(**overrides):
+    fields = dict(project_number="3238", project_title="Westside Research Park", submittal_number="001",
+                  revision_number="0", specification_section="07 31 13", submittal_name="Shingle Sample")
+    return XmtlBuild(**{**fields, **overrides})
+
+
+def stub_pdf(tmp_path, name="final.pdf"):
+    path = tmp_path / name
+    path.write_bytes(b"%PDF-stub")
+    return path
+
+
+# ---------------------------------------------------------------------------
+# TransmittalRegistry
+# ---------------------------------------------------------------------------
+
+def test_lookup_finds_identical_inputs(registry, tmp_path):
+    registry.record(make_build(), stub_pdf(tmp_path))
+    assert registry.lookup(make_build()) == (tmp_path / "final.pdf").resolve()
+
+
+def test_lookup_misses_when_inputs_differ(registry, tmp_path):
+    registry.record(make_build(), stub_pdf(tmp_path))
+    assert registry.lookup(make_build(submittal_name="Other")) is None
+
+
+def test_lookup_skips_deleted_outputs(registry, tmp_path):
+    output = stub_pdf(tmp_path)
+    registry.record(make_build(), output)
+    output.unlink()
+    assert registry.lookup(make_build()) is None
+
+
+def test_defaulted_review_date_only_matches_the_same_day(registry, tmp_path):
+    registry.record(make_build(), stub_pdf(tmp_path))
+    assert registry.lookup(make_build()) is not None
+    with patch("submittal_cli._default_review_date", return_value="01/01/2099"):
+        assert registry.lookup(make_build()) is None
+
+    dated = make_build(date_review_ends="2030-03-15")
+    registry.record(dated, stub_pdf(tmp_path, "dated.pdf"))
+    with patch("submittal_cli._default_review_date", return_value="01/01/2099"):
+        assert registry.lookup(make_build(date_review_ends="03/15/2030")) == (tmp_path / "dated.pdf").resolve()
+
+
+def test_lookups_are_counted_as_hits_and_misses(registry, tmp_path):
+    from registry import LOOKUPS
+
+    hits, misses = LOOKUPS.value(result="hit"), LOOKUPS.value(result="miss")
+    registry.lookup(make_build())
+    registry.record(make_build(), stub_pdf(tmp_path))
+    registry.lookup(make_build())
+
+    assert LOOKUPS.value(result="hit") == hits + 1
+    assert LOOKUPS.value(result="miss") == misses + 1
+
+
+def test_history_filters_by_submittal_identity(registry, tmp_path):
+    registry.record(make_build(), stub_pdf(tmp_path, "a.pdf"))
+    registry.record(make_build(submittal_number="002"), stub_pdf(tmp_path, "b.pdf"))
+    registry.record(make_build(project_number="4000"), stub_pdf(tmp_path, "c.pdf"))
+
+    assert len(registry.history()) == 3
+    assert [e.submittal_number for e in registry.history(project_number="3238")] == ["002", "001"]
+    (entry,) = registry.history(project_number="3238", submittal_number="002", revision="0")
+    assert entry.output_path.endswith("b.pdf")
+
+
+def test_recording_same_output_twice_keeps_one_entry(registry, tmp_path):
+    output = stub_pdf(tmp_path)
+    registry.record(make_build(), output)
+    registry.record(make_build(), output)
+    assert len(registry.history()) == 1
+
+
+def test_registry_can_be_shared_by_threads(registry, tmp_path):
+    import threading
+
+    errors = []
+
+    def work(n):
+        try:
+            for i in range(50):
+                build = make_build(submittal_number=f"{n}-{i}")
+                registry.record(build, stub_pdf(tmp_path, f"{n}-{i}.pdf"))
+                assert registry.lookup(build) is not None
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=work, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(registry.history(limit=1000)) == 400
+
+
+# ---------------------------------------------------------------------------
+# generate_transmittal with a registry
+# ---------------------------------------------------------------------------
+
+def test_identical_request_is_served_from_registry(registry, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with patch("custom_fill.render_output", return_value=[]) as mock_render, \
+         patch("html_to_pdf.create_final_pdf", side_effect=lambda name, *a, **k: stub_pdf(tmp_path, name)):
+        first = submittal_cli.generate_transmittal(make_build(), output_dir=tmp_path, registry=registry)
+        second = submittal_cli.generate_transmittal(make_build(), output_dir=tmp_path, registry=registry)
+
+    assert mock_render.call_count == 1
+    assert second == first.resolve()
+
+
+def test_identical_request_for_other_location_is_copied(registry, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    other_dir = tmp_path / "other"
+    other_dir.mkdir()
+    with patch("custom_fill.render_output", return_value=[]) as mock_render, \
+         patch("html_to_pdf.create_final_pdf", side_effect=lambda name, *a, **k: stub_pdf(tmp_path, name)):
+        submittal_cli.generate_transmittal(make_build(), output_dir=tmp_path, registry=registry)
+        copied = submittal_cli.generate_transmittal(make_build(), output_dir=other_dir, registry=registry,
+                                                    final_pdf_name="copy.pdf")
+
+    assert mock_render.call_count == 1
+    assert copied == other_dir / "copy.pdf"
+    assert copied.read_bytes() == b"%PDF-stub"
+    assert len(registry.history()) == 2
+
+
+def test_changed_request_is_regenerated_and_recorded(registry, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with patch("custom_fill.render_output", return_value=[]) as mock_render, \
+         patch("html_to_pdf.create_final_pdf", side_effect=lambda name, *a, **k: stub_pdf(tmp_path, name)):
+        submittal_cli.generate_transmittal(make_build(), output_dir=tmp_path, registry=registry)
+        submittal_cli.generate_transmittal(make_build(revision_number="1"), output_dir=tmp_path, registry=registry)
+
+    assert mock_render.call_count == 2
+    assert {e.revision for e in registry.history()} == {"0", "1"}
+
+
+def test_pdf_options_are_part_of_the_key(registry, tmp_path, monkeypatch):
+    from pdf_options import PdfOptions
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("SOURCE_DATE_EPOCH", raising=False)
+    with patch("custom_fill.render_output", return_value=[]) as mock_render, \
+         patch("html_to_pdf.create_final_pdf", side_effect=lambda name, *a, **k: stub_pdf(tmp_path, name)):
+        for options in (None, PdfOptions(linearize=True), PdfOptions(deterministic=True), PdfOptions(image_dpi=150),
+                        PdfOptions(linearize=True), PdfOptions()):
+            submittal_cli.generate_transmittal(make_build(), output_dir=tmp_path, registry=registry,
+                                               pdf_options=options)
+        assert mock_render.call_count == 4  # the repeated linearize and default requests are hits
+
+        monkeypatch.setenv("SOURCE_DATE_EPOCH", "1700000000")
+        submittal_cli.generate_transmittal(make_build(), output_dir=tmp_path, registry=registry,
+                                           pdf_options=PdfOptions(deterministic=True))
+    assert mock_render.call_count == 5
@@ -0,0 +1,80 @@
+"""Tests for render_bundle write/read/claim helpers."""
+import json
+
+import pytest
+import render_bundle
+
+
+PAGES = [
+    ("output_page1.html", "Page1.HTML", "<html>1</html>"),
+    ("output_page3_1.html", "Page3.HTML", "<html>3</html>"),
+]
+
+
+def test_write_then_read_round_trips(tmp_path):
+    render_bundle.write_bundle(tmp_path, "3238_-_001_R0_-_Sample.pdf", PAGES)
+    bundle = tmp_path / "3238_-_001_R0_-_Sample.xmtl"
+
+    final_pdf_name, html_files = render_bundle.read_bundle(bundle)
+
+    assert final_pdf_name == "3238_-_001_R0_-_Sample.pdf"
+    assert [f.rsplit("/", 1)[-1] for f in html_files] == ["output_page1.html", "output_page3_1.html"]
+
+
+def test_no_partial_plan_left_behind(tmp_path):
+    render_bundle.write_bundle(tmp_path, "final.pdf", PAGES)
+    assert not list(tmp_path.glob("**/*.partial"))
+    assert [path.name for path in tmp_path.iterdir()] == ["final.xmtl"]
+
+
+def test_existing_bundle_is_not_written_over(tmp_path):
+    render_bundle.write_bundle(tmp_path, "final.pdf", PAGES)
+    with pytest.raises(FileExistsError):
+        render_bundle.write_bundle(tmp_path, "final.pdf", [("output_page1.html", "Page1.HTML", "<html>new</html>")])
+
+    assert (tmp_path / "final.xmtl" / "output_page1.html").read_text() == "<html>1</html>"
+    assert [path.name for path in tmp_path.iterdir()] == ["final.xmtl"]
+
+
+def test_read_rejects_unreadable_plan(tmp_path):
+    render_bundle.write_bundle(tmp_path, "final.pdf", PAGES)
+    (tmp_path / "final.xmtl" / "plan.json").write_text('{"version": 1, "pages": [')
+
+    with pytest.raises(RuntimeError, match="unreadable"):
+        render_bundle.read_bundle(tmp_path / "final.xmtl")
+
+
+def test_read_rejects_unknown_version(tmp_path):
+    render_bundle.write_bundle(tmp_path, "final.pdf", PAGES)
+    plan_path = tmp_path / "final.xmtl" / "plan.json"
+    plan = json.loads(plan_path.read_text())
+    plan["version"] = 99
+    plan_path.write_text(json.dumps(plan))
+
+    with pytest.raises(RuntimeError, match="unsupported version"):
+        render_bundle.read_bundle(tmp_path / "final.xmtl")
+
+
+def test_read_rejects_missing_page(tmp_path):
+    render_bundle.write_bundle(tmp_path, "final.pdf", PAGES)
+    (tmp_path / "final.xmtl" / "output_page3_1.html").unlink()
+
+    with pytest.raises(RuntimeError, match="missing pages"):
+        render_bundle.read_bundle(tmp_path / "final.xmtl")
+
+
+def test_claim_is_exclusive(tmp_path):
+    render_bundle.write_bundle(tmp_path, "final.pdf", PAGES)
+    bundle = tmp_path / "final.xmtl"
+
+    claimed = render_bundle.claim_bundle(bundle)
+
+    assert claimed is not None and claimed.exists()
+    assert render_bundle.claim_bundle(bundle) is None
+    assert render_bundle.pending_bundles(tmp_path) == []
+
+
+def test_pending_ignores_bundles_without_plan(tmp_path):
+    (tmp_path / "incomplete.xmtl").mkdir()
+    render_bundle.write_bundle(tmp_path, "final.pdf", PAGES)
+    assert render_bundle.pending_bundles(tmp_path) == [tmp_path / "final.xmtl"]
@@ -0,0 +1,169 @@
+"""Tests for the conversion timeout, retry and circuit-breaker policy."""
+import pytest
+
+from resilience import (CircuitBreaker, CircuitOpenError, ConversionTimeout, LatencyTracker, ResilientConverter,
+                        RetryPolicy, TransientConversionError)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def converter(**kwargs):
+    sleeps = []
+    guard = ResilientConverter(sleep=sleeps.append, **kwargs)
+    guard.sleeps = sleeps
+    return guard
+
+
+def flaky(failures, error=TransientConversionError):
+    """A conversion function that fails `failures` times, then returns the timeout it was given."""
+    calls = []
+
+    def convert(*args, timeout):
+        calls.append(timeout)
+        if len(calls) <= failures:
+            raise error("flaky")
+        return timeout
+    convert.calls = calls
+    return convert
+
+
+# ---------------------------------------------------------------------------
+# LatencyTracker
+# ---------------------------------------------------------------------------
+
+class TestLatencyTracker:
+    def test_initial_timeout_until_enough_samples(self):
+        tracker = LatencyTracker(initial=30, min_samples=3)
+        tracker.record(1.0)
+        assert tracker.timeout() == 30
+
+    def test_timeout_is_multiple_of_p99(self):
+        tracker = LatencyTracker(multiplier=3, floor=0, min_samples=1)
+        for seconds in [1.0] * 99 + [4.0]:
+            tracker.record(seconds)
+        assert tracker.percentile(50) == 1.0
+        assert tracker.percentile(99) == 1.0
+        assert tracker.percentile(100) == 4.0
+        assert tracker.timeout() == 3.0
+
+    def test_timeout_clamped(self):
+        fast = LatencyTracker(floor=5, min_samples=1)
+        fast.record(0.1)
+        slow = LatencyTracker(ceiling=60, min_samples=1)
+        slow.record(100)
+        assert (fast.timeout(), slow.timeout()) == (5, 60)
+
+
+# ---------------------------------------------------------------------------
+# Retries
+# ---------------------------------------------------------------------------
+
+class TestRetries:
+    def test_transient_failure_is_retried(self):
+        guard = converter()
+        convert = flaky(2)
+        guard.call(convert, "page.html")
+        assert len(convert.calls) == 3
+        assert guard.metrics.counts["retries"] == 2
+        assert guard.metrics.counts["succeeded"] == 1
+
+    def test_timeout_grows_on_each_retry(self):
+        guard = converter(latency=LatencyTracker(initial=10, ceiling=25))
+        convert = flaky(2, ConversionTimeout)
+        guard.call(convert)
+        assert convert.calls == [10, 20, 25]
+        assert guard.metrics.counts["timeouts"] == 2
+
+    def test_gives_up_after_bounded_attempts(self):
+        guard = converter(retry=RetryPolicy(attempts=3))
+        convert = flaky(10)
+        with pytest.raises(TransientConversionError):
+            guard.call(convert)
+        assert len(convert.calls) == 3
+        assert guard.metrics.counts["failed"] == 1
+
+    def test_permanent_error_is_not_retried(self):
+        guard = converter()
+        convert = flaky(1, RuntimeError)
+        with pytest.raises(RuntimeError):
+            guard.call(convert)
+        assert len(convert.calls) == 1
+
+    def test_backoff_is_jittered_within_exponential_bound(self):
+        policy = RetryPolicy(base_delay=1, max_delay=3)
+
+        class Rng:
+            def uniform(self, low, high):
+                return high
+
+        assert [policy.delay(n, Rng()) for n in range(4)] == [1, 2, 3, 3]
+        assert 0 <= policy.delay(1) <= 2
+
+
+# ---------------------------------------------------------------------------
+# CircuitBreaker
+# ---------------------------------------------------------------------------
+
+class TestCircuitBreaker:
+    def test_opens_after_consecutive_failures_and_fails_fast(self):
+        guard = converter(breaker=CircuitBreaker(failure_threshold=2), retry=RetryPolicy(attempts=5))
+        convert = flaky(100)
+        with pytest.raises(TransientConversionError):
+            guard.call(convert)
+        assert len(convert.calls) == 2  # stopped retrying once the circuit opened
+
+        with pytest.raises(CircuitOpenError):
+            guard.call(convert)
+        assert len(convert.calls) == 2
+        assert guard.metrics.counts["short_circuited"] == 1
+        assert guard.metrics.counts["circuit_opened"] == 1
+
+    def test_half_open_trial_closes_on_success(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, reset_after=30, clock=clock)
+        breaker.record_failure()
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+
+        clock.now = 30
+        breaker.before_call()
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()  # only one trial at a time
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+        breaker.before_call()
+
+    def test_failed_trial_reopens(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=3, reset_after=30, clock=clock)
+        for _ in range(3):
+            breaker.record_failure()
+        clock.now = 31
+        breaker.before_call()
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+
+    def test_success_resets_failure_count(self):
+        breaker = CircuitBreaker(failure_threshold=2)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_snapshot_reports_policy_state():
+    guard = converter()
+    guard.call(flaky(0))
+    snapshot = guard.snapshot()
+    assert snapshot["succeeded"] == 1
+    assert snapshot["timeout_seconds"] == 30
+    assert snapshot["circuit_state"] == "closed"
+    assert "1 ok" in guard.summary()
@@ -0,0 +1,205 @@
+"""Tests for template_store: saving templates through a locked overlay journal."""
+import os
+import time
+from unittest.mock import patch
+
+import pytest
+import yaml
+from click.testing import CliRunner
+
+import submittal_cli
+import template_store
+from submittal_cli import XmtlBuild
+from template_store import (TemplateLockError, compact, load_templates, overlay_path, save_template,
+                            template_lock)
+
+HEADER = """#Add new xmtl templates below with a unique key (e.g. project number)
+# KEEP THIS TEMPLATE AT TOP AS A REFERENCE FOR ADDING NEW TEMPLATES.
+"KEY":
+  Project_Title: ""
+
+"3238":
+  Project_Title: "3238, Westside Research Park"
+  Submittal_Number: "001"
+
+# hand-written note about 4000
+"4000":
+  Project_Title: "4000, Library"
+"""
+
+
+@pytest.fixture
+def templates(tmp_path):
+    path = tmp_path / "xmtl_templates.yaml"
+    path.write_text(HEADER)
+    return path
+
+
+def test_save_appends_to_the_overlay_without_touching_the_yaml(templates):
+    before = templates.read_bytes()
+    assert save_template(templates, "5000", {"Project_Title": "5000, Gym"}) is False
+
+    assert templates.read_bytes() == before
+    assert load_templates(templates)["5000"] == {"Project_Title": "5000, Gym"}
+    assert load_templates(templates)["3238"]["Submittal_Number"] == "001"
+    assert not templates.with_name(templates.name + ".lock").exists()
+
+
+def test_later_saves_win_and_override_the_yaml(templates):
+    save_template(templates, "3238", {"Project_Title": "3238, Renamed"})
+    save_template(templates, "3238", {"Project_Title": "3238, Renamed again"})
+    assert load_templates(templates)["3238"] == {"Project_Title": "3238, Renamed again"}
+
+
+def test_compaction_keeps_comments_and_other_entries(templates):
+    save_template(templates, "3238", {"Project_Title": "3238, Renamed"})
+    save_template(templates, "5000", {"Project_Title": "5000, Gym"}, compact_after=2)
+
+    text = templates.read_text()
+    assert text.startswith("#Add new xmtl templates")
+    assert '# hand-written note about 4000\n"4000":' in text
+    assert text.endswith('"5000":\n  Project_Title: "5000, Gym"\n')
+    assert overlay_path(templates).read_bytes() == b""
+    assert yaml.safe_load(text)["3238"] == {"Project_Title": "3238, Renamed"}
+    assert set(load_templates(templates)) == {"KEY", "3238", "4000", "5000"}
+
+
+def test_compaction_falls_back_to_a_full_dump_when_the_edit_would_be_wrong(templates):
+    templates.write_text('"A": {Project_Title: "1, One"}\n"A": {Project_Title: "2, Two"}\n')
+    save_template(templates, "A", {"Project_Title": "3, Three"})
+    assert compact(templates) == 1
+    assert yaml.safe_load(templates.read_text()) == {"A": {"Project_Title": "3, Three"}}
+
+
+@pytest.mark.skipif(os.name != "posix", reason="POSIX permission bits")
+def test_compaction_keeps_the_files_permissions(templates):
+    templates.chmod(0o664)
+    save_template(templates, "5000", {"Project_Title": "5000, Gym"}, compact_after=1)
+    assert "5000" in yaml.safe_load(templates.read_text())
+    assert templates.stat().st_mode & 0o777 == 0o664
+
+
+def test_torn_overlay_line_is_ignored_and_the_next_save_starts_clean(templates):
+    save_template(templates, "5000", {"Project_Title": "5000, Gym"})
+    with open(overlay_path(templates), "ab") as f:
+        f.write(b'{"key": "6000", "templ')
+    assert "6000" not in load_templates(templates)
+
+    save_template(templates, "7000", {"Project_Title": "7000, Pool"})
+    assert {"5000", "7000"} <= set(load_templates(templates))
+
+
+def test_save_creates_a_missing_templates_file(tmp_path):
+    path = tmp_path / "new.yaml"
+    assert save_template(path, "1", {"Project_Title": "1, First"}) is True
+    assert yaml.safe_load(path.read_text()) == {"1": {"Project_Title": "1, First"}}
+
+
+def test_blank_and_reserved_keys_are_refused(templates):
+    with pytest.raises(ValueError):
+        save_template(templates, "  ", {})
+    with pytest.raises(ValueError, match="reference entry"):
+        save_template(templates, "KEY", {})
+
+
+def test_a_held_lock_times_out_and_a_stale_one_is_broken(templates):
+    lock = templates.with_name(templates.name + ".lock")
+    with template_lock(templates):
+        with pytest.raises(TemplateLockError, match="pid"):
+            with template_lock(templates, timeout=0.1):
+                pass
+
+    lock.write_text("crashed-host pid 1\n")
+    old = time.time() - template_store.STALE_LOCK_SECONDS - 10
+    os.utime(lock, (old, old))
+    save_template(templates, "5000", {"Project_Title": "5000, Gym"})
+    assert not lock.exists()
+
+
+def test_a_stale_lock_replaced_by_a_live_one_is_not_broken(templates):
+    lock = templates.with_name(templates.name + ".lock")
+    lock.write_text("crashed-host pid 1\n")
+    old = time.time() - template_store.STALE_LOCK_SECONDS - 10
+    os.utime(lock, (old, old))
+    seen_stale = lock.stat()
+
+    # another waiter breaks the stale lock and takes the lock before this one acts on what it saw
+    template_store._break_stale_lock(lock, seen_stale)
+    with template_lock(templates):
+        template_store._break_stale_lock(lock, seen_stale)
+        assert lock.exists()
+        with pytest.raises(TemplateLockError):
+            with template_lock(templates, timeout=0.1):
+                pass
+    assert not lock.exists()
+    assert [path.name for path in templates.parent.iterdir()] == [templates.name]
+
+
+def test_release_leaves_a_lock_taken_over_by_another_writer(templates):
+    lock = templates.with_name(templates.name + ".lock")
+    with template_lock(templates):
+        lock.write_text("other-host pid 2 (0123abcd)\n")  # ours was broken while we were suspended
+    assert lock.read_text() == "other-host pid 2 (0123abcd)\n"
+
+
+def test_a_held_lock_is_kept_fresh_and_never_broken(templates, monkeypatch):
+    monkeypatch.setattr(template_store, "STALE_LOCK_SECONDS", 0.4)
+    with template_lock(templates):
+        with pytest.raises(TemplateLockError):
+            with template_lock(templates, timeout=1.0):
+                pass
+
+
+def test_only_one_waiter_breaks_a_stale_lock_at_a_time(templates):
+    lock = templates.with_name(templates.name + ".lock")
+    lock.write_text("crashed-host pid 1\n")
+    old = time.time() - template_store.STALE_LOCK_SECONDS - 10
+    os.utime(lock, (old, old))
+    breaker = lock.with_name(lock.name + ".break")
+    breaker.write_text("")
+
+    template_store._break_stale_lock(lock, lock.stat())
+    assert lock.exists()
+    breaker.unlink()
+    template_store._break_stale_lock(lock, lock.stat())
+    assert not lock.exists()
+
+
+def test_build_round_trips_through_a_saved_template(templates, full_build):
+    full_build.save_as_template("9999", templates)
+    loaded = XmtlBuild.from_yaml(templates, "9999")
+    expected = full_build.to_dict()
+    expected["date_review_ends"] = ""
+    assert loaded.to_dict() == expected
+
+
+@pytest.mark.parametrize("template_key, offered", [("3238", False), ("", True)])
+def test_interactive_loop_offers_to_save_only_values_typed_by_hand(templates, tmp_path, monkeypatch,
+                                                                   template_key, offered):
+    monkeypatch.setattr(submittal_cli, "_default_templates_path", lambda: templates)
+    prompts = []
+
+    def prompt(text, **kwargs):
+        prompts.append(text)
+        return template_key if len(prompts) == 1 else ""
+
+    with patch("click.prompt", side_effect=prompt), patch("click.confirm", return_value=False), \
+         patch.object(XmtlBuild, "fill_all_fields"), patch("submittal_cli.review_dictionary", return_value=True), \
+         patch("custom_fill.render_output"):
+        submittal_cli.run_interactive(bundle_dir=tmp_path)
+    assert any(text.startswith("Save these values as a template?") for text in prompts) is offered
+
+
+def test_save_template_command(templates):
+    result = CliRunner().invoke(submittal_cli.cli, [
+        "save-template", "5000", "--template", "3238", "--project-title", "Gym", "--reviewers", "A;B",
+        "--templates", str(templates)])
+    assert result.exit_code == 0, result.output
+    assert "Saved template '5000'" in result.output
+    saved = load_templates(templates)["5000"]
+    assert saved["Project_Title"] == "3238, Gym"
+    assert saved["Submittal_Number"] == "001"
+    assert saved["reviewer_list"] == "A;B"
+
+    result = CliRunner().invoke(submittal_cli.cli, ["save-template", "KEY", "--templates", str(templates)])
+    assert result.exit_code == 2
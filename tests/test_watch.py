@@ -0,0 +1,222 @@
+"""Tests for watch mode: change detection, debouncing and incremental regeneration.
+
+generate_transmittal and run_batch are patched so nothing is rendered.
+"""
+import csv
+import textwrap
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+import watch
+
+TEMPLATE = """\
+"3238":
+  Project_Title: "3238, Westside Research Park"
+  Submittal_Number: "{number}"
+  Specification_Section: "07 31 13"
+  Submittal_Name: "Shingle Sample"
+"4001":
+  Project_Title: "4001, Library"
+  Submittal_Number: "001"
+  Specification_Section: "09 00 00"
+  Submittal_Name: "Paint"
+"""
+
+
+@pytest.fixture
+def generated(tmp_path):
+    calls = []
+
+    def fake(build, **kwargs):
+        calls.append(build.project_number.value)
+        return tmp_path / f"{build.project_number.value}.pdf"
+
+    with patch("watch.generate_transmittal", side_effect=fake):
+        yield calls
+
+
+@pytest.fixture
+def batches():
+    calls = []
+    with patch("watch.run_batch", side_effect=lambda path, **kw: calls.append(path.name) or
+               {"done": 1, "skipped": 0, "duplicate": 0, "failed": 0}):
+        yield calls
+
+
+def write_templates(path, number="001"):
+    path.write_text(TEMPLATE.format(number=number))
+
+
+def write_manifest(path, submittal_number="001"):
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["Project_Title", "Submittal_Number"])
+        writer.writeheader()
+        writer.writerow({"Project_Title": "3238, P", "Submittal_Number": submittal_number})
+
+
+class TestTemplateChanges:
+    def test_primed_templates_are_not_generated(self, tmp_path, generated):
+        write_templates(tmp_path / "t.yaml")
+        watcher = watch.Watcher(tmp_path / "t.yaml")
+        watcher.prime()
+        assert watcher.scan() == []
+        assert generated == []
+
+    def test_only_edited_entry_is_regenerated(self, tmp_path, generated):
+        templates = tmp_path / "t.yaml"
+        write_templates(templates)
+        watcher = watch.Watcher(templates)
+        watcher.prime()
+
+        write_templates(templates, number="002")
+        watcher.scan()
+        assert generated == ["3238"]
+
+        watcher.scan()
+        assert generated == ["3238"]
+
+    def test_added_entry_is_generated(self, tmp_path, generated):
+        templates = tmp_path / "t.yaml"
+        write_templates(templates)
+        watcher = watch.Watcher(templates)
+        watcher.prime()
+
+        with open(templates, "a") as f:
+            f.write(textwrap.dedent("""\
+                "5000":
+                  Project_Title: "5000, Gym"
+                  Submittal_Number: "001"
+                  Specification_Section: "01"
+                  Submittal_Name: "Floor"
+            """))
+        watcher.scan()
+        assert generated == ["5000"]
+
+    def test_incomplete_entry_is_reported_once(self, tmp_path, generated, capsys):
+        templates = tmp_path / "t.yaml"
+        templates.write_text('"9": {Project_Title: "9, X"}\n')
+        watcher = watch.Watcher(templates)
+        watcher.scan()
+        watcher.scan()
+        assert generated == []
+        assert capsys.readouterr().out.count("incomplete") == 1
+
+    def test_failed_entry_is_retried(self, tmp_path):
+        templates = tmp_path / "t.yaml"
+        write_templates(templates)
+        watcher = watch.Watcher(templates)
+        with patch("watch.generate_transmittal", side_effect=RuntimeError("Edge crashed")) as failing:
+            watcher.scan()
+        assert failing.call_count == 2
+        with patch("watch.generate_transmittal", return_value=tmp_path / "x.pdf") as working:
+            watcher.scan()
+        assert working.call_count == 2
+
+    def test_half_written_yaml_keeps_previous_state(self, tmp_path, generated):
+        templates = tmp_path / "t.yaml"
+        write_templates(templates)
+        watcher = watch.Watcher(templates)
+        watcher.prime()
+
+        templates.write_text('"3238": {Project_Title: "3238, P"\n')
+        assert watcher.scan() == []
+        write_templates(templates)
+        assert watcher.scan() == []
+
+
+    def test_entries_that_are_not_mappings_are_skipped(self, tmp_path, generated, capsys):
+        templates = tmp_path / "t.yaml"
+        write_templates(templates)
+        with open(templates, "a") as f:
+            f.write('"5000": "just a string"\n')
+        watcher = watch.Watcher(templates)
+        watcher.scan()
+        assert sorted(generated) == ["3238", "4001"]
+        assert "'5000' is not a mapping" in capsys.readouterr().out
+
+        templates.write_text("- a list\n")
+        assert watcher.scan() == []
+
+
+class TestManifests:
+    def test_new_and_changed_manifests_are_run_once(self, tmp_path, batches):
+        write_manifest(tmp_path / "a.csv")
+        (tmp_path / "a.csv.journal.jsonl").write_text("{}\n")
+        (tmp_path / "notes.txt").write_text("ignored")
+        watcher = watch.Watcher(drop_dir=tmp_path)
+
+        watcher.scan()
+        watcher.scan()
+        assert batches == ["a.csv"]
+
+        write_manifest(tmp_path / "a.csv", submittal_number="0002")
+        write_manifest(tmp_path / "b.csv")
+        watcher.scan()
+        assert batches == ["a.csv", "a.csv", "b.csv"]
+
+
+    def test_unreadable_manifest_is_reported_and_retried(self, tmp_path, capsys):
+        (tmp_path / "bad.ndjson").write_text('{"Project_Title": "3238, P", "Submittal_Nu')
+        watcher = watch.Watcher(drop_dir=tmp_path)
+        assert watcher.scan() == []
+        assert "bad.ndjson could not be run" in capsys.readouterr().out
+
+        (tmp_path / "bad.ndjson").write_text('{"Project_Title": "3238, P", "Submittal_Number": "001"}\n')
+        with patch("watch.run_batch", return_value={"done": 1, "skipped": 0, "duplicate": 0, "failed": 0}) as run:
+            watcher.scan()
+        assert run.call_count == 1
+
+    def test_unexpected_manifest_error_does_not_stop_the_watcher(self, tmp_path, capsys):
+        write_manifest(tmp_path / "a.csv")
+        write_manifest(tmp_path / "b.csv")
+        summary = {"done": 1, "skipped": 0, "duplicate": 0, "failed": 0}
+        with patch("watch.run_batch", side_effect=[KeyError("Submittal_Number"), summary]):
+            assert watch.Watcher(drop_dir=tmp_path).scan() == [("b.csv", summary)]
+        assert "a.csv could not be run" in capsys.readouterr().out
+
+
+class TestMonitoring:
+    def test_polling_detects_change(self, tmp_path):
+        templates = tmp_path / "t.yaml"
+        write_templates(templates)
+        monitor = watch.PollingMonitor(templates, interval=0.01)
+        assert monitor.wait(0.05) is False
+        write_templates(templates, number="a-much-longer-submittal-number")
+        assert monitor.wait(0.05) is True
+        assert monitor.wait(0.05) is False
+
+    def test_burst_is_debounced_into_one_scan(self, tmp_path, generated):
+        templates = tmp_path / "t.yaml"
+        write_templates(templates)
+        watcher = watch.Watcher(templates)
+        monitor = watch.PollingMonitor(templates, interval=0.01)
+        stop = threading.Event()
+        scans = []
+        original_scan = watcher.scan
+        watcher.scan = lambda: scans.append(time.monotonic()) or original_scan()
+
+        thread = threading.Thread(target=watch.run_watch, args=(watcher, monitor),
+                                  kwargs={"debounce": 0.15, "stop": stop})
+        thread.start()
+        try:
+            for n in range(5):
+                time.sleep(0.03)
+                write_templates(templates, number="0" * (n + 4))
+            time.sleep(0.5)
+        finally:
+            stop.set()
+            thread.join(timeout=5)
+
+        assert len(scans) == 2  # the initial scan, then one for the whole burst
+        assert generated == ["3238"]
+
+
+def test_is_manifest():
+    assert watch.is_manifest("a.CSV")
+    assert watch.is_manifest("rows.ndjson")
+    assert not watch.is_manifest("a.csv.journal.jsonl")
+    assert not watch.is_manifest(".~lock.a.csv")
+    assert not watch.is_manifest("a.xlsx")
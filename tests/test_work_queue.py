@@ -0,0 +1,167 @@
+"""Tests for the shared SQLite work queue and worker loop.
+
+The multi-process tests fork real worker processes against one queue file
+with a trivial handler, so no rendering or conversion happens.
+"""
+import multiprocessing
+import os
+import time
+
+import pytest
+import work_queue
+from work_queue import WorkQueue
+
+
+def jobs(count):
+    return [(f"hash-{i}", {"n": i}) for i in range(count)]
+
+
+def write_marker(payload, work_dir):
+    """Handler used by worker processes: record which job ran, in which process."""
+    marker = os.path.join(payload["marker_dir"], str(payload["n"]))
+    # O_EXCL makes a job that runs twice fail loudly instead of passing silently
+    fd = os.open(marker, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    os.write(fd, str(os.getpid()).encode())
+    os.close(fd)
+    return marker
+
+
+# ---------------------------------------------------------------------------
+# WorkQueue
+# ---------------------------------------------------------------------------
+
+class TestWorkQueue:
+    def test_enqueue_ignores_duplicate_hashes(self, tmp_path):
+        queue = WorkQueue(tmp_path / "q.db")
+        assert queue.enqueue(jobs(3)) == 3
+        assert queue.enqueue(jobs(4)) == 1
+        assert queue.counts()["pending"] == 4
+
+    def test_leased_job_is_not_handed_out_twice(self, tmp_path):
+        queue = WorkQueue(tmp_path / "q.db")
+        queue.enqueue(jobs(1))
+        assert queue.lease("a") is not None
+        assert queue.lease("b") is None
+
+    def test_expired_lease_is_reclaimed(self, tmp_path):
+        queue = WorkQueue(tmp_path / "q.db", lease_seconds=0.05)
+        queue.enqueue(jobs(1))
+        first = queue.lease("crashed")
+        time.sleep(0.1)
+        second = queue.lease("b")
+        assert second.id == first.id
+        assert second.attempts == 2
+
+    def test_late_completion_from_lost_lease_is_rejected(self, tmp_path):
+        queue = WorkQueue(tmp_path / "q.db", lease_seconds=0.05)
+        queue.enqueue(jobs(1))
+        queue.register_worker("slow")
+        queue.register_worker("b")
+        job = queue.lease("slow")
+        time.sleep(0.1)
+        reclaimed = queue.lease("b")
+        assert queue.complete(job, "slow", "out.pdf") is False
+        assert queue.complete(reclaimed, "b", "out.pdf") is True
+
+    def test_job_that_keeps_expiring_is_failed(self, tmp_path):
+        queue = WorkQueue(tmp_path / "q.db", lease_seconds=0.01, max_attempts=2)
+        queue.enqueue(jobs(1))
+        queue.lease("a")
+        time.sleep(0.02)
+        queue.lease("b")
+        time.sleep(0.02)
+        assert queue.lease("c") is None
+        assert queue.counts()["failed"] == 1
+
+    def test_worker_stats_track_throughput(self, tmp_path):
+        queue = WorkQueue(tmp_path / "q.db")
+        queue.enqueue(jobs(2))
+        queue.register_worker("a")
+        queue.complete(queue.lease("a"), "a", "one.pdf")
+        queue.fail(queue.lease("a"), "a", "boom")
+        (stats,) = queue.worker_stats()
+        assert stats["jobs_done"] == 1
+        assert stats["jobs_failed"] == 1
+
+
+# ---------------------------------------------------------------------------
+# run_worker
+# ---------------------------------------------------------------------------
+
+def test_handler_errors_mark_job_failed_and_worker_continues(tmp_path):
+    queue = WorkQueue(tmp_path / "q.db")
+    queue.enqueue(jobs(3))
+
+    def handler(payload, work_dir):
+        if payload["n"] == 1:
+            raise RuntimeError("Edge PDF conversion failed")
+        return f"{payload['n']}.pdf"
+
+    stats = work_queue.run_worker(tmp_path / "q.db", handler, worker_id="w")
+    assert stats["jobs_done"] == 2
+    assert stats["jobs_failed"] == 1
+    assert queue.counts() == {"pending": 0, "leased": 0, "done": 2, "failed": 1}
+
+
+def test_open_circuit_releases_the_job_and_stops_the_worker(tmp_path):
+    from resilience import CircuitOpenError
+
+    queue = WorkQueue(tmp_path / "q.db")
+    queue.enqueue(jobs(3))
+
+    def handler(payload, work_dir):
+        raise CircuitOpenError("Browser conversions are failing")
+
+    with pytest.raises(CircuitOpenError):
+        work_queue.run_worker(tmp_path / "q.db", handler, worker_id="w")
+    assert queue.counts() == {"pending": 3, "leased": 0, "done": 0, "failed": 0}
+    assert queue.lease("other").attempts == 1  # the released job did not use up an attempt
+
+
+fork_only = pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(), reason="needs fork start method"
+)
+
+
+@fork_only
+def test_several_processes_drain_queue_exactly_once(tmp_path):
+    queue_path = tmp_path / "q.db"
+    marker_dir = tmp_path / "markers"
+    marker_dir.mkdir()
+    queue = WorkQueue(queue_path)
+    queue.enqueue((f"hash-{i}", {"n": i, "marker_dir": str(marker_dir)}) for i in range(60))
+
+    ctx = multiprocessing.get_context("fork")
+    workers = [
+        ctx.Process(target=work_queue.run_worker, args=(queue_path, write_marker),
+                    kwargs={"worker_id": f"w{i}", "poll_interval": 0.01})
+        for i in range(4)
+    ]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join(timeout=60)
+        assert process.exitcode == 0
+
+    assert queue.counts()["done"] == 60
+    assert len(list(marker_dir.iterdir())) == 60
+    assert sum(stats["jobs_done"] for stats in queue.worker_stats()) == 60
+
+
+def _crash_after_lease(queue_path):
+    WorkQueue(queue_path, lease_seconds=0.2).lease("crashed")
+    os._exit(1)
+
+
+@fork_only
+def test_crashed_workers_job_is_reclaimed(tmp_path):
+    queue_path = tmp_path / "q.db"
+    WorkQueue(queue_path).enqueue(jobs(1))
+
+    crashed = multiprocessing.get_context("fork").Process(target=_crash_after_lease, args=(queue_path,))
+    crashed.start()
+    crashed.join(timeout=30)
+
+    stats = work_queue.run_worker(queue_path, lambda payload, work_dir: "out.pdf",
+                                  worker_id="survivor", poll_interval=0.05)
+    assert stats["jobs_done"] == 1
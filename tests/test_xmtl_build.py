@@ -1,4 +1,5 @@
 import textwrap
+from unittest.mock import patch
 
 import pytest
 from submittal_cli import XmtlBuild, XmtlBuildField
@@ -22,6 +23,48 @@ class TestXmtlBuildField:
         assert field.processed_value == "default"
 
 
+# ===========================================================================
+# XmtlBuild — field schema and storage
+# ===========================================================================
+
+class TestFieldSchema:
+    def test_builds_store_values_without_an_instance_dict(self):
+        build = XmtlBuild(project_number="3238")
+        assert not hasattr(build, "__dict__")
+        with pytest.raises(AttributeError):
+            build.extra = "x"
+
+    def test_field_attributes_read_and_write_the_build(self):
+        build = XmtlBuild(submittal_number="001")
+        field = build.submittal_number
+        assert (field.name, field.value, field.required) == ("Submittal_Number", "001", True)
+        field.value = "002"
+        assert build.submittal_number.value == "002"
+        assert build.to_dict()["submittal_number"] == "002"
+
+    def test_schema_is_shared_by_every_build(self):
+        assert XmtlBuild.reviewer_names is XmtlBuild.FIELDS[-1]
+        assert XmtlBuild().reviewer_names.max_length == XmtlBuild.reviewer_names.max_length == 540
+        assert [spec.attribute for spec in XmtlBuild.FIELDS] == list(XmtlBuild().to_dict())
+
+    def test_fields_are_returned_in_schema_order(self):
+        assert [field.name for field in XmtlBuild().fields()] == [spec.name for spec in XmtlBuild.FIELDS]
+
+    def test_render_dict_follows_edits_and_is_a_copy(self, full_build):
+        first = full_build.to_render_dict()
+        first["Submittal_Number"] = "changed"
+        assert full_build.to_render_dict()["Submittal_Number"] != "changed"
+        full_build.submittal_name.value = "Renamed"
+        assert full_build.to_render_dict()["Submittal_Name"] == "Renamed"
+
+    def test_blank_review_date_follows_the_clock(self, full_build):
+        full_build.date_review_ends.value = ""
+        with patch("submittal_cli._default_review_date", return_value="01/14/2026"):
+            assert full_build.to_render_dict()["Date_Review_Ends"] == "01/14/2026"
+        with patch("submittal_cli._default_review_date", return_value="01/15/2026"):
+            assert full_build.to_render_dict()["Date_Review_Ends"] == "01/15/2026"
+
+
 # ===========================================================================
 # XmtlBuild — revision number processor
 # ===========================================================================
@@ -196,3 +239,50 @@ class TestFromYaml:
         yaml_file.write_text(self.YAML_CONTENT)
         with pytest.raises(KeyError, match="missing-key"):
             XmtlBuild.from_yaml(str(yaml_file), "missing-key")
+
+
+# ===========================================================================
+# XmtlBuild — from_dict() and input_hash()
+# ===========================================================================
+
+class TestFromDict:
+    def test_treats_none_and_numbers_as_strings(self):
+        build = XmtlBuild.from_dict({"Project_Title": "9999, P", "Revision_Number": 2, "Project_Manager": None})
+        assert build.revision_number.processed_value == "2"
+        assert build.project_manager_name.value == ""
+
+    def test_missing_keys_default_to_empty(self):
+        build = XmtlBuild.from_dict({})
+        assert build.project_number.value == ""
+        assert build.reviewer_names.processed_value == []
+
+    def test_accepts_render_dict_reviewer_keys(self, full_build):
+        rebuilt = XmtlBuild.from_dict(full_build.to_render_dict())
+        assert rebuilt.reviewer_names.processed_value == full_build.reviewer_names.processed_value
+        assert rebuilt.project_number.value == full_build.project_number.value
+
+    def test_numbered_reviewers_are_ordered_numerically(self):
+        build = XmtlBuild.from_dict({f"Reviewer_Name_{n}": f"R{n}" for n in (10, 2, 1)})
+        assert build.reviewer_names.processed_value == ["R1", "R2", "R10"]
+
+
+class TestToDict:
+    def test_round_trips_through_constructor(self, full_build):
+        assert XmtlBuild(**full_build.to_dict()).input_hash() == full_build.input_hash()
+
+    def test_skip_empty_leaves_out_blank_fields(self, no_edp_build):
+        assert "edp_line1" not in no_edp_build.to_dict(skip_empty=True)
+
+
+class TestInputHash:
+    def test_identical_inputs_hash_the_same(self, full_build):
+        other = XmtlBuild(**{name: getattr(full_build, name).value for name in (
+            "project_number", "project_title", "submittal_number", "revision_number",
+            "specification_section", "submittal_name", "date_review_ends", "project_manager_name",
+            "edp_line1", "edp_line2", "edp_line3", "reviewer_names")})
+        assert other.input_hash() == full_build.input_hash()
+
+    def test_any_field_change_changes_hash(self, full_build):
+        before = full_build.input_hash()
+        full_build.reviewer_names.value += ";Someone Else"
+        assert full_build.input_hash() != before
@@ -0,0 +1,114 @@
+"""Tests for zip_sink: streaming PDFs into size-limited zip archives."""
+import json
+import zipfile
+from unittest.mock import patch
+
+import pytest
+
+import batch
+from zip_sink import MANIFEST_NAME, ZipSink, output_exists
+
+
+def manifest(archive):
+    with zipfile.ZipFile(archive) as zf:
+        return [json.loads(line) for line in zf.read(MANIFEST_NAME).decode().splitlines()]
+
+
+def test_files_are_stored_with_a_manifest(tmp_path):
+    with ZipSink("out.zip", directory=tmp_path) as sink:
+        path = sink.write_bytes("a.pdf", b"%PDF-a", input_hash="h1")
+        sink.write_bytes("b.pdf", b"%PDF-bb", input_hash="h2")
+
+    assert path == tmp_path / "out.zip" / "a.pdf"
+    assert sink.archives == [tmp_path / "out.zip"]
+    with zipfile.ZipFile(tmp_path / "out.zip") as zf:
+        assert zf.read("a.pdf") == b"%PDF-a"
+        assert {info.compress_type for info in zf.infolist() if info.filename != MANIFEST_NAME} == {zipfile.ZIP_STORED}
+    assert [(e["name"], e["bytes"], e["input_hash"]) for e in manifest(tmp_path / "out.zip")] == [
+        ("a.pdf", 6, "h1"), ("b.pdf", 7, "h2")]
+
+
+def test_archives_roll_over_by_size(tmp_path):
+    with ZipSink("out.zip", directory=tmp_path, max_bytes=2500) as sink:
+        for n in range(5):
+            sink.write_bytes(f"{n}.pdf", bytes(1000))
+
+    assert [path.name for path in sink.archives] == ["out.zip", "out-2.zip", "out-3.zip"]
+    for archive in sink.archives:
+        assert archive.stat().st_size <= 2500
+    assert [len(manifest(archive)) for archive in sink.archives] == [2, 2, 1]
+
+
+def test_oversized_file_gets_an_archive_of_its_own(tmp_path):
+    with ZipSink("out.zip", directory=tmp_path, max_bytes=100) as sink:
+        sink.write_bytes("big.pdf", bytes(500))
+        sink.write_bytes("small.pdf", b"x")
+    assert [len(manifest(archive)) for archive in sink.archives] == [1, 1]
+
+
+def test_archive_is_only_visible_once_complete(tmp_path):
+    sink = ZipSink("out.zip", directory=tmp_path)
+    sink.write_bytes("a.pdf", b"%PDF")
+    assert not (tmp_path / "out.zip").exists()
+    assert [p.name.endswith(".partial") for p in tmp_path.iterdir()] == [True]
+    sink.close()
+    assert [p.name for p in tmp_path.iterdir()] == ["out.zip"]
+
+
+def test_sinks_writing_the_same_archive_do_not_share_a_partial_file(tmp_path):
+    first, second = ZipSink("out.zip", directory=tmp_path), ZipSink("out.zip", directory=tmp_path)
+    first.write_bytes("a.pdf", b"%PDF-a")
+    second.write_bytes("b.pdf", b"%PDF-b")
+    assert len(list(tmp_path.iterdir())) == 2
+    first.close()
+    second.close()
+    assert [p.name for p in tmp_path.iterdir()] == ["out.zip"]
+    with zipfile.ZipFile(tmp_path / "out.zip") as zf:
+        assert zf.testzip() is None
+
+
+def test_failed_write_adds_nothing(tmp_path):
+    def crash(f):
+        f.write(b"%PDF-tru")
+        raise RuntimeError("writer died")
+
+    with ZipSink("out.zip", directory=tmp_path) as sink:
+        with pytest.raises(RuntimeError):
+            sink.write("a.pdf", crash)
+        sink.write_bytes("b.pdf", b"%PDF")
+    with zipfile.ZipFile(tmp_path / "out.zip") as zf:
+        assert zf.namelist() == ["b.pdf", MANIFEST_NAME]
+
+
+def test_duplicate_names_are_suffixed_and_existing_archives_kept(tmp_path):
+    (tmp_path / "out.zip").write_bytes(b"earlier run")
+    with ZipSink("out.zip", directory=tmp_path) as sink:
+        sink.write_bytes("a.pdf", b"1")
+        second = sink.write_bytes("a.pdf", b"2")
+    assert second == tmp_path / "out-2.zip" / "a (1).pdf"
+    assert (tmp_path / "out.zip").read_bytes() == b"earlier run"
+
+
+def test_output_exists_sees_members_of_finished_archives(tmp_path):
+    with ZipSink("out.zip", directory=tmp_path) as sink:
+        path = sink.write_bytes("a.pdf", b"%PDF")
+        assert not output_exists(path)
+    assert output_exists(path)
+    assert not output_exists(tmp_path / "out.zip" / "missing.pdf")
+
+
+def test_batch_resumes_from_rows_already_in_an_archive(tmp_path):
+    manifest_path = tmp_path / "m.ndjson"
+    manifest_path.write_text("".join(json.dumps({"Project_Title": "3238, Park", "Submittal_Number": f"{n:03d}",
+                                                  "Specification_Section": "07", "Submittal_Name": "Sample",
+                                                  "reviewer_list": "Alice"}) + "\n" for n in range(3)))
+
+    def generate(build, output_dir, **kwargs):
+        return output_dir.write_bytes(f"{build.submittal_number.value}.pdf", b"%PDF", input_hash=build.input_hash())
+
+    with patch.object(batch, "generate_transmittal", side_effect=generate):
+        with ZipSink("out.zip", directory=tmp_path) as sink:
+            assert batch.run_batch(manifest_path, output_dir=sink)["done"] == 3
+        with ZipSink("out.zip", directory=tmp_path) as sink:
+            assert batch.run_batch(manifest_path, output_dir=sink)["skipped"] == 3
+    assert sink.archives == []
@@ -0,0 +1,261 @@
+"""Watch mode: regenerate transmittals as the templates file and a drop folder change.
+
+The watcher keeps one process running, so the interpreter, the compiled Jinja
+templates, the extracted asset cache and the registry connection stay warm
+between changes. Only work that changed is regenerated:
+
+- xmtl_templates.yaml: each entry's input hash is remembered, and only
+  entries that were added or edited since the last scan are generated.
+  Entries saved through its overlay journal (template_store) count as edits.
+- Drop folder: every CSV or NDJSON manifest that appears or changes is run
+  through batch.run_batch(), whose checkpoint journal skips rows that were
+  already generated.
+
+Changes are detected with watchdog (inotify on Linux, ReadDirectoryChangesW
+on Windows) when it is installed, and by polling modification times
+otherwise. Bursts of changes, such as an editor saving through a temporary
+file, are coalesced until the files have been quiet for the debounce period.
+"""
+import threading
+import time
+from pathlib import Path
+
+import yaml
+
+from batch import run_batch
+from submittal_cli import XmtlBuild, generate_transmittal
+from template_store import load_templates, overlay_path
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    Observer = None
+
+MANIFEST_SUFFIXES = (".csv", ".ndjson", ".jsonl", ".json")
+JOURNAL_SUFFIX = ".journal.jsonl"
+
+
+def is_manifest(path):
+    """True for files in the drop folder that should be treated as manifests."""
+    path = Path(path)
+    return (path.suffix.lower() in MANIFEST_SUFFIXES and not path.name.endswith(JOURNAL_SUFFIX)
+            and not path.name.startswith("."))
+
+
+def _signature(path):
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def watched_signatures(templates_path=None, drop_dir=None):
+    """Map every watched file to its (mtime, size) signature."""
+    paths = [Path(templates_path), overlay_path(templates_path)] if templates_path else []
+    if drop_dir and Path(drop_dir).is_dir():
+        paths.extend(path for path in Path(drop_dir).iterdir() if path.is_file() and is_manifest(path))
+    signatures = {path: _signature(path) for path in paths}
+    return {path: signature for path, signature in signatures.items() if signature is not None}
+
+
+class PollingMonitor:
+    """Detects changes by comparing file signatures every interval seconds."""
+
+    def __init__(self, templates_path=None, drop_dir=None, interval=1.0):
+        self.templates_path = templates_path
+        self.drop_dir = drop_dir
+        self.interval = interval
+        self._last = watched_signatures(templates_path, drop_dir)
+
+    def wait(self, timeout):
+        """Block until a watched file changes (True) or timeout seconds pass (False)."""
+        deadline = time.monotonic() + timeout
+        while True:
+            current = watched_signatures(self.templates_path, self.drop_dir)
+            if current != self._last:
+                self._last = current
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(self.interval, remaining))
+
+    def close(self):
+        pass
+
+
+class EventMonitor:
+    """Detects changes from filesystem notifications delivered by watchdog."""
+
+    def __init__(self, templates_path=None, drop_dir=None):
+        self._changed = threading.Event()
+        templates_path = Path(templates_path).resolve() if templates_path else None
+        drop_dir = Path(drop_dir).resolve() if drop_dir else None
+        monitor = self
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                for path in (event.src_path, getattr(event, "dest_path", "")):
+                    if path and monitor._relevant(Path(path), templates_path, drop_dir):
+                        monitor._changed.set()
+
+        self._observer = Observer()
+        for folder in {path for path in (templates_path and templates_path.parent, drop_dir) if path}:
+            self._observer.schedule(Handler(), str(folder), recursive=False)
+        self._observer.start()
+
+    @staticmethod
+    def _relevant(path, templates_path, drop_dir):
+        path = path.resolve()
+        if templates_path is not None and path in (templates_path, overlay_path(templates_path)):
+            return True
+        return drop_dir is not None and path.parent == drop_dir and is_manifest(path)
+
+    def wait(self, timeout):
+        """Block until a watched file changes (True) or timeout seconds pass (False)."""
+        changed = self._changed.wait(timeout)
+        self._changed.clear()
+        return changed
+
+    def close(self):
+        self._observer.stop()
+        self._observer.join()
+
+
+def make_monitor(templates_path=None, drop_dir=None, poll_interval=1.0):
+    """Return an EventMonitor when watchdog is installed, else a PollingMonitor."""
+    if Observer is not None:
+        return EventMonitor(templates_path, drop_dir)
+    return PollingMonitor(templates_path, drop_dir, interval=poll_interval)
+
+
+def wait_for_quiet(monitor, debounce, max_delay):
+    """After a change, wait until nothing has changed for debounce seconds.
+
+    Gives up waiting after max_delay seconds, so a file rewritten constantly
+    still gets processed.
+    """
+    deadline = time.monotonic() + max_delay
+    while (remaining := deadline - time.monotonic()) > 0 and monitor.wait(min(debounce, remaining)):
+        pass
+
+
+class Watcher:
+    """Works out what changed since the last scan and regenerates it.
+
+    Args:
+        templates_path: xmtl_templates.yaml to watch, or None.
+        drop_dir:       Folder to watch for manifests, or None.
+        options:        Keyword arguments passed to generate_transmittal() and
+                        run_batch() (output_dir, concurrency, registry, pdf_options).
+    """
+
+    def __init__(self, templates_path=None, drop_dir=None, **options):
+        self.templates_path = Path(templates_path) if templates_path else None
+        self.drop_dir = Path(drop_dir) if drop_dir else None
+        self.options = options
+        self.template_hashes = {}
+        self.manifest_signatures = {}
+
+    def _load_templates(self):
+        """Return {key: XmtlBuild} for the templates file, or None if it cannot be read right now."""
+        try:
+            entries = load_templates(self.templates_path)
+        except (OSError, ValueError, yaml.YAMLError) as exc:
+            print(f"Could not read {self.templates_path}: {exc}")
+            return None
+        entries.pop("KEY", None)
+        builds = {}
+        for key, entry in entries.items():
+            if entry is not None and not isinstance(entry, dict):
+                print(f"Template '{key}' is not a mapping of fields, skipping it.")
+                continue
+            builds[str(key)] = XmtlBuild.from_dict(entry or {})
+        return builds
+
+    def prime(self):
+        """Remember the current templates without generating them."""
+        if self.templates_path and (builds := self._load_templates()) is not None:
+            self.template_hashes = {key: build.input_hash() for key, build in builds.items()}
+
+    def scan(self):
+        """Generate changed template entries and run new or changed manifests.
+
+        Returns:
+            A list of (source, result) pairs: the output path for each
+            template entry generated, the run_batch() summary for each manifest run.
+        """
+        generated = []
+        if self.templates_path:
+            generated.extend(self._scan_templates())
+        if self.drop_dir:
+            generated.extend(self._scan_manifests())
+        return generated
+
+    def _scan_templates(self):
+        builds = self._load_templates()
+        if builds is None:
+            return []
+        generated = []
+        for key in set(self.template_hashes) - set(builds):
+            del self.template_hashes[key]
+        for key, build in builds.items():
+            input_hash = build.input_hash()
+            if self.template_hashes.get(key) == input_hash:
+                continue
+            if missing := build.validate():
+                print(f"Template '{key}' is incomplete, not generating (missing {missing}).")
+                self.template_hashes[key] = input_hash
+                continue
+            try:
+                output = generate_transmittal(build, **self.options)
+            except (ValueError, RuntimeError) as exc:
+                # leave the hash unrecorded so the entry is retried on the next change
+                print(f"Template '{key}' failed: {exc}")
+                continue
+            self.template_hashes[key] = input_hash
+            generated.append((f"template {key}", output))
+            print(f"Template '{key}' → {output}")
+        return generated
+
+    def _scan_manifests(self):
+        current = watched_signatures(drop_dir=self.drop_dir)
+        generated = []
+        for path, signature in sorted(current.items()):
+            if self.manifest_signatures.get(path) == signature:
+                continue
+            try:
+                summary = run_batch(path, **self.options)
+            except Exception as exc:
+                # a malformed or half-copied manifest, or a failure outside any one row;
+                # leave its signature unrecorded so it is retried
+                print(f"{path.name} could not be run: {exc}")
+                continue
+            print(f"{path.name}: {summary['done']} generated, {summary['skipped']} already done, "
+                  f"{summary['duplicate']} duplicate, {summary['failed']} failed.")
+            self.manifest_signatures[path] = signature
+            generated.append((path.name, summary))
+        self.manifest_signatures = {path: self.manifest_signatures[path] for path in current
+                                    if path in self.manifest_signatures}
+        return generated
+
+
+def run_watch(watcher, monitor, debounce=0.5, max_delay=10.0, stop=None):
+    """Scan once, then rescan after every quiet burst of changes until stop is set.
+
+    The templates file is primed rather than generated on start, so only
+    later edits produce PDFs. Manifests already in the drop folder are
+    processed (their journals skip finished rows).
+    """
+    watcher.prime()
+    watcher.scan()
+    try:
+        while stop is None or not stop.is_set():
+            if not monitor.wait(timeout=1.0):
+                continue
+            wait_for_quiet(monitor, debounce, max_delay)
+            watcher.scan()
+    finally:
+        monitor.close()
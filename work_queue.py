@@ -0,0 +1,263 @@
+"""Shared SQLite work queue for running batch jobs across several worker processes.
+
+Any number of `worker` processes, on one host or on several hosts sharing a
+filesystem, pull jobs from the same queue file. A worker leases a job for a
+fixed time; if it crashes, the lease expires and another worker reclaims the
+job. Every lease and completion runs in a BEGIN IMMEDIATE transaction, so two
+workers can never hold the same job.
+
+The database uses SQLite's default rollback journal rather than WAL, because
+WAL's shared-memory index does not work over SMB/NFS shares.
+"""
+import json
+import os
+import socket
+import sqlite3
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from metrics import REGISTRY
+from resilience import CircuitOpenError
+
+STATUS_PENDING = "pending"
+STATUS_LEASED = "leased"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id            INTEGER PRIMARY KEY,
+    input_hash    TEXT NOT NULL UNIQUE,
+    payload       TEXT NOT NULL,
+    status        TEXT NOT NULL DEFAULT 'pending',
+    worker        TEXT,
+    lease_expires REAL,
+    attempts      INTEGER NOT NULL DEFAULT 0,
+    output        TEXT,
+    error         TEXT,
+    finished_at   REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, lease_expires);
+CREATE TABLE IF NOT EXISTS workers (
+    worker_id     TEXT PRIMARY KEY,
+    started_at    REAL NOT NULL,
+    last_seen     REAL NOT NULL,
+    jobs_done     INTEGER NOT NULL DEFAULT 0,
+    jobs_failed   INTEGER NOT NULL DEFAULT 0,
+    busy_seconds  REAL NOT NULL DEFAULT 0
+);
+"""
+
+
+QUEUE_JOBS = REGISTRY.gauge("xmtl_queue_jobs", "Jobs in the shared work queue, by status, as last seen by this worker.")
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+@dataclass
+class Job:
+    id: int
+    input_hash: str
+    payload: dict
+    attempts: int
+    leased_at: float
+
+
+class WorkQueue:
+    """A job queue stored in a single SQLite file.
+
+    Args:
+        path:          Queue database file; created on first use.
+        lease_seconds: How long a leased job stays reserved before other
+                       workers may reclaim it.
+        max_attempts:  Jobs whose lease has expired this many times are
+                       marked failed instead of being handed out again, so a
+                       job that crashes its worker cannot take down the pool.
+    """
+
+    def __init__(self, path, lease_seconds=300, max_attempts=3):
+        self.path = Path(path)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._conn = sqlite3.connect(str(self.path), timeout=60, isolation_level=None)
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def _transaction(self):
+        return _ImmediateTransaction(self._conn)
+
+    def enqueue(self, jobs):
+        """Add (input_hash, payload) pairs to the queue and return how many were new.
+
+        Jobs whose input hash is already queued are ignored, so enqueueing the
+        same manifest twice does not duplicate work.
+        """
+        added = 0
+        with self._transaction() as conn:
+            for input_hash, payload in jobs:
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO jobs (input_hash, payload) VALUES (?, ?)",
+                    (input_hash, json.dumps(payload)),
+                )
+                added += cursor.rowcount
+        return added
+
+    def lease(self, worker_id):
+        """Reserve the next pending (or expired) job for worker_id, or return None."""
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, worker = NULL, error = 'lease expired too many times', finished_at = ? "
+                "WHERE status = ? AND lease_expires < ? AND attempts >= ?",
+                (STATUS_FAILED, now, STATUS_LEASED, now, self.max_attempts),
+            )
+            row = conn.execute(
+                "SELECT id, input_hash, payload, attempts FROM jobs "
+                "WHERE status = ? OR (status = ? AND lease_expires < ?) ORDER BY id LIMIT 1",
+                (STATUS_PENDING, STATUS_LEASED, now),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, worker = ?, lease_expires = ?, attempts = attempts + 1 WHERE id = ?",
+                (STATUS_LEASED, worker_id, now + self.lease_seconds, row[0]),
+            )
+        return Job(id=row[0], input_hash=row[1], payload=json.loads(row[2]), attempts=row[3] + 1, leased_at=now)
+
+    def complete(self, job, worker_id, output):
+        """Mark a leased job done. Returns False if the lease was lost to another worker."""
+        return self._finish(job, worker_id, STATUS_DONE, output=str(output), counter="jobs_done")
+
+    def fail(self, job, worker_id, error):
+        """Mark a leased job failed. Returns False if the lease was lost to another worker."""
+        return self._finish(job, worker_id, STATUS_FAILED, error=str(error), counter="jobs_failed")
+
+    def release(self, job, worker_id):
+        """Hand a leased job back untried, so any worker can take it at once without using an attempt."""
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, worker = NULL, lease_expires = NULL, attempts = attempts - 1 "
+                "WHERE id = ? AND status = ? AND worker = ?",
+                (STATUS_PENDING, job.id, STATUS_LEASED, worker_id),
+            )
+        return cursor.rowcount == 1
+
+    def _finish(self, job, worker_id, status, output=None, error=None, counter=None):
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, output = ?, error = ?, finished_at = ?, lease_expires = NULL "
+                "WHERE id = ? AND status = ? AND worker = ?",
+                (status, output, error, now, job.id, STATUS_LEASED, worker_id),
+            )
+            owned = cursor.rowcount == 1
+            if owned:
+                conn.execute(
+                    f"UPDATE workers SET {counter} = {counter} + 1, busy_seconds = busy_seconds + ?, last_seen = ? "
+                    "WHERE worker_id = ?",
+                    (now - job.leased_at, now, worker_id),
+                )
+        return owned
+
+    def register_worker(self, worker_id):
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO workers (worker_id, started_at, last_seen) VALUES (?, ?, ?) "
+                "ON CONFLICT (worker_id) DO UPDATE SET last_seen = excluded.last_seen",
+                (worker_id, now, now),
+            )
+
+    def counts(self):
+        """Return a dict of job counts by status."""
+        rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {STATUS_PENDING: 0, STATUS_LEASED: 0, STATUS_DONE: 0, STATUS_FAILED: 0}
+        counts.update(dict(rows))
+        return counts
+
+    def worker_stats(self):
+        """Return per-worker throughput: jobs done/failed, busy time, and jobs per minute."""
+        rows = self._conn.execute(
+            "SELECT worker_id, started_at, last_seen, jobs_done, jobs_failed, busy_seconds FROM workers ORDER BY worker_id"
+        ).fetchall()
+        stats = []
+        for worker_id, started_at, last_seen, done, failed, busy in rows:
+            elapsed = max(last_seen - started_at, 1e-9)
+            stats.append({
+                "worker_id": worker_id,
+                "jobs_done": done,
+                "jobs_failed": failed,
+                "busy_seconds": round(busy, 3),
+                "jobs_per_minute": round(done / elapsed * 60, 2) if done else 0.0,
+            })
+        return stats
+
+
+class _ImmediateTransaction:
+    """Context manager that holds SQLite's write lock for the whole block."""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __enter__(self):
+        self._conn.execute("BEGIN IMMEDIATE")
+        return self._conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self._conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+def run_worker(queue_path, handler, worker_id=None, poll_interval=1.0, exit_when_idle=True, lease_seconds=300):
+    """Pull jobs from the queue and pass each payload to handler until the queue is drained.
+
+    Args:
+        queue_path:     Queue database file.
+        handler:        Callable (payload: dict, work_dir: Path) -> output path.
+                        ValueError and RuntimeError mark the job failed; any
+                        other exception stops the worker and the job's lease
+                        expires so another worker can retry it. A
+                        resilience.CircuitOpenError (this host's browser is
+                        broken) releases the job at once and is raised again.
+        worker_id:      Name recorded against jobs and throughput stats.
+        poll_interval:  Seconds to wait between polls when no job is available.
+        exit_when_idle: Return once nothing is pending or leased; otherwise
+                        keep polling for new jobs forever.
+
+    Returns:
+        This worker's throughput stats (see WorkQueue.worker_stats()).
+    """
+    worker_id = worker_id or default_worker_id()
+    queue = WorkQueue(queue_path, lease_seconds=lease_seconds)
+    queue.register_worker(worker_id)
+    try:
+        with tempfile.TemporaryDirectory(prefix="xmtl-worker-") as work_dir:
+            while True:
+                job = queue.lease(worker_id)
+                counts = queue.counts()
+                for status, count in counts.items():
+                    QUEUE_JOBS.set(count, status=status)
+                if job is None:
+                    if exit_when_idle and not counts[STATUS_PENDING] and not counts[STATUS_LEASED]:
+                        break
+                    time.sleep(poll_interval)
+                    continue
+                try:
+                    output = handler(job.payload, Path(work_dir))
+                except CircuitOpenError:
+                    queue.release(job, worker_id)
+                    raise
+                except (ValueError, RuntimeError) as exc:
+                    queue.fail(job, worker_id, exc)
+                    continue
+                if not queue.complete(job, worker_id, output):
+                    print(f"Lease on job {job.id} expired before it finished; another worker owns it now.")
+        return next(stats for stats in queue.worker_stats() if stats["worker_id"] == worker_id)
+    finally:
+        queue.close()
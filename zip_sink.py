@@ -0,0 +1,181 @@
+"""Write final PDFs straight into zip archives instead of a folder.
+
+A ZipSink stands in for an output_sink.OutputSink: each finished PDF is
+added to the current archive as it is produced, so a batch never has to be
+zipped by hand afterwards (which reads every PDF back off disk). PDFs are
+already compressed, so entries are stored, not deflated.
+
+Archives roll over by size: 'batch.zip', then 'batch-2.zip', 'batch-3.zip',
+... Each archive ends with a manifest.jsonl entry listing its files with
+their size, CRC-32 and the input hash of the build they came from.
+
+An archive is written under a hidden, uniquely named '.partial' file beside
+it and renamed into place when it is complete, so a crash never leaves a
+truncated zip under the final name and two batches writing into one folder
+never share a partial file.
+Memory use does not grow with the batch: each PDF is spooled to a temporary
+file (in memory up to SPOOL_BYTES) before it is added, and the manifest is
+spooled the same way. Only the zip central directory of the current archive,
+a few hundred bytes per entry, is held until the archive is closed.
+"""
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from functools import lru_cache
+from pathlib import Path
+
+from output_sink import _fsync_path, create_temp_file, default_output_dir
+
+MANIFEST_NAME = "manifest.jsonl"
+SPOOL_BYTES = 16 * 1024 * 1024
+# Local header, data descriptor and central directory record, not counting the name
+ENTRY_OVERHEAD = 128
+
+
+class ZipSink:
+    """Writes finished files into one or more zip archives.
+
+    Args:
+        archive:   Path of the first archive; later ones get '-2', '-3', ...
+                   before the suffix. A relative path is placed in directory.
+        directory: Folder for a relative archive path (~/Downloads by default).
+        max_bytes: Start a new archive rather than let one grow past this
+                   size. A single file larger than max_bytes gets an archive
+                   to itself. None never rolls over.
+
+    A name already used in the current archive is given a ' (1)', ' (2)', ...
+    suffix; the collision policies of OutputSink do not apply.
+    """
+
+    def __init__(self, archive, directory=None, max_bytes=None):
+        if max_bytes is not None and max_bytes <= 0:
+            raise ValueError("max_bytes must be positive")
+        self.directory = Path(directory) if directory else default_output_dir()
+        self.base = self.directory / archive
+        self.max_bytes = max_bytes
+        self.archives = []
+        self._zip = None
+        self._path = None
+        self._partial = None
+        self._names = set()
+        self._manifest = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def path_for(self, name):
+        """The path a file called name is recorded under: the archive it goes into, then the name."""
+        return self._next_path() / name if self._path is None else self._path / name
+
+    def existing(self, name):
+        """Always None: an archive being written never already holds a file."""
+        return None
+
+    def write(self, name, write_to, input_hash=None):
+        """Add one file to the current archive and return its path (archive path / name).
+
+        write_to is called with a binary file object. input_hash is recorded
+        against the file in the archive's manifest.
+        """
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES) as spool:
+            write_to(spool)
+            size = spool.tell()
+            spool.seek(0)
+            with self._lock:
+                self._roll_over_for(size + ENTRY_OVERHEAD + 2 * len(name.encode()))
+                name = self._unique(name)
+                info = zipfile.ZipInfo(name, time.localtime()[:6])
+                info.compress_type = zipfile.ZIP_STORED
+                with self._zip.open(info, "w", force_zip64=size > zipfile.ZIP64_LIMIT) as entry:
+                    shutil.copyfileobj(spool, entry)
+                self._record(info, input_hash)
+                return self._path / name
+
+    def write_bytes(self, name, data, input_hash=None):
+        return self.write(name, lambda f: f.write(data), input_hash=input_hash)
+
+    def _next_path(self):
+        n = len(self.archives)
+        while True:
+            n += 1
+            path = self.base if n == 1 else self.base.with_name(f"{self.base.stem}-{n}{self.base.suffix}")
+            if not path.exists():
+                return path
+
+    def _roll_over_for(self, size):
+        """Finish the current archive if size more bytes would take it over max_bytes; start one if needed."""
+        if self._zip is not None and self.max_bytes is not None and self._names:
+            if self._zip.fp.tell() + size + self._manifest.tell() > self.max_bytes:
+                self._finish()
+        if self._zip is None:
+            self._path = self._next_path()
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+            fd, self._partial = create_temp_file(self._path)
+            os.close(fd)
+            self._zip = zipfile.ZipFile(self._partial, "w", zipfile.ZIP_STORED)
+            self._manifest = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+
+    def _unique(self, name):
+        candidate, n = name, 0
+        stem, dot, suffix = name.rpartition(".")
+        while candidate in self._names or candidate == MANIFEST_NAME:
+            n += 1
+            candidate = f"{stem} ({n}).{suffix}" if dot else f"{name} ({n})"
+        self._names.add(candidate)
+        return candidate
+
+    def _record(self, info, input_hash):
+        line = {"name": info.filename, "bytes": info.file_size, "crc32": f"{info.CRC:08x}", "input_hash": input_hash}
+        self._manifest.write((json.dumps(line) + "\n").encode("utf-8"))
+
+    def _finish(self):
+        self._manifest.seek(0)
+        info = zipfile.ZipInfo(MANIFEST_NAME, time.localtime()[:6])
+        info.compress_type = zipfile.ZIP_DEFLATED
+        with self._zip.open(info, "w") as entry:
+            shutil.copyfileobj(self._manifest, entry)
+        self._manifest.close()
+        self._zip.close()
+        _fsync_path(self._partial)
+        os.replace(self._partial, self._path)
+        self.archives.append(self._path)
+        self._zip = self._manifest = self._path = self._partial = None
+        self._names = set()
+
+    def flush(self):
+        """Nothing to do: an archive is synced once, when it is complete."""
+
+    def close(self):
+        """Finish the current archive, writing its manifest and renaming it into place."""
+        with self._lock:
+            if self._zip is not None:
+                self._finish()
+
+
+@lru_cache(maxsize=16)
+def _archive_names(archive, mtime_ns):
+    with zipfile.ZipFile(archive) as zf:
+        return frozenset(zf.namelist())
+
+
+def output_exists(path):
+    """True if path is a file, or a member of a finished archive written by a ZipSink (archive path / name)."""
+    path = Path(path)
+    if path.exists():
+        return True
+    archive = path.parent
+    if archive.suffix.lower() != ".zip" or not archive.is_file():
+        return False
+    try:
+        return path.name in _archive_names(archive, archive.stat().st_mtime_ns)
+    except (OSError, zipfile.BadZipFile):
+        return False